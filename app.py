@@ -1,9 +1,16 @@
+import time
+import tempfile
+_run_started = time.perf_counter()
+
 import streamlit as st
 import streamlit_option_menu as som
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import utils
+import receipts
+import sheets_sync
+import backup
+import exporter
+import importer
+import perf
 from datetime import datetime
 
 # Thiết lập cấu hình trang
@@ -15,10 +22,63 @@ st.set_page_config(
 
 
 if 'app_initialized' not in st.session_state:
-    utils.initialize_data()
+    # Dừng hẳn nếu cơ sở dữ liệu không mở hoặc không nâng cấp được lược đồ
+    try:
+        utils.initialize_data()
+    except utils.SchemaError as e:
+        st.error(f"Không mở được cơ sở dữ liệu: {e}")
+        st.stop()
+    # Giao dịch cũ không chuyển được sang lược đồ mới được giữ riêng, không bị xóa
+    quarantined = utils.get_quarantined_transactions()
+    if quarantined:
+        st.warning(
+            f"{len(quarantined)} giao dịch cũ thiếu mã, trùng mã hoặc có loại, ngày hay số tiền không hợp lệ nên chưa được chuyển; "
+            "xem bảng transactions_quarantine trong cơ sở dữ liệu để sửa và nhập lại."
+        )
+    # Đồng bộ Google Sheets chạy nền, một lần cho mỗi tiến trình (bật bằng QUYDOIBONG_SHEETS_SYNC=1)
+    sheets_sync.start_from_secrets(st.secrets)
+    # Sao lưu định kỳ chạy nền (bật bằng QUYDOIBONG_BACKUP_INTERVAL, tính bằng giây)
+    backup.start_scheduler_from_env()
     st.session_state.app_initialized = True
     
+def _select_fund():
+    # Lưu quỹ đang chọn ngoài widget để giữ nguyên khi chuyển trang
+    st.session_state.fund = st.session_state.fund_choice
+
+def _create_fund():
+    try:
+        fund = utils.create_fund(st.session_state.new_fund_name)
+    except (ValueError, utils.SchemaError) as e:
+        st.session_state.fund_error = str(e)
+        return
+    st.session_state.fund = st.session_state.fund_choice = fund
+    st.session_state.new_fund_name = ""
+
+def show_fund_selector():
+    # Mỗi quỹ (đội) có một cơ sở dữ liệu riêng
+    funds = utils.list_funds()
+    if st.session_state.get('fund') not in funds:
+        st.session_state.fund = utils.DEFAULT_FUND
+    st.session_state.fund_choice = st.session_state.fund
+
+    st.sidebar.selectbox(
+        "Quỹ",
+        options=funds,
+        format_func=lambda x: "Mặc định" if x == utils.DEFAULT_FUND else x,
+        key="fund_choice",
+        on_change=_select_fund
+    )
+    with st.sidebar.expander("Thêm quỹ mới"):
+        st.text_input("Tên quỹ", key="new_fund_name", placeholder="Ví dụ: Đội trẻ")
+        st.button("Tạo quỹ", key="create_fund", on_click=_create_fund, use_container_width=True)
+        error = st.session_state.pop('fund_error', None)
+        if error:
+            st.error(error)
+
 def main():
+    # Chọn quỹ trước khi đọc dữ liệu
+    show_fund_selector()
+
     # CSS
     st.markdown("""
     <style>
@@ -55,8 +115,8 @@ def main():
     # Menu điều hướng
     selected = som.option_menu(
         menu_title=None,
-        options=["Tổng quan", "Giao dịch", "Báo cáo"],
-        icons=["house", "list-ul", "bar-chart"],
+        options=["Tổng quan", "Giao dịch", "Báo cáo", "Nhập dữ liệu", "Xuất dữ liệu"],
+        icons=["house", "list-ul", "bar-chart", "upload", "download"],
         menu_icon="cast",
         default_index=0,
         orientation="horizontal",
@@ -68,23 +128,38 @@ def main():
         }
     )
     
-    # Hiển thị trang tương ứng
-    if selected == "Tổng quan":
-        show_home_page()
-    elif selected == "Giao dịch":
-        show_transactions_page()
-    elif selected == "Báo cáo":
-        show_reports_page()
+    # Hiển thị trang tương ứng (đo thời gian render từng trang)
+    with utils.span(f"page.{selected}"):
+        if selected == "Tổng quan":
+            show_home_page()
+        elif selected == "Giao dịch":
+            show_transactions_page()
+        elif selected == "Báo cáo":
+            show_reports_page()
+        elif selected == "Nhập dữ liệu":
+            show_import_page()
+        elif selected == "Xuất dữ liệu":
+            show_export_page()
+    
+    # Bảng hiệu năng cho quản trị (QUYDOIBONG_PERF_PANEL=1 hoặc perf_panel trong secrets)
+    if perf.perf_panel_enabled():
+        perf.show_performance_panel()
 
 def show_home_page():
     # Hiển thị trang chủ trực tiếp trong app.py
     st.markdown("<h2>Tổng quan quỹ</h2>", unsafe_allow_html=True)
     
+    # Nội dung chạy lại độc lập (fragment) khi thêm giao dịch
+    show_home_panel()
+
+@utils.fragment
+@utils.timed("fragment.home")
+def show_home_panel():
     # Tạo layout
     col1, col2 = st.columns([3, 2])
     
-    # Cập nhật tổng hợp
-    utils.update_summary()
+    # Cập nhật tổng hợp nếu sổ quỹ đã thay đổi
+    utils.sync_summary()
     
     # Hiển thị thông tin tổng hợp
     with col1:
@@ -116,27 +191,11 @@ def show_home_page():
         st.markdown("<h3>Giao dịch gần đây</h3>", unsafe_allow_html=True)
         
         # Lấy 5 giao dịch gần nhất
-        recent_transactions = st.session_state.transactions[:5]
+        recent_transactions = utils.query_transactions(limit=5)['transactions']
         
-        # Tạo dataframe
-        df = utils.get_transaction_df(recent_transactions)
-        
-        # Hiển thị danh sách giao dịch
-        if not df.empty:
-            for _, row in df.iterrows():
-                cols = st.columns([3, 2, 2, 3])
-                
-                # Format row
-                icon = "⬇️" if row['type'] == 'income' else "⬆️"
-                color = "green" if row['type'] == 'income' else "red"
-                
-                cols[0].markdown(f"<div style='display: flex; align-items: center;'><span>{icon}</span><span style='margin-left: 5px;'>{row['description']}</span></div>", unsafe_allow_html=True)
-                cols[1].markdown(f"{row['category']}")
-                cols[2].markdown(f"{row['date']}")
-                cols[3].markdown(f"<span style='color: {color};'>{row['amount_display']}</span>", unsafe_allow_html=True)
-                
-                # Đường phân cách
-                st.markdown("<hr style='margin: 5px 0; opacity: 0.3;'>", unsafe_allow_html=True)
+        # Hiển thị danh sách giao dịch (không cần pandas)
+        if recent_transactions:
+            st.markdown(utils.transaction_table_html(recent_transactions), unsafe_allow_html=True)
         else:
             st.info("Chưa có giao dịch nào")
 
@@ -151,61 +210,64 @@ def show_home_page():
                 "Loại giao dịch",
                 options=["income", "expense"],
                 format_func=lambda x: "Thu" if x == "income" else "Chi",
-                horizontal=True
+                horizontal=True,
+                key="add_transaction_form_type"
             )
             
             # Số tiền
-            amount = st.number_input(
+            st.number_input(
                 "Số tiền (VNĐ)",
                 min_value=1000.0,
                 step=10000.0,
-                format="%g"
+                format="%g",
+                key="add_transaction_form_amount"
             )
             
             # Mô tả
-            description = st.text_input("Mô tả")
+            st.text_input("Mô tả", key="add_transaction_form_description")
             
             # Danh mục
-            category = st.selectbox(
+            st.selectbox(
                 "Danh mục",
-                options=utils.CATEGORIES[transaction_type]
+                options=utils.CATEGORIES[transaction_type],
+                key="add_transaction_form_category"
             )
             
             # Ngày tháng
-            date = st.date_input("Ngày")
+            st.date_input("Ngày", key="add_transaction_form_date")
             
-            # Nút thêm
+            # Ảnh hóa đơn (không bắt buộc)
+            st.file_uploader(
+                "Ảnh hóa đơn",
+                type=list(receipts.RECEIPT_TYPES),
+                key="add_transaction_form_receipt"
+            )
+            
+            # Nút thêm (lưu trong callback, trước khi fragment chạy lại)
             button_label = "Thêm khoản thu" if transaction_type == "income" else "Thêm khoản chi"
             
             submitted = st.form_submit_button(
                 button_label,
                 use_container_width=True,
-                type="primary"
+                type="primary",
+                on_click=utils.submit_transaction_form,
+                args=("add_transaction_form",)
             )
             
             if submitted:
-                # Validate
-                if not description or amount <= 0:
-                    st.error("Vui lòng điền đầy đủ thông tin và số tiền hợp lệ")
-                else:
-                    # Thêm giao dịch
-                    transaction_data = {
-                        'type': transaction_type,
-                        'amount': amount,
-                        'description': description,
-                        'category': category,
-                        'date': date.strftime("%Y-%m-%d")
-                    }
-                    
-                    utils.add_transaction(transaction_data)
-                    st.success("Đã thêm giao dịch thành công!")
-                    st.rerun() # Changed here
+                utils.show_form_feedback("add_transaction_form")
 
 
 def show_transactions_page():
     # Container chính
     st.markdown("<h2>Quản lý giao dịch</h2>", unsafe_allow_html=True)
     
+    # Bộ lọc, phân trang, xóa và thêm giao dịch chỉ chạy lại phần này
+    show_transactions_panel()
+
+@utils.fragment
+@utils.timed("fragment.transactions")
+def show_transactions_panel():
     # Layout: 2 cột (tỉ lệ 2:1)
     col_left, col_right = st.columns([2, 1])
     
@@ -214,7 +276,7 @@ def show_transactions_page():
         st.markdown("<h3>Lịch sử giao dịch</h3>", unsafe_allow_html=True)
         
         # Bộ lọc
-        filter_cols = st.columns([2, 1])
+        filter_cols = st.columns([2, 1, 1])
         with filter_cols[0]:
             search = st.text_input("Tìm kiếm giao dịch", placeholder="Nhập từ khóa...")
         with filter_cols[1]:
@@ -223,58 +285,25 @@ def show_transactions_page():
                 options=["all", "income", "expense"],
                 format_func=lambda x: "Tất cả" if x == "all" else ("Thu" if x == "income" else "Chi")
             )
+        with filter_cols[2]:
+            sort = st.selectbox(
+                "Sắp xếp",
+                options=list(utils.SORT_OPTIONS),
+                format_func=utils.SORT_OPTIONS.get,
+                disabled=bool(search)  # Kết quả tìm kiếm xếp theo mức độ liên quan
+            )
         
-        # Lọc danh sách giao dịch
-        filtered_transactions = st.session_state.transactions
-        
-        # Lọc theo loại giao dịch
-        if transaction_type_filter != "all":
-            filtered_transactions = [t for t in filtered_transactions if t['type'] == transaction_type_filter]
-        
-        # Lọc theo từ khóa
-        if search:
-            filtered_transactions = [
-                t for t in filtered_transactions 
-                if search.lower() in t['description'].lower() or search.lower() in t['category'].lower()
-            ]
-        
-        # Tạo dataframe
-        df = utils.get_transaction_df(filtered_transactions)
+        # Lọc danh sách giao dịch (trong SQL, mỗi lần một trang)
+        page = utils.get_transaction_page(
+            "transactions",
+            transaction_type=None if transaction_type_filter == "all" else transaction_type_filter,
+            search=search or None,
+            sort=sort
+        )
         
         # Hiển thị danh sách giao dịch
-        if not df.empty:
-            st.markdown("<div style='max-height: 600px; overflow-y: auto;'>", unsafe_allow_html=True)
-            
-            for _, row in df.iterrows():
-                cols = st.columns([3, 2, 2, 2, 1])
-                
-                # Format row
-                icon = "⬇️" if row['type'] == 'income' else "⬆️"
-                color = "green" if row['type'] == 'income' else "red"
-                
-                cols[0].markdown(f"<div style='display: flex; align-items: center;'><span>{icon}</span><span style='margin-left: 5px;'>{row['description']}</span></div>", unsafe_allow_html=True)
-                cols[1].markdown(f"{row['category']}")
-                cols[2].markdown(f"{row['date']}")
-                cols[3].markdown(f"<span style='color: {color};'>{row['amount_display']}</span>", unsafe_allow_html=True)
-                
-                # Nút xóa
-                if cols[4].button("🗑️", key=f"delete_{row['id']}"):
-                    # Xác nhận xóa
-                    delete_confirm = st.warning(f"Bạn có chắc chắn muốn xóa giao dịch '{row['description']}'?")
-                    col1, col2 = st.columns(2)
-                    
-                    if col1.button("Xác nhận", key=f"confirm_{row['id']}"):
-                        utils.delete_transaction(row['id'])
-                        st.success("Đã xóa giao dịch!")
-                        st.rerun() # Changed here
-                    
-                    if col2.button("Hủy", key=f"cancel_{row['id']}"):
-                        st.rerun() # Changed here
-                
-                # Đường phân cách
-                st.markdown("<hr style='margin: 5px 0; opacity: 0.3;'>", unsafe_allow_html=True)
-            
-            st.markdown("</div>", unsafe_allow_html=True)
+        if page['transactions']:
+            utils.show_transaction_list("transactions", page, confirm_delete=True, height=600)
         else:
             st.info("Không có giao dịch nào")
     
@@ -289,62 +318,65 @@ def show_transactions_page():
                 "Loại giao dịch",
                 options=["income", "expense"],
                 format_func=lambda x: "Thu" if x == "income" else "Chi",
-                horizontal=True
+                horizontal=True,
+                key="add_transaction_form_page_type"
             )
             
             # Số tiền
-            amount = st.number_input(
+            st.number_input(
                 "Số tiền (VNĐ)",
                 min_value=1000.0,
                 step=10000.0,
-                format="%g"
+                format="%g",
+                key="add_transaction_form_page_amount"
             )
             
             # Mô tả
-            description = st.text_input("Mô tả")
+            st.text_input("Mô tả", key="add_transaction_form_page_description")
             
             # Danh mục
-            category = st.selectbox(
+            st.selectbox(
                 "Danh mục",
-                options=utils.CATEGORIES[transaction_type]
+                options=utils.CATEGORIES[transaction_type],
+                key="add_transaction_form_page_category"
             )
             
             # Ngày tháng
-            date = st.date_input("Ngày")
+            st.date_input("Ngày", key="add_transaction_form_page_date")
+            
+            # Ảnh hóa đơn (không bắt buộc)
+            st.file_uploader(
+                "Ảnh hóa đơn",
+                type=list(receipts.RECEIPT_TYPES),
+                key="add_transaction_form_page_receipt"
+            )
             
-            # Nút thêm
+            # Nút thêm (lưu trong callback, trước khi fragment chạy lại)
             button_label = "Thêm khoản thu" if transaction_type == "income" else "Thêm khoản chi"
             
             submitted = st.form_submit_button(
                 button_label,
                 use_container_width=True,
-                type="primary"
+                type="primary",
+                on_click=utils.submit_transaction_form,
+                args=("add_transaction_form_page",)
             )
             
             if submitted:
-                # Validate
-                if not description or amount <= 0:
-                    st.error("Vui lòng điền đầy đủ thông tin và số tiền hợp lệ")
-                else:
-                    # Thêm giao dịch
-                    transaction_data = {
-                        'type': transaction_type,
-                        'amount': amount,
-                        'description': description,
-                        'category': category,
-                        'date': date.strftime("%Y-%m-%d")
-                    }
-                    
-                    utils.add_transaction(transaction_data)
-                    st.success("Đã thêm giao dịch thành công!")
-                    st.rerun() # Changed here
+                utils.show_form_feedback("add_transaction_form_page")
         
         st.markdown("</div>", unsafe_allow_html=True)
 
 def show_reports_page():
     # Container chính
-    st.markdown("<h2>Báo cáo tháng</h2>", unsafe_allow_html=True)
+    st.markdown("<h2>Báo cáo</h2>", unsafe_allow_html=True)
     
+    # Đổi kỳ báo cáo, sắp xếp và xóa giao dịch chỉ chạy lại phần này
+    show_reports_panel()
+
+@utils.fragment
+@utils.timed("fragment.reports")
+def show_reports_panel():
     # Lấy danh sách các tháng
     months = utils.get_all_months()
     
@@ -353,22 +385,21 @@ def show_reports_page():
         st.warning("Chưa có dữ liệu giao dịch để tạo báo cáo")
         return
     
-    # Chọn tháng
-    selected_month = st.selectbox(
-        "Chọn tháng",
-        options=months,
-        format_func=lambda x: f"{x[5:7]}/{x[:4]}"  # Format MM/YYYY
-    )
+    # Chọn kiểu báo cáo (tháng, quý, mùa giải, năm, khoảng ngày) và kỳ
+    selection = utils.show_report_period_picker("report")
+    if selection is None:
+        return
     
-    # Lấy báo cáo tháng đã chọn
-    report = utils.get_monthly_report(selected_month)
+    # Lấy báo cáo kỳ đã chọn, kèm so sánh với kỳ trước
+    report = utils.get_period_report(*selection)
+    utils.show_period_comparison(report)
     
     # Hiển thị tóm tắt và biểu đồ
     col1, col2 = st.columns(2)
     
     # Card tổng quan
     with col1:
-        st.markdown("<h3>Tổng quan tháng</h3>", unsafe_allow_html=True)
+        st.markdown(f"<h3>Tổng quan {report['label']}</h3>", unsafe_allow_html=True)
         
         # Tạo card tổng quan
         st.markdown(f"""
@@ -397,49 +428,156 @@ def show_reports_page():
     with col2:
         st.markdown("<h3>Chi tiêu theo danh mục</h3>", unsafe_allow_html=True)
         
-        # Lấy chi tiêu theo danh mục
-        expense_by_category = utils.get_expense_by_category(report['transactions'])
+        # Chi tiêu theo danh mục của kỳ
+        expense_by_category = report['expense_by_category']
         
         if expense_by_category:
             fig = utils.plot_category_pie(expense_by_category)
             st.plotly_chart(fig, use_container_width=True)
         else:
-            st.info("Không có dữ liệu chi tiêu trong tháng này")
+            st.info("Không có dữ liệu chi tiêu trong kỳ này")
     
-    # Danh sách giao dịch trong tháng
-    st.markdown("<h3>Giao dịch trong tháng</h3>", unsafe_allow_html=True)
+    # Danh sách giao dịch trong kỳ
+    st.markdown("<h3>Giao dịch trong kỳ</h3>", unsafe_allow_html=True)
     
-    # Tạo dataframe
-    df = utils.get_transaction_df(report['transactions'])
+    # Sắp xếp
+    sort = st.selectbox(
+        "Sắp xếp",
+        options=list(utils.SORT_OPTIONS),
+        format_func=utils.SORT_OPTIONS.get,
+        key="report_sort"
+    )
     
     # Hiển thị danh sách giao dịch
-    if not df.empty:
-        st.markdown("<div style='max-height: 400px; overflow-y: auto;'>", unsafe_allow_html=True)
-        
-        for _, row in df.iterrows():
-            cols = st.columns([3, 2, 2, 2, 1])
-            
-            # Format row
-            icon = "⬇️" if row['type'] == 'income' else "⬆️"
-            color = "green" if row['type'] == 'income' else "red"
-            
-            cols[0].markdown(f"<div style='display: flex; align-items: center;'><span>{icon}</span><span style='margin-left: 5px;'>{row['description']}</span></div>", unsafe_allow_html=True)
-            cols[1].markdown(f"{row['category']}")
-            cols[2].markdown(f"{row['date']}")
-            cols[3].markdown(f"<span style='color: {color};'>{row['amount_display']}</span>", unsafe_allow_html=True)
-            
-            # Nút xóa
-            if cols[4].button("🗑️", key=f"delete_report_{row['id']}"):
-                utils.delete_transaction(row['id'])
-                st.rerun() # Changed here
-            
-            # Đường phân cách
-            st.markdown("<hr style='margin: 5px 0; opacity: 0.3;'>", unsafe_allow_html=True)
-        
-        st.markdown("</div>", unsafe_allow_html=True)
+    page = utils.get_transaction_page("report", start=report['start'], end=report['end'], sort=sort)
+    if page['transactions']:
+        utils.show_transaction_list("report", page)
     else:
-        st.info("Không có giao dịch nào trong tháng này")
+        st.info("Không có giao dịch nào trong kỳ này")
+
+def show_import_page():
+    # Container chính
+    st.markdown("<h2>Nhập dữ liệu</h2>", unsafe_allow_html=True)
+
+    st.markdown(
+        "Tải lên tệp CSV hoặc Excel (.xlsx) với các cột "
+        "`type` (income/expense hoặc Thu/Chi), `amount` (số đồng nguyên, ví dụ 100000, 100.000, 500k hoặc 1,5tr), `description`, `category`, `date` (YYYY-MM-DD hoặc DD/MM/YYYY)."
+    )
+
+    # Danh mục hợp lệ
+    with st.expander("Danh mục hợp lệ"):
+        st.markdown(f"**Thu:** {', '.join(utils.CATEGORIES['income'])}")
+        st.markdown(f"**Chi:** {', '.join(utils.CATEGORIES['expense'])}")
+
+    uploaded_file = st.file_uploader("Chọn tệp", type=["csv", "xlsx"])
+
+    if uploaded_file is not None and st.button("Nhập giao dịch", type="primary"):
+        try:
+            with st.spinner("Đang nhập dữ liệu..."):
+                result = importer.import_transactions(uploaded_file, uploaded_file.name)
+        except Exception as e:
+            st.error(f"Không thể nhập tệp: {e}")
+            return
+
+        if result['imported']:
+            st.success(f"Đã nhập {result['imported']:,} giao dịch")
+        else:
+            st.warning("Không có giao dịch hợp lệ nào trong tệp")
+
+        # Các dòng bị bỏ qua
+        if result['error_count']:
+            st.warning(f"Bỏ qua {result['error_count']:,} dòng không hợp lệ")
+            st.dataframe(
+                [{'Dòng': e['line'], 'Lỗi': e['error']} for e in result['errors']],
+                hide_index=True,
+                use_container_width=True
+            )
+
+def show_export_page():
+    # Container chính
+    st.markdown("<h2>Xuất dữ liệu</h2>", unsafe_allow_html=True)
+
+    # Bộ lọc
+    filter_cols = st.columns([1, 1, 1])
+    with filter_cols[0]:
+        use_dates = st.checkbox("Lọc theo ngày", key="export_use_dates")
+        start_date = st.date_input("Từ ngày", key="export_start", disabled=not use_dates)
+        end_date = st.date_input("Đến ngày", key="export_end", disabled=not use_dates)
+    with filter_cols[1]:
+        transaction_type = st.selectbox(
+            "Loại giao dịch",
+            options=["all", "income", "expense"],
+            format_func=lambda x: "Tất cả" if x == "all" else ("Thu" if x == "income" else "Chi"),
+            key="export_type"
+        )
+    with filter_cols[2]:
+        fmt = st.radio(
+            "Định dạng",
+            options=list(exporter.EXPORT_FORMATS),
+            format_func=lambda x: exporter.EXPORT_FORMATS[x][0],
+            key="export_format"
+        )
+
+    if use_dates and start_date > end_date:
+        st.error("Ngày bắt đầu phải trước ngày kết thúc")
+        return
+
+    # Chỉ tạo tệp khi bấm nút; dữ liệu được đọc và ghi theo từng khối
+    if st.button("Tạo tệp xuất", type="primary", key="export_build"):
+        start = start_date.isoformat() if use_dates else None
+        end = end_date.isoformat() if use_dates else None
+        filters = dict(start=start, end=end, transaction_type=None if transaction_type == "all" else transaction_type)
+        file_name = f"quy_doi_bong_{start or 'tat_ca'}_{end or 'tat_ca'}.{fmt}"
+
+        # Tệp được phục vụ thẳng từ đĩa qua static serving; nếu tắt thì dùng
+        # download_button (Streamlit giữ cả tệp trong bộ nhớ)
+        if not st.get_option("server.enableStaticServing"):
+            show_export_download_button(fmt, file_name, filters)
+            return
+
+        try:
+            with st.spinner("Đang xuất dữ liệu..."):
+                count, url = exporter.export_to_static_file(fmt, **filters)
+        except Exception as e:
+            st.error(f"Không thể xuất dữ liệu: {e}")
+            return
+
+        if not count:
+            st.info("Không có giao dịch nào phù hợp")
+            return
+
+        st.success(f"Đã xuất {count:,} giao dịch")
+        st.markdown(
+            f'<a href="{url}" download="{file_name}" target="_self">⬇️ Tải xuống</a>'
+            f" <small>(liên kết có hiệu lực {exporter.EXPORT_FILE_MAX_AGE_SECONDS // 60} phút)</small>",
+            unsafe_allow_html=True
+        )
+
+def show_export_download_button(fmt, file_name, filters):
+    with tempfile.TemporaryFile() as out:
+        try:
+            with st.spinner("Đang xuất dữ liệu..."):
+                count = exporter.export_transactions(out, fmt, **filters)
+        except Exception as e:
+            st.error(f"Không thể xuất dữ liệu: {e}")
+            return
+
+        if not count:
+            st.info("Không có giao dịch nào phù hợp")
+            return
+
+        st.success(f"Đã xuất {count:,} giao dịch")
+        out.seek(0)
+        st.download_button(
+            "⬇️ Tải xuống",
+            data=out.read(),
+            file_name=file_name,
+            mime=exporter.EXPORT_FORMATS[fmt][1],
+            key="export_download"
+        )
 
 # Main
 if __name__ == "__main__":
     main()
+    # Đo thời gian render (lần đầu được so với ngân sách khởi động)
+    utils.record_render_time(_run_started)
@@ -0,0 +1,271 @@
+"""Online backups of the ledger database with rotated snapshots.
+
+Snapshots are taken with SQLite's online backup API while the app keeps
+running: pages are copied BACKUP_PAGES_PER_STEP at a time with a short
+sleep in between, so writers are never blocked for long. Each snapshot is
+checked with `PRAGMA quick_check` before it is moved into place under
+backups/ as <name>-<YYYYmmdd-HHMMSS-ffffff>.db, and older snapshots are pruned:
+the newest BACKUP_KEEP_LAST are kept, plus the newest one of each of the
+last BACKUP_KEEP_DAILY days. Every fund other than the default one keeps
+its snapshots in backups/funds/<fund>/.
+
+Usage:
+    python backup.py snapshot            # take one snapshot now
+    python backup.py list
+    python backup.py restore backups/data-20250101-120000-000000.db
+    python backup.py prune
+    python backup.py --fund doi-tre snapshot
+
+The app snapshots every fund on a background thread when
+QUYDOIBONG_BACKUP_INTERVAL (seconds) is set.
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import utils
+
+BACKUP_DIR = "backups"
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_SLEEP_SECONDS = 0.005
+BACKUP_MAX_RESTARTS = 5
+BACKUP_KEEP_LAST = 24
+BACKUP_KEEP_DAILY = 30
+# Microseconds, so a scheduled and a manual snapshot taken in the same
+# second get different names instead of one replacing the other
+BACKUP_TIMESTAMP_FORMAT = "%Y%m%d-%H%M%S-%f"
+SNAPSHOT_NAME_PATTERN = re.compile(r"^(?P<stem>.+)-(?P<taken_at>\d{8}-\d{6}-\d{6})\.db$")
+
+def fund_backup_dir(fund: str, backup_dir: str = BACKUP_DIR) -> str:
+    """Snapshot directory of a fund; per-fund subdirectories keep same-named files apart."""
+    if fund == utils.DEFAULT_FUND:
+        return backup_dir
+    return os.path.join(backup_dir, "funds", fund)
+
+class BackupRestarted(Exception):
+    """The source kept changing under an incremental backup."""
+
+def _snapshot_name(db_file: str, taken_at: datetime) -> str:
+    stem = os.path.splitext(os.path.basename(db_file))[0]
+    return f"{stem}-{taken_at.strftime(BACKUP_TIMESTAMP_FORMAT)}.db"
+
+def _check(path: str) -> None:
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute("PRAGMA quick_check").fetchone()[0]
+    finally:
+        conn.close()
+    if result != "ok":
+        raise sqlite3.DatabaseError(f"{path} failed quick_check: {result}")
+
+def _copy(source: sqlite3.Connection, target: sqlite3.Connection, pages: int) -> None:
+    """Runs the backup; aborts once SQLite has restarted it BACKUP_MAX_RESTARTS times.
+
+    SQLite restarts an incremental backup whenever another connection
+    writes to the source between steps, which a busy ledger can do forever.
+    """
+    state = {'remaining': None, 'restarts': 0}
+
+    def progress(status, remaining, total):
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > BACKUP_MAX_RESTARTS:
+                raise BackupRestarted(f"backup restarted {state['restarts']} times")
+        state['remaining'] = remaining
+
+    source.backup(target, pages=pages, progress=progress, sleep=BACKUP_SLEEP_SECONDS)
+
+@utils.timed("backup.snapshot")
+def take_snapshot(db_file: Optional[str] = None, backup_dir: str = BACKUP_DIR) -> str:
+    """Copies the live database into a new verified snapshot and returns its path."""
+    db_file = db_file or utils.DB_FILE
+    os.makedirs(backup_dir, exist_ok=True)
+    path = os.path.join(backup_dir, _snapshot_name(db_file, datetime.now()))
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    source = sqlite3.connect(db_file, timeout=utils.DB_TIMEOUT_SECONDS)
+    target = sqlite3.connect(tmp_path)
+    try:
+        try:
+            _copy(source, target, BACKUP_PAGES_PER_STEP)
+        except BackupRestarted:
+            # One step copies from a single read transaction; in WAL mode that
+            # still doesn't block writers, it only pins the snapshot longer
+            utils.logger.warning("backup: %s too busy for incremental copy, copying in one step", db_file)
+            _copy(source, target, -1)
+        # A snapshot is one self-contained file, not a WAL database
+        target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        target.close()
+        source.close()
+
+    try:
+        _check(tmp_path)
+    except sqlite3.DatabaseError:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    utils.logger.info("backup: wrote %s", path)
+    return path
+
+def list_snapshots(db_file: Optional[str] = None, backup_dir: str = BACKUP_DIR) -> List[Dict]:
+    """Snapshots of `db_file`, newest first."""
+    stem = os.path.splitext(os.path.basename(db_file or utils.DB_FILE))[0]
+    snapshots = []
+    if not os.path.isdir(backup_dir):
+        return snapshots
+    for name in os.listdir(backup_dir):
+        match = SNAPSHOT_NAME_PATTERN.match(name)
+        if match is None or match['stem'] != stem:
+            continue
+        try:
+            taken_at = datetime.strptime(match['taken_at'], BACKUP_TIMESTAMP_FORMAT)
+        except ValueError:
+            continue
+        path = os.path.join(backup_dir, name)
+        snapshots.append({'path': path, 'taken_at': taken_at, 'size': os.path.getsize(path)})
+    return sorted(snapshots, key=lambda s: s['taken_at'], reverse=True)
+
+def prune_snapshots(db_file: Optional[str] = None, backup_dir: str = BACKUP_DIR,
+                    keep_last: int = BACKUP_KEEP_LAST, keep_daily: int = BACKUP_KEEP_DAILY) -> List[str]:
+    """Deletes snapshots outside the retention policy; returns the removed paths."""
+    snapshots = list_snapshots(db_file, backup_dir)
+    keep = {s['path'] for s in snapshots[:keep_last]}
+    days = set()
+    for snapshot in snapshots:  # Newest first, so the first of each day is its newest
+        day = snapshot['taken_at'].date()
+        if day not in days and len(days) < keep_daily:
+            days.add(day)
+            keep.add(snapshot['path'])
+    removed = [s['path'] for s in snapshots if s['path'] not in keep]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+def restore_snapshot(snapshot: str, db_file: Optional[str] = None) -> None:
+    """Replaces the contents of `db_file` with `snapshot`.
+
+    The copy goes through the backup API into the live file, so it takes
+    SQLite's locks and leaves the WAL consistent, unlike copying files over
+    a database that is open. Queued writes are flushed and pooled
+    connections closed first, the schema is migrated if the snapshot is
+    older, and the ledger cache is invalidated. Other processes (e.g. a
+    running app while this runs from the CLI) keep their in-process caches
+    until their next write, so restart them after a restore.
+    """
+    db_file = db_file or utils.DB_FILE
+    _check(snapshot)
+    utils.close_all_connections()
+
+    source = sqlite3.connect(snapshot)
+    target = sqlite3.connect(db_file, timeout=utils.DB_TIMEOUT_SECONDS)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+    utils.migrate_database(db_file)
+    utils.ledger_written(db_file)
+    utils.logger.info("backup: restored %s from %s", db_file, snapshot)
+
+# --- Scheduler ---
+class BackupScheduler:
+    """Takes a snapshot every `interval` seconds and prunes old ones, on a daemon thread.
+
+    Without a `db_file` every fund is backed up, including funds created
+    after the scheduler started.
+    """
+
+    def __init__(self, db_file: Optional[str] = None, interval: float = 3600, backup_dir: str = BACKUP_DIR):
+        self.db_file = db_file
+        self.interval = interval
+        self.backup_dir = backup_dir
+        self.last_snapshot: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"backup:{self.db_file or 'funds'}", daemon=True)
+
+    def targets(self) -> List[Tuple[str, str]]:
+        """(database file, snapshot directory) pairs to back up on the next run."""
+        if self.db_file is not None:
+            return [(self.db_file, self.backup_dir)]
+        return [(utils.fund_db_file(fund), fund_backup_dir(fund, self.backup_dir)) for fund in utils.list_funds()]
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.last_error = None
+            for db_file, backup_dir in self.targets():
+                try:
+                    self.last_snapshot = take_snapshot(db_file, backup_dir)
+                    prune_snapshots(db_file, backup_dir)
+                except Exception as e:  # Keep the schedule alive; the next run retries
+                    self.last_error = str(e)
+                    utils.logger.exception("backup: snapshot of %s failed", db_file)
+
+_schedulers: Dict[str, BackupScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+def start_scheduler_from_env() -> Optional[BackupScheduler]:
+    """Starts the backup thread for all funds once per process if QUYDOIBONG_BACKUP_INTERVAL is set."""
+    interval = os.environ.get("QUYDOIBONG_BACKUP_INTERVAL")
+    if not interval:
+        return None
+    with _schedulers_lock:
+        scheduler = _schedulers.get(BACKUP_DIR)
+        if scheduler is None:
+            scheduler = _schedulers[BACKUP_DIR] = BackupScheduler(interval=float(interval))
+            scheduler.start()
+    return scheduler
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Snapshots and restores of the ledger database")
+    parser.add_argument("--db", default=utils.DB_FILE, help="database file (default: %(default)s)")
+    parser.add_argument("--dir", default=BACKUP_DIR, help="snapshot directory (default: %(default)s)")
+    parser.add_argument("--fund", help="work on this fund's database instead of --db")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("snapshot", help="take a snapshot now and prune old ones")
+    commands.add_parser("list", help="list snapshots, newest first")
+    commands.add_parser("prune", help="delete snapshots outside the retention policy")
+    restore = commands.add_parser("restore", help="replace the database with a snapshot")
+    restore.add_argument("snapshot")
+    args = parser.parse_args()
+
+    if args.fund:
+        try:
+            args.db = utils.fund_db_file(args.fund)
+        except ValueError as e:
+            parser.error(str(e))
+        args.dir = fund_backup_dir(args.fund, args.dir)
+    else:
+        utils.DB_FILE = args.db
+    if args.command == "snapshot":
+        started = time.perf_counter()
+        path = take_snapshot(args.db, args.dir)
+        print(f"Snapshot {path} ({os.path.getsize(path):,} bytes, {time.perf_counter() - started:.2f} s)")
+        for removed in prune_snapshots(args.db, args.dir):
+            print(f"Pruned {removed}")
+    elif args.command == "list":
+        for snapshot in list_snapshots(args.db, args.dir):
+            print(f"{snapshot['taken_at']:%Y-%m-%d %H:%M:%S}  {snapshot['size']:>12,}  {snapshot['path']}")
+    elif args.command == "prune":
+        for removed in prune_snapshots(args.db, args.dir):
+            print(f"Pruned {removed}")
+    elif args.command == "restore":
+        restore_snapshot(args.snapshot, args.db)
+        print(f"Restored {args.db} from {args.snapshot}. Restart the app so running sessions reload.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Benchmarks utils.py and the page scripts against synthetic ledgers.
+
+Usage:
+    python benchmark.py --rows 10000 100000 --output benchmark_results.json
+
+Each ledger size gets its own temporary database filled by a deterministic
+generator, so two runs with the same --seed time exactly the same data and
+the JSON output can be diffed between commits.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Tuple
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+import utils  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+DEFAULT_ROWS = [10_000, 100_000]
+DEFAULT_REPEAT = 5
+DEFAULT_SEED = 42
+LEDGER_END = date(2025, 6, 30)
+LEDGER_YEARS = 5
+INSERT_BATCH_SIZE = 10_000
+APPTEST_TIMEOUT_SECONDS = 600
+
+DESCRIPTIONS = {
+    'income': ["Đóng quỹ tháng", "Tài trợ giải đấu", "Tiền phạt đi muộn", "Thu khác", "Ủng hộ sinh nhật"],
+    'expense': ["Thuê sân tối thứ 5", "Mua nước uống", "Mua bóng mới", "Liên hoan cuối tháng", "Áo đấu", "Phí trọng tài"],
+}
+
+# --- Synthetic ledger ---
+def generate_ledger(rows: int, seed: int = DEFAULT_SEED) -> Iterator[Tuple]:
+    """Yields `rows` transaction tuples spread over LEDGER_YEARS and every CATEGORIES entry."""
+    rng = random.Random(seed)
+    days = LEDGER_YEARS * 365
+    for _ in range(rows):
+        transaction_type = 'income' if rng.random() < 0.35 else 'expense'
+        day = LEDGER_END - timedelta(days=rng.randrange(days))
+        yield (
+            str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            transaction_type,
+            rng.randint(1, 100) * 10_000,
+            f"{rng.choice(DESCRIPTIONS[transaction_type])} #{rng.randrange(1000)}",
+            rng.choice(utils.CATEGORIES[transaction_type]),
+            day.isoformat(),
+            None,
+        )
+
+def build_database(path: str, rows: int, seed: int) -> None:
+    """Creates a migrated database at `path` holding the synthetic ledger."""
+    utils.close_all_connections()
+    utils.DB_FILE = path
+    with utils.get_connection(path) as conn:
+        batch = []
+        for transaction in generate_ledger(rows, seed):
+            batch.append(utils.encode_transaction(transaction))
+            if len(batch) == INSERT_BATCH_SIZE:
+                conn.executemany(utils.INSERT_TRANSACTION_SQL, batch)
+                batch.clear()
+        if batch:
+            conn.executemany(utils.INSERT_TRANSACTION_SQL, batch)
+        conn.commit()
+        conn.execute("PRAGMA optimize")
+    utils.get_ledger_cache(path).bump()
+
+# --- Timing ---
+def summarize(timings: List[float]) -> Dict[str, float]:
+    ordered = sorted(timings)
+    return {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0], 3),
+        'median_ms': round(statistics.median(ordered), 3),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'p95_ms': round(utils._percentile(ordered, 95), 3),
+        'max_ms': round(ordered[-1], 3),
+    }
+
+def measure(func: Callable, repeat: int, setup: Callable = None, warmup: int = 0) -> Dict[str, float]:
+    # Untimed warm-up calls keep one-off costs (e.g. the deferred pandas
+    # import) out of the samples
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return summarize(timings)
+
+def _utils_script():
+    """AppTest script: times the utils helpers inside a real script run.
+
+    update_summary and add/delete write to st.session_state, which only
+    works while a script is running, so the timings happen here and are
+    handed back through session state.
+    """
+    import os
+    import streamlit as st
+    import benchmark
+    import utils
+
+    repeat = int(os.environ["BENCHMARK_REPEAT"])
+    cache = utils.get_ledger_cache()
+    months = utils.get_all_months()
+    month = months[len(months) // 2]
+    transactions = utils.fetch_transactions_from_db()
+
+    def add_and_delete():
+        marker = f"benchmark-{utils.uuid.uuid4()}"
+        utils.add_transaction({'type': 'expense', 'amount': 50_000, 'description': marker, 'category': 'Nước uống', 'date': benchmark.LEDGER_END.isoformat()})
+        with utils.get_connection() as conn:
+            transaction_id = conn.execute("SELECT id FROM transactions WHERE description = ?", (marker,)).fetchone()[0]
+        utils.delete_transaction(transaction_id)
+
+    st.session_state.bench_results = {
+        'fetch_transactions_from_db': benchmark.measure(utils.fetch_transactions_from_db, repeat),
+        'update_summary.cold': benchmark.measure(utils.update_summary, repeat, setup=cache.bump),
+        'update_summary.warm': benchmark.measure(utils.update_summary, repeat),
+        'get_monthly_report.cold': benchmark.measure(lambda: utils.get_monthly_report(month), repeat, setup=cache.bump),
+        'get_monthly_report.warm': benchmark.measure(lambda: utils.get_monthly_report(month), repeat),
+        'get_expense_by_category.cold': benchmark.measure(utils.get_expense_by_category, repeat, setup=cache.bump),
+        'get_expense_by_category.month.cold': benchmark.measure(lambda: utils.get_expense_by_category(month), repeat, setup=cache.bump),
+        'get_period_report.month.cold': benchmark.measure(lambda: utils.get_period_report('month', month), repeat, setup=cache.bump),
+        'get_period_report.year.cold': benchmark.measure(lambda: utils.get_period_report('year', month[:4]), repeat, setup=cache.bump),
+        'get_period_report.range.cold': benchmark.measure(
+            lambda: utils.get_period_report('range', (f"{month}-10", utils.period_bounds('year', month[:4])[1])), repeat, setup=cache.bump
+        ),
+        'query_transactions.first_page.cold': benchmark.measure(utils.query_transactions, repeat, setup=cache.bump),
+        'get_transaction_df.all_rows': benchmark.measure(lambda: utils.get_transaction_df(transactions), repeat, warmup=1),
+        'add_and_delete_transaction': benchmark.measure(add_and_delete, repeat),
+    }
+
+# app.py runs top to bottom on every rerun, so its module is dropped first to
+# keep set_page_config/initialize_data in the timed path like a real session.
+APP_PAGE_SCRIPT = "import sys\nsys.modules.pop('app', None)\nimport app\napp.{}()"
+
+PAGE_SCRIPTS = {
+    'app.home': None,  # app.py as served, which lands on "Tổng quan"
+    'app.transactions': APP_PAGE_SCRIPT.format("show_transactions_page"),
+    'app.reports': APP_PAGE_SCRIPT.format("show_reports_page"),
+    'app.import': APP_PAGE_SCRIPT.format("show_import_page"),
+    'pages.trang_chu': "from pages import trang_chu\ntrang_chu.show()",
+    'pages.giao_dich': "from pages import giao_dich\ngiao_dich.show()",
+    'pages.bao_cao': "from pages import bao_cao\nbao_cao.show()",
+}
+
+def _page_test(script) -> AppTest:
+    if script is None:
+        return AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=APPTEST_TIMEOUT_SECONDS)
+    return AppTest.from_string(script, default_timeout=APPTEST_TIMEOUT_SECONDS)
+
+def benchmark_pages(repeat: int) -> Dict[str, Dict]:
+    """Times a fresh session's first run and a plain rerun of every page script."""
+    results = {}
+    for name, script in PAGE_SCRIPTS.items():
+        first_runs, reruns = [], []
+        for _ in range(repeat):
+            utils.get_ledger_cache().bump()
+            at = _page_test(script)
+            started = time.perf_counter()
+            at.run()
+            first_runs.append((time.perf_counter() - started) * 1000)
+            if at.exception:
+                raise RuntimeError(f"{name} raised: {at.exception[0].value}")
+            started = time.perf_counter()
+            at.run()
+            reruns.append((time.perf_counter() - started) * 1000)
+        results[f"{name}.first_run"] = summarize(first_runs)
+        results[f"{name}.rerun"] = summarize(reruns)
+    return results
+
+def benchmark_utils(repeat: int) -> Dict[str, Dict]:
+    os.environ["BENCHMARK_REPEAT"] = str(repeat)
+    at = AppTest.from_function(_utils_script, default_timeout=APPTEST_TIMEOUT_SECONDS)
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"utils benchmark raised: {at.exception[0].value}")
+    return at.session_state.bench_results
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="ledger sizes, e.g. 10000 100000 1000000")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed runs per benchmark")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="generator seed")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file to write")
+    parser.add_argument("--skip-pages", action="store_true", help="only time the utils helpers")
+    args = parser.parse_args()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'results': {},
+    }
+
+    os.chdir(ROOT)  # page scripts import app/pages relative to the repo
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            path = os.path.join(workdir, f"ledger_{rows}.db")
+            started = time.perf_counter()
+            build_database(path, rows, args.seed)
+            print(f"{rows:,} rows: generated in {time.perf_counter() - started:.1f} s")
+
+            results = benchmark_utils(args.repeat)
+            if not args.skip_pages:
+                results.update(benchmark_pages(args.repeat))
+            report['results'][str(rows)] = results
+
+            for name, stats in results.items():
+                print(f"  {name:<40} median {stats['median_ms']:>10.2f} ms   p95 {stats['p95_ms']:>10.2f} ms")
+            utils.close_all_connections()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
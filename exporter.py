@@ -0,0 +1,168 @@
+"""Export of the ledger to CSV, Excel (XLSX) or Parquet.
+
+Rows are streamed from one read cursor a chunk at a time and written as
+they arrive, so an export of any size only holds one chunk in memory.
+openpyxl and pyarrow are imported only when their format is chosen.
+
+The export page writes the file under EXPORT_STATIC_DIR, which Streamlit's
+static file server (server.enableStaticServing, .streamlit/config.toml)
+streams from disk. st.download_button would instead keep the whole file in
+the server's memory, which is only the fallback when static serving is off.
+"""
+import csv
+import io
+import os
+import sqlite3
+import time
+import uuid
+from typing import Iterator, List, Optional, Tuple
+
+import utils
+
+EXPORT_CHUNK_SIZE = 5000
+EXPORT_FORMATS = {
+    'csv': ("CSV", "text/csv"),
+    'xlsx': ("Excel (XLSX)", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    'parquet': ("Parquet", "application/vnd.apache.parquet"),
+}
+# Served at EXPORT_STATIC_URL; names are random and files are removed once
+# older than EXPORT_FILE_MAX_AGE_SECONDS
+EXPORT_STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "exports")
+EXPORT_STATIC_URL = "app/static/exports"
+EXPORT_FILE_MAX_AGE_SECONDS = 3600
+
+def iter_export_chunks(start: Optional[str] = None, end: Optional[str] = None, transaction_type: Optional[str] = None,
+                       chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[List[Tuple]]:
+    """Yield matching rows in date order, `chunk_size` at a time, from one open cursor.
+
+    `start` and `end` are inclusive YYYY-MM-DD bounds. The cursor is read
+    with fetchmany, so only one chunk is held in memory; in WAL mode the
+    read sees a consistent snapshot and does not block writers.
+    """
+    conditions, params = [], []
+    if transaction_type is not None:
+        conditions.append("t.type_code = ?")
+        params.append(utils.TYPE_CODES[transaction_type])
+    if start is not None:
+        conditions.append("t.day >= ?")
+        params.append(utils.day_number(start))
+    if end is not None:
+        conditions.append("t.day <= ?")
+        params.append(utils.day_number(end))
+    sql = utils.TRANSACTION_SELECT
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY t.day, t.id"
+
+    with utils.get_connection() as conn:
+        if conn is None:
+            raise sqlite3.Error(f"Could not open database {utils.active_db_file()}")
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+def _export_csv(chunks: Iterator[List[Tuple]], out) -> int:
+    # utf-8-sig so Excel opens the Vietnamese text correctly
+    text = io.TextIOWrapper(out, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text)
+    writer.writerow(utils.TRANSACTION_FIELDS)
+    count = 0
+    for rows in chunks:
+        writer.writerows(rows)
+        count += len(rows)
+    text.flush()
+    text.detach()  # Leave `out` open for the caller
+    return count
+
+def _export_xlsx(chunks: Iterator[List[Tuple]], out) -> int:
+    from openpyxl import Workbook
+
+    # Write-only workbooks stream rows to disk instead of keeping every cell
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Giao dịch")
+    sheet.append(utils.TRANSACTION_FIELDS)
+    count = 0
+    for rows in chunks:
+        for row in rows:
+            sheet.append(row)
+        count += len(rows)
+    workbook.save(out)
+    return count
+
+def _export_parquet(chunks: Iterator[List[Tuple]], out) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('id', pa.string()), ('type', pa.string()), ('amount', pa.int64()), ('description', pa.string()),
+        ('category', pa.string()), ('date', pa.date32()), ('image_url', pa.string()),
+    ])
+    count = 0
+    # One row group per chunk
+    with pq.ParquetWriter(out, schema, compression='zstd') as writer:
+        for rows in chunks:
+            arrays = [
+                # Dates are stored as ISO strings; parse them in one vectorized cast
+                pa.array(values, type=pa.string()).cast(pa.date32()) if field.name == 'date' else pa.array(values, type=field.type)
+                for values, field in zip(zip(*rows), schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            count += len(rows)
+    return count
+
+@utils.timed()
+def export_transactions(out, fmt: str, start: Optional[str] = None, end: Optional[str] = None,
+                        transaction_type: Optional[str] = None) -> int:
+    """Write the matching transactions to the binary file object `out` as CSV, XLSX or Parquet.
+
+    Rows stream from `iter_export_chunks`, so memory stays at one chunk
+    plus the writer's buffers however long the ledger is. Returns the
+    number of rows written.
+    """
+    writers = {'csv': _export_csv, 'xlsx': _export_xlsx, 'parquet': _export_parquet}
+    if fmt not in writers:
+        raise ValueError(f"Định dạng xuất không được hỗ trợ: {fmt}")
+    return writers[fmt](iter_export_chunks(start, end, transaction_type), out)
+
+def remove_old_exports(max_age: float = EXPORT_FILE_MAX_AGE_SECONDS) -> int:
+    """Delete exported files older than `max_age` seconds and return how many were removed."""
+    if not os.path.isdir(EXPORT_STATIC_DIR):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(EXPORT_STATIC_DIR):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:  # Removed by another session meanwhile
+            pass
+    return removed
+
+def export_to_static_file(fmt: str, start: Optional[str] = None, end: Optional[str] = None,
+                          transaction_type: Optional[str] = None) -> Tuple[int, Optional[str]]:
+    """Export to a new file under EXPORT_STATIC_DIR and return (row count, its URL).
+
+    The URL is relative to the app, as Streamlit's static files are, and is
+    None when no row matched (the file is not kept).
+    """
+    os.makedirs(EXPORT_STATIC_DIR, exist_ok=True)
+    remove_old_exports()
+    name = f"{uuid.uuid4().hex}.{fmt}"
+    path = os.path.join(EXPORT_STATIC_DIR, name)
+    partial = path + ".part"  # Never served under the final name half-written
+    try:
+        with open(partial, 'wb') as out:
+            count = export_transactions(out, fmt, start, end, transaction_type)
+        if not count:
+            os.remove(partial)
+            return 0, None
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return count, f"{EXPORT_STATIC_URL}/{name}"
@@ -0,0 +1,182 @@
+"""Bulk import of transactions from CSV and Excel files.
+
+Rows are read in chunks (pandas for CSV, openpyxl in read-only mode for
+XLSX), validated one by one and inserted with executemany in a single
+transaction. Headers may use the English field names or the Vietnamese
+labels shown in the app; invalid rows are reported by line number.
+"""
+import re
+import sqlite3
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterator, List, Tuple
+
+import utils
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_REPORTED_ERRORS = 50
+
+# Accepted header names (English or the Vietnamese labels used in the UI)
+IMPORT_COLUMN_ALIASES = {
+    'type': 'type', 'loại': 'type', 'loại giao dịch': 'type',
+    'amount': 'amount', 'số tiền': 'amount',
+    'description': 'description', 'mô tả': 'description',
+    'category': 'category', 'danh mục': 'category',
+    'date': 'date', 'ngày': 'date'
+}
+IMPORT_TYPE_ALIASES = {'income': 'income', 'thu': 'income', 'expense': 'expense', 'chi': 'expense'}
+IMPORT_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y")
+# Amounts are whole đồng written the Vietnamese way: "100.000" and
+# "1.250.000" are thousands groups, not decimals (a space or comma also
+# works as the group separator, used consistently). A decimal part is only
+# accepted when it is zero ("100000,00"); anything else is a row error
+# rather than a guess.
+IMPORT_AMOUNT_PATTERN = re.compile(
+    r"(?P<whole>\d{1,3}(?P<sep>[., ])\d{3}(?:(?P=sep)\d{3})*|\d+)(?:(?P<point>[.,])(?P<fraction>\d{1,2}))?"
+)
+# Shorthand with a unit, as typed in chat and notes: "1,5tr" is 1.500.000,
+# "500k" is 500.000. Here the comma or dot is a decimal point, and the
+# result must still be whole đồng. A trailing "đ", "₫" or "VND" is ignored.
+IMPORT_AMOUNT_UNITS = {'k': 1_000, 'nghìn': 1_000, 'ngàn': 1_000, 'tr': 1_000_000, 'triệu': 1_000_000}
+IMPORT_AMOUNT_UNIT_PATTERN = re.compile(
+    r"(?P<number>\d+(?:[.,]\d+)?)\s*(?P<unit>" + "|".join(IMPORT_AMOUNT_UNITS) + ")", re.IGNORECASE
+)
+IMPORT_CURRENCY_SUFFIX = re.compile(r"\s*(?:đ|₫|vnđ|vnd)$", re.IGNORECASE)
+
+def _iter_csv_chunks(file) -> Iterator[List[Dict]]:
+    for chunk in utils.pd.read_csv(file, chunksize=IMPORT_CHUNK_SIZE, dtype=str, keep_default_na=False):
+        chunk.columns = [IMPORT_COLUMN_ALIASES.get(str(c).strip().lower(), c) for c in chunk.columns]
+        yield chunk.to_dict('records')
+
+def _iter_xlsx_chunks(file) -> Iterator[List[Dict]]:
+    from openpyxl import load_workbook  # Only needed for Excel imports
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [IMPORT_COLUMN_ALIASES.get(str(c).strip().lower(), c) for c in header]
+        chunk = []
+        for values in rows:
+            if all(v is None for v in values):
+                continue
+            chunk.append(dict(zip(columns, values)))
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        workbook.close()
+
+def _parse_import_date(value) -> str:
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    text = str(value).strip()
+    for fmt in IMPORT_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    raise ValueError(f"ngày không hợp lệ '{text}'")
+
+def _parse_import_amount(value) -> int:
+    if isinstance(value, bool):
+        raise ValueError(f"số tiền không hợp lệ '{value}'")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        # Spreadsheet cells arrive as numbers; only whole đồng are valid
+        if not value.is_integer():
+            raise ValueError(f"số tiền phải là số đồng nguyên '{value}'")
+        return int(value)
+    text = str(value).strip().replace('\u00a0', ' ')
+    number = IMPORT_CURRENCY_SUFFIX.sub('', text)
+    unit_match = IMPORT_AMOUNT_UNIT_PATTERN.fullmatch(number)
+    if unit_match is not None:
+        amount = Decimal(unit_match.group('number').replace(',', '.')) * IMPORT_AMOUNT_UNITS[unit_match.group('unit').lower()]
+        if amount != amount.to_integral_value():
+            raise ValueError(f"số tiền phải là số đồng nguyên '{text}'")
+        return int(amount)
+    match = IMPORT_AMOUNT_PATTERN.fullmatch(number)
+    if match is None or match.group('point') is not None and match.group('point') == match.group('sep'):
+        # "1.000.50" mixes a group separator into the decimal part
+        raise ValueError(f"số tiền không hợp lệ '{text}'")
+    if match.group('fraction') and match.group('fraction').strip('0'):
+        raise ValueError(f"số tiền phải là số đồng nguyên '{text}'")
+    return int(re.sub(r"\D", "", match.group('whole')))
+
+def validate_import_row(row: Dict) -> Tuple:
+    """Validate one imported row and return it as an insert_transaction tuple.
+
+    Raises ValueError with a user-facing message if the row is invalid.
+    """
+    transaction_type = IMPORT_TYPE_ALIASES.get(str(row.get('type') or '').strip().lower())
+    if transaction_type is None:
+        raise ValueError(f"loại giao dịch không hợp lệ '{row.get('type')}'")
+
+    amount = _parse_import_amount(row.get('amount'))
+    if amount <= 0:
+        raise ValueError("số tiền phải lớn hơn 0")
+
+    category = str(row.get('category') or '').strip()
+    if category not in utils.CATEGORIES[transaction_type]:
+        raise ValueError(f"danh mục '{category}' không thuộc {', '.join(utils.CATEGORIES[transaction_type])}")
+
+    description = str(row.get('description') or '').strip()
+    if not description:
+        raise ValueError("thiếu mô tả")
+
+    return (str(uuid.uuid4()), transaction_type, amount, description, category, _parse_import_date(row.get('date')), None)
+
+@utils.timed()
+def import_transactions(file, file_name: str) -> Dict:
+    """Import transactions from an uploaded CSV or XLSX file.
+
+    Rows are streamed in chunks of IMPORT_CHUNK_SIZE and inserted with
+    executemany inside a single transaction, so either every valid row is
+    stored or none is. Invalid rows are skipped and reported by line number.
+    Aggregates are kept current by the triggers; the session summary is
+    refreshed once at the end.
+    """
+    if file_name.lower().endswith('.xlsx'):
+        chunks = _iter_xlsx_chunks(file)
+    elif file_name.lower().endswith('.csv'):
+        chunks = _iter_csv_chunks(file)
+    else:
+        raise ValueError("Chỉ hỗ trợ tệp CSV hoặc XLSX")
+
+    imported = 0
+    errors = []
+    error_count = 0
+    line = 1  # Header row
+    with utils.get_connection() as conn:
+        if conn is None:
+            raise sqlite3.Error(f"Could not open database {utils.active_db_file()}")
+        try:
+            for chunk in chunks:
+                valid = []
+                for row in chunk:
+                    line += 1
+                    try:
+                        valid.append(utils.encode_transaction(validate_import_row(row)))
+                    except ValueError as e:
+                        error_count += 1
+                        if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+                            errors.append({'line': line, 'error': str(e)})
+                if valid:
+                    conn.executemany(utils.INSERT_TRANSACTION_SQL, valid)
+                    imported += len(valid)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    if imported:
+        utils.ledger_written()
+        utils.update_summary()
+
+    return {'imported': imported, 'error_count': error_count, 'errors': errors}
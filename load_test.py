@@ -0,0 +1,277 @@
+"""Drives concurrent simulated sessions against the transactions page.
+
+Usage:
+    python load_test.py --sessions 8 --actions 50 --rows 20000
+
+Every session is an `AppTest` of app.py's transactions view. AppTest keeps a
+process-wide runtime, so each session runs in its own process; the sessions
+of a real server share one process and one ledger cache, which makes this a
+pessimistic bound on SQLite contention. Sessions mix reads, searches, adds
+and deletes against a temporary DB_FILE; afterwards the database is checked
+for lost writes and for drift in the trigger-maintained summary tables.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List
+
+import benchmark
+import utils
+from streamlit.testing.v1 import AppTest
+
+DEFAULT_SESSIONS = 8
+DEFAULT_ACTIONS = 50
+DEFAULT_ROWS = 20_000
+DEFAULT_MIX = {'read': 50, 'search': 20, 'add': 20, 'delete': 10}
+APPTEST_TIMEOUT_SECONDS = 120
+SEARCH_TERMS = ["sân", "nước", "bóng", "quỹ", "tài trợ", "áo"]
+
+# Same start-up path as app.py, then the "Giao dịch" view
+SESSION_SCRIPT = """
+import streamlit as st
+import utils
+import app
+if 'app_initialized' not in st.session_state:
+    utils.initialize_data()
+    st.session_state.app_initialized = True
+app.show_transactions_page()
+"""
+
+def _is_lock_error(message: str) -> bool:
+    message = message.lower()
+    return "locked" in message or "busy" in message
+
+class SessionStats:
+    """Per-action latencies and outcomes, merged across sessions at the end."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {action: [] for action in DEFAULT_MIX}
+        self.lock_errors = 0
+        self.other_errors: List[str] = []
+        self.added: List[str] = []    # markers whose add reported success
+        self.deleted: List[str] = []  # markers whose delete reported success
+
+class Session:
+    def __init__(self, number: int, seed: int):
+        self.number = number
+        self.rng = random.Random(seed)
+        self.stats = SessionStats()
+        self.pending: List[str] = []  # own rows still in the ledger
+        self.at = AppTest.from_string(SESSION_SCRIPT, default_timeout=APPTEST_TIMEOUT_SECONDS)
+
+    def _errors(self) -> List[str]:
+        return [str(e.value) for e in self.at.exception] + [str(e.value) for e in self.at.error]
+
+    def _check(self) -> bool:
+        errors = self._errors()
+        for message in errors:
+            if _is_lock_error(message):
+                self.stats.lock_errors += 1
+            else:
+                self.stats.other_errors.append(message)
+        return not errors
+
+    def _search(self, term: str) -> None:
+        self.at.text_input[0].set_value(term).run()
+
+    def read(self) -> bool:
+        self.at.run()
+        return self._check()
+
+    def search(self) -> bool:
+        self._search(self.rng.choice(SEARCH_TERMS))
+        ok = self._check()
+        self._search("")
+        return ok and self._check()
+
+    def add(self) -> bool:
+        marker = f"loadtest-{self.number}-{uuid.uuid4().hex[:12]}"
+        self.at.text_input(key="add_transaction_form_page_description").set_value(marker)
+        self.at.number_input(key="add_transaction_form_page_amount").set_value(float(self.rng.randint(1, 50) * 10_000))
+        self.at.button[-1].click().run()  # the form's submit button
+        ok = self._check() and any("thành công" in s.value for s in self.at.success)
+        if ok:
+            self.stats.added.append(marker)
+            self.pending.append(marker)
+        return ok
+
+    def delete(self) -> bool:
+        if not self.pending:
+            return self.add()
+        marker = self.pending.pop(self.rng.randrange(len(self.pending)))
+        self._search(marker)
+        if not self._check():
+            return False
+        try:
+            transaction_id = self.at.selectbox(key="transactions_delete_choice").value
+        except KeyError:  # Not committed yet (write-behind mode); retry later
+            self.pending.append(marker)
+            self._search("")
+            return False
+        self.at.button(key="transactions_delete").click().run()
+        self.at.button(key="transactions_confirm").click().run()
+        ok = self._check() and any("Đã xóa" in t.value for t in self.at.toast)
+        if ok:
+            self.stats.deleted.append(marker)
+        else:
+            self.pending.append(marker)
+        self._search("")
+        return ok and transaction_id is not None
+
+    def run(self, actions: int, mix: Dict[str, int], start) -> None:
+        try:
+            self.at.run()
+            self._check()
+        finally:
+            start.wait()
+        names, weights = list(mix), list(mix.values())
+        for _ in range(actions):
+            action = self.rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                getattr(self, action)()
+            except Exception as e:  # A failed AppTest run must not stop the session
+                if _is_lock_error(str(e)):
+                    self.stats.lock_errors += 1
+                else:
+                    self.stats.other_errors.append(f"{action}: {e!r}")
+            self.stats.latencies[action].append((time.perf_counter() - started) * 1000)
+
+def run_session(db_file: str, number: int, seed: int, actions: int, mix: Dict[str, int], start, results) -> None:
+    """Process entry point: one session against `db_file`; stats go back through `results`."""
+    os.chdir(benchmark.ROOT)
+    utils.DB_FILE = db_file
+    session = Session(number, seed)
+    try:
+        session.run(actions, mix, start)
+    finally:
+        results.put((number, vars(session.stats)))
+
+def verify_ledger(path: str, sessions: List[SessionStats]) -> Dict:
+    """Checks every acknowledged add/delete against the database and the summary tables."""
+    conn = sqlite3.connect(path)
+    try:
+        descriptions = {row[0] for row in conn.execute("SELECT description FROM transactions WHERE description LIKE 'loadtest-%'")}
+        added = {marker for s in sessions for marker in s.added}
+        deleted = {marker for s in sessions for marker in s.deleted}
+        lost_adds = sorted(added - deleted - descriptions)
+        lost_deletes = sorted(deleted & descriptions)
+
+        # Totals are integer đồng, so any difference at all is drift
+        summary = dict(conn.execute("SELECT type_code, total FROM ledger_summary"))
+        actual = dict(conn.execute("SELECT type_code, SUM(amount) FROM transactions GROUP BY type_code"))
+        summary_drift = {
+            name: actual.get(code, 0) - summary.get(code, 0)
+            for name, code in utils.TYPE_CODES.items() if actual.get(code, 0) != summary.get(code, 0)
+        }
+        rollup_drift = conn.execute("""
+            SELECT COUNT(*) FROM (
+                SELECT month, type_code, COALESCE(category_code, 0) AS category_code, SUM(amount) AS total, COUNT(*) AS count
+                FROM transactions GROUP BY 1, 2, 3
+            ) AS expected
+            LEFT JOIN monthly_rollup r USING (month, type_code, category_code)
+            WHERE r.total IS NULL OR r.total != expected.total OR r.count != expected.count
+        """).fetchone()[0]
+    finally:
+        conn.close()
+    return {
+        'lost_adds': lost_adds,
+        'lost_deletes': lost_deletes,
+        'summary_drift': summary_drift,
+        'rollup_rows_out_of_sync': rollup_drift,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS, help="concurrent sessions")
+    parser.add_argument("--actions", type=int, default=DEFAULT_ACTIONS, help="actions per session")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="size of the seeded ledger")
+    parser.add_argument("--mix", default=",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()),
+                        help="action weights, e.g. read=50,search=20,add=20,delete=10")
+    parser.add_argument("--seed", type=int, default=benchmark.DEFAULT_SEED, help="generator and session seed")
+    parser.add_argument("--write-behind", action="store_true", help="run the sessions with QUYDOIBONG_WRITE_BEHIND=1")
+    parser.add_argument("--output", help="optional JSON file for the report")
+    args = parser.parse_args()
+
+    mix = {name: int(weight) for name, weight in (item.split("=") for item in args.mix.split(","))}
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        parser.error(f"unknown actions in --mix: {', '.join(sorted(unknown))}")
+
+    os.chdir(benchmark.ROOT)
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "load_test.db")
+        benchmark.build_database(path, args.rows, args.seed)
+
+        utils.close_all_connections()
+
+        if args.write_behind:
+            os.environ["QUYDOIBONG_WRITE_BEHIND"] = "1"  # read by utils when the session processes start
+        context = multiprocessing.get_context("spawn")
+        start = context.Barrier(args.sessions + 1, timeout=APPTEST_TIMEOUT_SECONDS)
+        results = context.Queue()
+        processes = [
+            context.Process(target=run_session, args=(path, number, args.seed + number, args.actions, mix, start, results))
+            for number in range(args.sessions)
+        ]
+        for process in processes:
+            process.start()
+        start.wait()  # every session has rendered once; time only the mixed workload
+        started = time.perf_counter()
+        sessions = []
+        for _ in processes:
+            _, stats = results.get()
+            session = SessionStats()
+            vars(session).update(stats)
+            sessions.append(session)
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+
+        integrity = verify_ledger(path, sessions)
+
+    latencies = {action: [ms for s in sessions for ms in s.latencies[action]] for action in DEFAULT_MIX}
+    total_actions = sum(len(timings) for timings in latencies.values())
+    other_errors = [message for s in sessions for message in s.other_errors]
+    report = {
+        'meta': {
+            'commit': benchmark.git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'sessions': args.sessions,
+            'actions_per_session': args.actions,
+            'rows': args.rows,
+            'mix': mix,
+            'write_behind': args.write_behind,
+        },
+        'elapsed_s': round(elapsed, 3),
+        'throughput_actions_per_s': round(total_actions / elapsed, 2),
+        'latency': {action: benchmark.summarize(timings) for action, timings in latencies.items() if timings},
+        'lock_errors': sum(s.lock_errors for s in sessions),
+        'other_errors': len(other_errors),
+        'other_error_samples': other_errors[:10],
+        **integrity,
+    }
+
+    print(f"{args.sessions} sessions × {args.actions} actions in {elapsed:.1f} s: {report['throughput_actions_per_s']} actions/s")
+    for action, stats in report['latency'].items():
+        print(f"  {action:<8} n={stats['runs']:<5} median {stats['median_ms']:>9.1f} ms   p95 {stats['p95_ms']:>9.1f} ms   max {stats['max_ms']:>9.1f} ms")
+    print(f"Lock errors: {report['lock_errors']}   other errors: {report['other_errors']}")
+    print(f"Lost adds: {len(integrity['lost_adds'])}   lost deletes: {len(integrity['lost_deletes'])}   "
+          f"summary drift: {integrity['summary_drift'] or 'none'}   rollup rows out of sync: {integrity['rollup_rows_out_of_sync']}")
+    for message in report['other_error_samples']:
+        print(f"  ! {message}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,17 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import utils
 from datetime import datetime
 
 def show():
     # Container chính
-    st.markdown("<h2>Báo cáo tháng</h2>", unsafe_allow_html=True)
+    st.markdown("<h2>Báo cáo</h2>", unsafe_allow_html=True)
     
+    # Đổi kỳ báo cáo, sắp xếp và xóa giao dịch chỉ chạy lại phần này
+    show_panel()
+
+@utils.fragment
+@utils.timed("fragment.bao_cao")
+def show_panel():
     # Lấy danh sách các tháng
     months = utils.get_all_months()
     
@@ -17,22 +20,21 @@ def show():
         st.warning("Chưa có dữ liệu giao dịch để tạo báo cáo")
         return
     
-    # Chọn tháng
-    selected_month = st.selectbox(
-        "Chọn tháng",
-        options=months,
-        format_func=lambda x: f"{x[5:7]}/{x[:4]}"  # Format MM/YYYY
-    )
+    # Chọn kiểu báo cáo (tháng, quý, mùa giải, năm, khoảng ngày) và kỳ
+    selection = utils.show_report_period_picker("report")
+    if selection is None:
+        return
     
-    # Lấy báo cáo tháng đã chọn
-    report = utils.get_monthly_report(selected_month)
+    # Lấy báo cáo kỳ đã chọn, kèm so sánh với kỳ trước
+    report = utils.get_period_report(*selection)
+    utils.show_period_comparison(report)
     
     # Hiển thị tóm tắt và biểu đồ
     col1, col2 = st.columns(2)
     
     # Card tổng quan
     with col1:
-        st.markdown("<h3>Tổng quan tháng</h3>", unsafe_allow_html=True)
+        st.markdown(f"<h3>Tổng quan {report['label']}</h3>", unsafe_allow_html=True)
         
         # Tạo card tổng quan
         st.markdown(f"""
@@ -61,45 +63,29 @@ def show():
     with col2:
         st.markdown("<h3>Chi tiêu theo danh mục</h3>", unsafe_allow_html=True)
         
-        # Lấy chi tiêu theo danh mục
-        expense_by_category = utils.get_expense_by_category(report['transactions'])
+        # Chi tiêu theo danh mục của kỳ
+        expense_by_category = report['expense_by_category']
         
         if expense_by_category:
             fig = utils.plot_category_pie(expense_by_category)
             st.plotly_chart(fig, use_container_width=True)
         else:
-            st.info("Không có dữ liệu chi tiêu trong tháng này")
+            st.info("Không có dữ liệu chi tiêu trong kỳ này")
     
-    # Danh sách giao dịch trong tháng
-    st.markdown("<h3>Giao dịch trong tháng</h3>", unsafe_allow_html=True)
+    # Danh sách giao dịch trong kỳ
+    st.markdown("<h3>Giao dịch trong kỳ</h3>", unsafe_allow_html=True)
     
-    # Tạo dataframe
-    df = utils.get_transaction_df(report['transactions'])
+    # Sắp xếp
+    sort = st.selectbox(
+        "Sắp xếp",
+        options=list(utils.SORT_OPTIONS),
+        format_func=utils.SORT_OPTIONS.get,
+        key="report_sort"
+    )
     
     # Hiển thị danh sách giao dịch
-    if not df.empty:
-        st.markdown("<div style='max-height: 400px; overflow-y: auto;'>", unsafe_allow_html=True)
-        
-        for _, row in df.iterrows():
-            cols = st.columns([3, 2, 2, 2, 1])
-            
-            # Format row
-            icon = "⬇️" if row['type'] == 'income' else "⬆️"
-            color = "green" if row['type'] == 'income' else "red"
-            
-            cols[0].markdown(f"<div style='display: flex; align-items: center;'><span>{icon}</span><span style='margin-left: 5px;'>{row['description']}</span></div>", unsafe_allow_html=True)
-            cols[1].markdown(f"{row['category']}")
-            cols[2].markdown(f"{row['date']}")
-            cols[3].markdown(f"<span style='color: {color};'>{row['amount_display']}</span>", unsafe_allow_html=True)
-            
-            # Nút xóa
-            if cols[4].button("🗑️", key=f"delete_report_{row['id']}"):
-                utils.delete_transaction(row['id'])
-                st.experimental_rerun()
-            
-            # Đường phân cách
-            st.markdown("<hr style='margin: 5px 0; opacity: 0.3;'>", unsafe_allow_html=True)
-        
-        st.markdown("</div>", unsafe_allow_html=True)
+    page = utils.get_transaction_page("report", start=report['start'], end=report['end'], sort=sort)
+    if page['transactions']:
+        utils.show_transaction_list("report", page)
     else:
-        st.info("Không có giao dịch nào trong tháng này")
\ No newline at end of file
+        st.info("Không có giao dịch nào trong kỳ này")
\ No newline at end of file
@@ -1,11 +1,17 @@
 import streamlit as st
-import pandas as pd
 import utils
+import receipts
 
 def show():
     # Container chính
     st.markdown("<h2>Quản lý giao dịch</h2>", unsafe_allow_html=True)
     
+    # Bộ lọc, phân trang, xóa và thêm giao dịch chỉ chạy lại phần này
+    show_panel()
+
+@utils.fragment
+@utils.timed("fragment.giao_dich")
+def show_panel():
     # Layout: 2 cột (tỉ lệ 2:1)
     col_left, col_right = st.columns([2, 1])
     
@@ -14,7 +20,7 @@ def show():
         st.markdown("<h3>Lịch sử giao dịch</h3>", unsafe_allow_html=True)
         
         # Bộ lọc
-        filter_cols = st.columns([2, 1])
+        filter_cols = st.columns([2, 1, 1])
         with filter_cols[0]:
             search = st.text_input("Tìm kiếm giao dịch", placeholder="Nhập từ khóa...")
         with filter_cols[1]:
@@ -23,58 +29,25 @@ def show():
                 options=["all", "income", "expense"],
                 format_func=lambda x: "Tất cả" if x == "all" else ("Thu" if x == "income" else "Chi")
             )
+        with filter_cols[2]:
+            sort = st.selectbox(
+                "Sắp xếp",
+                options=list(utils.SORT_OPTIONS),
+                format_func=utils.SORT_OPTIONS.get,
+                disabled=bool(search)  # Kết quả tìm kiếm xếp theo mức độ liên quan
+            )
         
-        # Lọc danh sách giao dịch
-        filtered_transactions = st.session_state.transactions
-        
-        # Lọc theo loại giao dịch
-        if transaction_type_filter != "all":
-            filtered_transactions = [t for t in filtered_transactions if t['type'] == transaction_type_filter]
-        
-        # Lọc theo từ khóa
-        if search:
-            filtered_transactions = [
-                t for t in filtered_transactions 
-                if search.lower() in t['description'].lower() or search.lower() in t['category'].lower()
-            ]
-        
-        # Tạo dataframe
-        df = utils.get_transaction_df(filtered_transactions)
+        # Lọc danh sách giao dịch (trong SQL, mỗi lần một trang)
+        page = utils.get_transaction_page(
+            "transactions",
+            transaction_type=None if transaction_type_filter == "all" else transaction_type_filter,
+            search=search or None,
+            sort=sort
+        )
         
         # Hiển thị danh sách giao dịch
-        if not df.empty:
-            st.markdown("<div style='max-height: 600px; overflow-y: auto;'>", unsafe_allow_html=True)
-            
-            for _, row in df.iterrows():
-                cols = st.columns([3, 2, 2, 2, 1])
-                
-                # Format row
-                icon = "⬇️" if row['type'] == 'income' else "⬆️"
-                color = "green" if row['type'] == 'income' else "red"
-                
-                cols[0].markdown(f"<div style='display: flex; align-items: center;'><span>{icon}</span><span style='margin-left: 5px;'>{row['description']}</span></div>", unsafe_allow_html=True)
-                cols[1].markdown(f"{row['category']}")
-                cols[2].markdown(f"{row['date']}")
-                cols[3].markdown(f"<span style='color: {color};'>{row['amount_display']}</span>", unsafe_allow_html=True)
-                
-                # Nút xóa
-                if cols[4].button("🗑️", key=f"delete_{row['id']}"):
-                    # Xác nhận xóa
-                    delete_confirm = st.warning(f"Bạn có chắc chắn muốn xóa giao dịch '{row['description']}'?")
-                    col1, col2 = st.columns(2)
-                    
-                    if col1.button("Xác nhận", key=f"confirm_{row['id']}"):
-                        utils.delete_transaction(row['id'])
-                        st.success("Đã xóa giao dịch!")
-                        st.rerun() # Changed here
-                    
-                    if col2.button("Hủy", key=f"cancel_{row['id']}"):
-                        st.rerun() # Changed here
-                
-                # Đường phân cách
-                st.markdown("<hr style='margin: 5px 0; opacity: 0.3;'>", unsafe_allow_html=True)
-            
-            st.markdown("</div>", unsafe_allow_html=True)
+        if page['transactions']:
+            utils.show_transaction_list("transactions", page, confirm_delete=True, height=600)
         else:
             st.info("Không có giao dịch nào")
     
@@ -89,54 +62,51 @@ def show():
                 "Loại giao dịch",
                 options=["income", "expense"],
                 format_func=lambda x: "Thu" if x == "income" else "Chi",
-                horizontal=True
+                horizontal=True,
+                key="add_transaction_form_page_type"
             )
             
             # Số tiền
-            amount = st.number_input(
+            st.number_input(
                 "Số tiền (VNĐ)",
                 min_value=1000.0,
                 step=10000.0,
-                format="%g"
+                format="%g",
+                key="add_transaction_form_page_amount"
             )
             
             # Mô tả
-            description = st.text_input("Mô tả")
+            st.text_input("Mô tả", key="add_transaction_form_page_description")
             
             # Danh mục
-            category = st.selectbox(
+            st.selectbox(
                 "Danh mục",
-                options=utils.CATEGORIES[transaction_type]
+                options=utils.CATEGORIES[transaction_type],
+                key="add_transaction_form_page_category"
             )
             
             # Ngày tháng
-            date = st.date_input("Ngày")
+            st.date_input("Ngày", key="add_transaction_form_page_date")
+            
+            # Ảnh hóa đơn (không bắt buộc)
+            st.file_uploader(
+                "Ảnh hóa đơn",
+                type=list(receipts.RECEIPT_TYPES),
+                key="add_transaction_form_page_receipt"
+            )
             
-            # Nút thêm
+            # Nút thêm (lưu trong callback, trước khi fragment chạy lại)
             button_label = "Thêm khoản thu" if transaction_type == "income" else "Thêm khoản chi"
             
             submitted = st.form_submit_button(
                 button_label,
                 use_container_width=True,
-                type="primary"
+                type="primary",
+                on_click=utils.submit_transaction_form,
+                args=("add_transaction_form_page",)
             )
             
             if submitted:
-                # Validate
-                if not description or amount <= 0:
-                    st.error("Vui lòng điền đầy đủ thông tin và số tiền hợp lệ")
-                else:
-                    # Thêm giao dịch
-                    transaction_data = {
-                        'type': transaction_type,
-                        'amount': amount,
-                        'description': description,
-                        'category': category,
-                        'date': date.strftime("%Y-%m-%d")
-                    }
-                    
-                    utils.add_transaction(transaction_data)
-                    st.success("Đã thêm giao dịch thành công!")
-                    st.rerun() # Changed here
+                utils.show_form_feedback("add_transaction_form_page")
         
         st.markdown("</div>", unsafe_allow_html=True)
\ No newline at end of file
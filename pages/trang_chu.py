@@ -1,17 +1,27 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 import utils
+import receipts
 from datetime import datetime
 import uuid
 
 def show():
-    # Cập nhật session state
-    utils.update_summary()
-
     # Container chính
     st.markdown("<h2>Tổng quan quỹ</h2>", unsafe_allow_html=True)
     
+    # Tóm tắt, danh sách và form chạy lại độc lập (fragment) khi thêm/xóa giao dịch
+    show_panel()
+
+    # Khởi tạo dữ liệu mẫu (chỉ chạy một lần)
+    if 'initialized' not in st.session_state:
+        utils.initialize_data()
+        st.session_state.initialized = True
+
+@utils.fragment
+@utils.timed("fragment.trang_chu")
+def show_panel():
+    # Cập nhật session state nếu sổ quỹ đã thay đổi
+    utils.sync_summary()
+    
     # Hiển thị tóm tắt
     col1, col2, col3 = st.columns(3)
     
@@ -64,55 +74,12 @@ def show():
         # Tìm kiếm
         search = st.text_input("Tìm kiếm giao dịch", placeholder="Nhập từ khóa...")
         
-        # Lọc danh sách giao dịch
-        filtered_transactions = st.session_state.transactions
-        if search:
-            filtered_transactions = [
-                t for t in filtered_transactions 
-                if search.lower() in t['description'].lower() or search.lower() in t['category'].lower()
-            ]
-        
-        # Tạo dataframe
-        df = utils.get_transaction_df(filtered_transactions)
+        # Lọc danh sách giao dịch (trong SQL, mỗi lần một trang)
+        page = utils.get_transaction_page("overview", search=search or None)
         
-        if not df.empty:
-            # Custom định dạng
-            def format_row(row):
-                icon = "⬇️" if row['type'] == 'income' else "⬆️"
-                color = "color: green" if row['type'] == 'income' else "color: red"
-                return [
-                    f"<div style='display: flex; align-items: center;'><span>{icon}</span><span style='margin-left: 5px;'>{row['description']}</span></div>",
-                    f"<div>{row['category']}</div>",
-                    f"<div>{row['date']}</div>",
-                    f"<div style='{color}'>{row['amount_display']}</div>"
-                ]
-            
-            # Áp dụng định dạng
-            if not df.empty:
-                # Tạo bảng tùy chỉnh
-                st.markdown("<div style='max-height: 400px; overflow-y: auto;'>", unsafe_allow_html=True)
-                
-                for _, row in df.iterrows():
-                    cols = st.columns([3, 2, 2, 2, 1])
-                    
-                    # Format row
-                    icon = "⬇️" if row['type'] == 'income' else "⬆️"
-                    color = "green" if row['type'] == 'income' else "red"
-                    
-                    cols[0].markdown(f"<div style='display: flex; align-items: center;'><span>{icon}</span><span style='margin-left: 5px;'>{row['description']}</span></div>", unsafe_allow_html=True)
-                    cols[1].markdown(f"{row['category']}")
-                    cols[2].markdown(f"{row['date']}")
-                    cols[3].markdown(f"<span style='color: {color};'>{row['amount_display']}</span>", unsafe_allow_html=True)
-                    
-                    # Nút xóa
-                    if cols[4].button("🗑️", key=f"delete_{row['id']}"):
-                        utils.delete_transaction(row['id'])
-                        st.rerun() # Changed here
-                    
-                    # Đường phân cách
-                    st.markdown("<hr style='margin: 5px 0; opacity: 0.3;'>", unsafe_allow_html=True)
-                
-                st.markdown("</div>", unsafe_allow_html=True)
+        # Hiển thị danh sách giao dịch
+        if page['transactions']:
+            utils.show_transaction_list("overview", page)
         else:
             st.info("Không có giao dịch nào")
     
@@ -130,79 +97,60 @@ def show():
                 options=["income", "expense"],
                 format_func=lambda x: "Thu" if x == "income" else "Chi",
                 horizontal=True,
-                key="transaction_type"
+                key="add_transaction_form_type"
             )
             
             # Số tiền
-            amount = st.number_input(
+            st.number_input(
                 "Số tiền (VNĐ)",
                 min_value=1000.0,
                 step=10000.0,
                 format="%g",
-                key="amount"
+                key="add_transaction_form_amount"
             )
             
             # Mô tả
-            description = st.text_input(
-                "Mô tả",
-                key="description"
-            )
+            st.text_input("Mô tả", key="add_transaction_form_description")
             
             # Danh mục
-            category = st.selectbox(
+            st.selectbox(
                 "Danh mục",
                 options=utils.CATEGORIES[transaction_type],
-                key="category"
+                key="add_transaction_form_category"
             )
             
             # Ngày tháng
-            date = st.date_input(
-                "Ngày",
-                value=datetime.now(),
-                key="date"
+            st.date_input("Ngày", value=datetime.now(), key="add_transaction_form_date")
+            
+            # Ảnh hóa đơn (không bắt buộc)
+            st.file_uploader(
+                "Ảnh hóa đơn",
+                type=list(receipts.RECEIPT_TYPES),
+                key="add_transaction_form_receipt"
             )
             
-            # Nút thêm
+            # Nút thêm (lưu trong callback, trước khi fragment chạy lại)
             button_label = "Thêm khoản thu" if transaction_type == "income" else "Thêm khoản chi"
-            button_color = "green" if transaction_type == "income" else "red"
             
             submitted = st.form_submit_button(
                 button_label,
                 use_container_width=True,
-                type="primary"
+                type="primary",
+                on_click=utils.submit_transaction_form,
+                args=("add_transaction_form",)
             )
             
             if submitted:
-                # Validate
-                if not description or amount <= 0:
-                    st.error("Vui lòng điền đầy đủ thông tin và số tiền hợp lệ")
-                else:
-                    # Thêm giao dịch
-                    transaction_data = {
-                        'type': transaction_type,
-                        'amount': amount,
-                        'description': description,
-                        'category': category,
-                        'date': date.strftime("%Y-%m-%d")
-                    }
-                    
-                    utils.add_transaction(transaction_data)
-                    st.success("Đã thêm giao dịch thành công!")
-                    st.experimental_rerun()
+                utils.show_form_feedback("add_transaction_form")
         
         # Biểu đồ chi tiêu theo danh mục
         st.markdown("<h3>Chi tiêu theo danh mục</h3>", unsafe_allow_html=True)
         
         # Lấy chi tiêu theo danh mục
-        expense_by_category = utils.get_expense_by_category(st.session_state.transactions)
+        expense_by_category = utils.get_expense_by_category()
         
         if expense_by_category:
             fig = utils.plot_category_pie(expense_by_category)
             st.plotly_chart(fig, use_container_width=True)
         else:
-            st.info("Chưa có dữ liệu chi tiêu")
-
-    # Khởi tạo dữ liệu mẫu (chỉ chạy một lần)
-    if 'initialized' not in st.session_state:
-        utils.initialize_data()
-        st.session_state.initialized = True
\ No newline at end of file
+            st.info("Chưa có dữ liệu chi tiêu")
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""Instrumentation: leveled logging, timing spans and the admin performance panel.
+
+Spans wrap the DB helpers, aggregations, DataFrame builds and page renders.
+Set QUYDOIBONG_LOG_LEVEL=DEBUG to log every span; spans slower than
+SLOW_SPAN_MS are logged as warnings. Timings are kept per process in
+`perf_stats` and shown in the panel.
+"""
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+import streamlit as st
+
+logger = logging.getLogger("quydoibong")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(_handler)
+    logger.propagate = False
+
+def set_log_level(name: str) -> None:
+    """Set the logger level from a name such as "DEBUG"; an unknown name falls back to INFO with a warning."""
+    level = logging.getLevelName(name.upper())
+    if isinstance(level, int):
+        logger.setLevel(level)
+    else:  # getLevelName returns "Level X" for names it does not know
+        logger.setLevel(logging.INFO)
+        logger.warning("QUYDOIBONG_LOG_LEVEL=%r is not a logging level, using INFO", name)
+
+set_log_level(os.environ.get("QUYDOIBONG_LOG_LEVEL", "INFO"))
+
+SLOW_SPAN_MS = 500
+SPAN_SAMPLES = 500  # Most recent timings kept per span
+
+class PerfStats:
+    """Process-wide span timings, shared by all sessions."""
+
+    def __init__(self, samples: int = SPAN_SAMPLES):
+        self._samples = samples
+        self._spans: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, elapsed_ms: float, rows: Optional[int] = None) -> None:
+        with self._lock:
+            span = self._spans.get(name)
+            if span is None:
+                span = self._spans[name] = {'count': 0, 'timings': deque(maxlen=self._samples), 'rows': None}
+            span['count'] += 1
+            span['timings'].append(elapsed_ms)
+            if rows is not None:
+                span['rows'] = rows
+
+    def report(self) -> List[Dict]:
+        """One row per span: call count, p50/p95/max in ms and the last row count."""
+        with self._lock:
+            spans = {name: (span['count'], sorted(span['timings']), span['rows']) for name, span in self._spans.items()}
+        return [
+            {
+                'span': name,
+                'count': count,
+                'p50_ms': round(_percentile(timings, 50), 2),
+                'p95_ms': round(_percentile(timings, 95), 2),
+                'max_ms': round(timings[-1], 2),
+                'rows': rows,
+            }
+            for name, (count, timings, rows) in sorted(spans.items())
+        ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, -(-len(sorted_values) * percent // 100) - 1)
+    return sorted_values[int(index)]
+
+perf_stats = PerfStats()
+
+def _count_rows(result) -> Optional[int]:
+    if isinstance(result, dict) and 'transactions' in result:
+        return len(result['transactions'])
+    if isinstance(result, (list, dict)) or hasattr(result, 'shape'):
+        return len(result)
+    return None
+
+@contextmanager
+def span(name: str) -> Iterator[Dict]:
+    """Times the enclosed block. Set `rows` on the yielded dict to record a row count."""
+    info: Dict = {'rows': None}
+    started = time.perf_counter()
+    try:
+        yield info
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        perf_stats.record(name, elapsed_ms, info['rows'])
+        level = logging.WARNING if elapsed_ms > SLOW_SPAN_MS else logging.DEBUG
+        if logger.isEnabledFor(level):
+            rows = f" ({info['rows']} rows)" if info['rows'] is not None else ""
+            logger.log(level, "%s took %.1f ms%s", name, elapsed_ms, rows)
+
+def timed(name: Optional[str] = None) -> Callable:
+    """Decorator form of `span`; records the row count of list, dict and DataFrame results."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name) as info:
+                result = func(*args, **kwargs)
+                info['rows'] = _count_rows(result)
+            return result
+        return wrapper
+    return decorator
+
+# --- Performance panel ---
+# Admin-only view of the span timings. It exposes timings and internals to
+# whoever sees the page, so only the server operator can turn it on: with
+# QUYDOIBONG_PERF_PANEL=1 or `perf_panel = true` in .streamlit/secrets.toml,
+# never from the URL.
+def perf_panel_enabled() -> bool:
+    if os.environ.get("QUYDOIBONG_PERF_PANEL") == "1":
+        return True
+    try:
+        return st.secrets.get("perf_panel") is True
+    except FileNotFoundError:  # No secrets.toml at all
+        return False
+
+def show_performance_panel() -> None:
+    import utils  # utils imports this module, so only at call time
+
+    with st.expander("⏱️ Hiệu năng", expanded=True):
+        report = perf_stats.report()
+        if report:
+            st.dataframe(report, hide_index=True, use_container_width=True)
+        else:
+            st.info("Chưa có số liệu")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.caption("Bộ nhớ đệm biểu đồ")
+            st.json(utils.get_figure_cache_stats())
+        with col2:
+            st.caption("Thời gian import (ms)")
+            st.json({name: round(ms, 1) for name, ms in utils.get_import_report().items()})
+        if 'first_render_ms' in st.session_state:
+            st.caption(f"Lần render đầu: {st.session_state.first_render_ms:.0f} ms (ngân sách {utils.STARTUP_BUDGET_MS} ms)")
+
+        st.button("Đặt lại số liệu", key="perf_reset", on_click=perf_stats.reset)
@@ -0,0 +1,202 @@
+"""Receipt images, stored on disk by content hash.
+
+An upload is saved once as receipts/originals/<ab>/<sha256>.<ext>, so the
+same photo attached to several transactions takes space once, and a small
+JPEG thumbnail is written next to it under receipts/thumbs/ at upload time.
+The transaction row only keeps the key "<sha256>.<ext>" in `image_url`.
+
+Lists show thumbnails only when asked to, and a full-size image is read
+only when someone opens it.
+
+Deleting a transaction leaves its image on disk, since other transactions
+may share it. `python receipts.py gc` removes images that no transaction of
+any fund, and no backup snapshot, refers to any more.
+"""
+import argparse
+import functools
+import hashlib
+import io
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import streamlit as st
+
+RECEIPTS_DIR = "receipts"
+RECEIPT_TYPES = {'png': 'png', 'jpg': 'jpg', 'jpeg': 'jpg', 'webp': 'webp'}
+RECEIPT_MAX_BYTES = 10 * 1024 * 1024
+THUMBNAIL_SIZE = (240, 240)
+THUMBNAIL_QUALITY = 70
+GALLERY_COLUMNS = 4
+# Unreferenced images younger than this are kept: their transaction may
+# still be in a form or the write-behind queue
+RECEIPT_GC_GRACE_SECONDS = 24 * 3600
+
+def _shard(directory: str, digest: str) -> str:
+    return os.path.join(RECEIPTS_DIR, directory, digest[:2])
+
+def original_path(key: str) -> str:
+    return os.path.join(_shard("originals", key), key)
+
+def thumbnail_path(key: str) -> str:
+    digest = key.split(".", 1)[0]
+    return os.path.join(_shard("thumbs", digest), f"{digest}.jpg")
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _make_thumbnail(data: bytes) -> bytes:
+    from PIL import Image, ImageOps  # Only needed when a receipt is uploaded
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(THUMBNAIL_SIZE)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        out = io.BytesIO()
+        image.save(out, format="JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+    return out.getvalue()
+
+def save_receipt(file, file_name: Optional[str] = None) -> str:
+    """Stores an uploaded image (bytes or file-like) and returns its receipt key.
+
+    Raises ValueError for unsupported, oversized or unreadable files.
+    """
+    return store_receipt(file, file_name)[0]
+
+def store_receipt(file, file_name: Optional[str] = None) -> Tuple[str, bool]:
+    """Like save_receipt, but also tells whether this call created the files.
+
+    Only files a call created may be removed again if its transaction is
+    not stored; an existing image belongs to other transactions too.
+    """
+    data = file if isinstance(file, bytes) else (file.getvalue() if hasattr(file, "getvalue") else file.read())
+    file_name = file_name or getattr(file, "name", "")
+    extension = RECEIPT_TYPES.get(os.path.splitext(file_name)[1].lstrip(".").lower())
+    if extension is None:
+        raise ValueError(f"Định dạng ảnh không được hỗ trợ: {file_name or 'không rõ'}")
+    if len(data) > RECEIPT_MAX_BYTES:
+        raise ValueError(f"Ảnh hóa đơn quá lớn (tối đa {RECEIPT_MAX_BYTES // (1024 * 1024)} MB)")
+
+    key = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+    path = original_path(key)
+    if not os.path.exists(path):
+        try:
+            thumbnail = _make_thumbnail(data)
+        except Exception as e:  # Pillow raises several types for corrupt images
+            raise ValueError(f"Không đọc được ảnh hóa đơn: {e}") from e
+        # Thumbnail first: a key whose original exists always has its thumbnail
+        _write_atomic(thumbnail_path(key), thumbnail)
+        _write_atomic(path, data)
+        return key, True
+    # Re-used: restart the garbage-collection grace period
+    os.utime(path)
+    return key, False
+
+def delete_receipt(key: str) -> None:
+    """Removes an image and its thumbnail; missing files are ignored."""
+    # Original first: a key whose original exists always has its thumbnail
+    for path in (original_path(key), thumbnail_path(key)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    load_thumbnail.cache_clear()
+
+def list_receipt_keys() -> List[str]:
+    """Keys of every stored original."""
+    root = os.path.join(RECEIPTS_DIR, "originals")
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for shard in os.listdir(root) if os.path.isdir(os.path.join(root, shard))
+        for name in os.listdir(os.path.join(root, shard)) if not name.endswith(".tmp")
+    )
+
+def collect_garbage(referenced: Iterable[str], grace_seconds: float = RECEIPT_GC_GRACE_SECONDS,
+                    dry_run: bool = False) -> List[str]:
+    """Deletes images not in `referenced` and older than the grace period; returns their keys."""
+    referenced = set(referenced)
+    cutoff = time.time() - grace_seconds
+    unreferenced = []
+    for key in list_receipt_keys():
+        if key in referenced:
+            continue
+        try:
+            if os.path.getmtime(original_path(key)) > cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        unreferenced.append(key)
+        if not dry_run:
+            delete_receipt(key)
+    return unreferenced
+
+@functools.lru_cache(maxsize=512)
+def load_thumbnail(key: str) -> Optional[bytes]:
+    """Thumbnail bytes; content-addressed files never change, so they cache forever."""
+    try:
+        with open(thumbnail_path(key), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def load_original(key: str) -> Optional[bytes]:
+    try:
+        with open(original_path(key), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def show_receipt_gallery(key: str, transactions: List[Dict]) -> None:
+    """Thumbnails of the receipts attached to `transactions`; full size on request."""
+    with_receipts = [t for t in transactions if t.get('image_url')]
+    if not with_receipts:
+        return
+
+    cols = st.columns(GALLERY_COLUMNS)
+    for index, transaction in enumerate(with_receipts):
+        thumbnail = load_thumbnail(transaction['image_url'])
+        with cols[index % GALLERY_COLUMNS]:
+            if thumbnail is None:
+                st.caption(f"⚠️ Thiếu ảnh: {transaction['description']}")
+                continue
+            st.image(thumbnail, caption=f"{transaction['date']} · {transaction['description']}")
+            if st.button("Xem ảnh gốc", key=f"{key}_receipt_{transaction['id']}", use_container_width=True):
+                st.session_state[f"{key}_receipt_open"] = transaction['image_url']
+
+    opened = st.session_state.get(f"{key}_receipt_open")
+    if opened in {t['image_url'] for t in with_receipts}:
+        original = load_original(opened)
+        if original is not None:
+            st.image(original, use_column_width=True)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintenance of stored receipt images")
+    commands = parser.add_subparsers(dest="command", required=True)
+    gc = commands.add_parser("gc", help="delete images no transaction or backup snapshot refers to")
+    gc.add_argument("--dry-run", action="store_true", help="only list what would be deleted")
+    gc.add_argument("--grace", type=float, default=RECEIPT_GC_GRACE_SECONDS,
+                    help="keep unreferenced images younger than this many seconds (default: %(default)s)")
+    args = parser.parse_args()
+
+    # The ledger modules import this one, so they are only loaded for the CLI
+    import backup
+    import utils
+
+    db_files = []
+    for fund in utils.list_funds():
+        db_file = utils.fund_db_file(fund)
+        db_files.append(db_file)
+        db_files += [snapshot['path'] for snapshot in backup.list_snapshots(db_file, backup.fund_backup_dir(fund))]
+    removed = collect_garbage(utils.referenced_receipt_keys(db_files), args.grace, args.dry_run)
+    for key in removed:
+        print(f"{'Would delete' if args.dry_run else 'Deleted'} {key}")
+    print(f"{len(removed)} unreferenced receipt(s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""Incremental mirror of the `transactions` table to a Google Sheet.
+
+Once a target is registered in `sync_state`, every insert, delete and update
+of a transaction is recorded in `change_log` by triggers (migration 5 in
+utils.py); registering also queues the existing ledger. A sync reads the entries after the
+target's high-water mark in `sync_state`, collapses them to the final state
+of each transaction and pushes them to the sheet in a handful of batched
+calls: one read of the id column, one batch of range updates, one batch of
+row deletions and one append. The mark only advances after the sheet has
+accepted a batch, and since every sync starts from the ids actually in the
+sheet, re-running a failed batch never duplicates rows.
+
+The sync runs on a background thread, off the request path. Every committed
+write wakes it (utils.ledger_written); otherwise it checks the log every
+SYNC_INTERVAL_SECONDS. It is enabled with QUYDOIBONG_SHEETS_SYNC=1 and reads
+`gcp_service_account` and `spreadsheet_id` from .streamlit/secrets.toml. The Google backend needs the
+optional `gspread` package; `FakeSheetBackend` stands in for it locally.
+Only the default fund is mirrored: other funds never register a target, so
+their triggers record nothing.
+"""
+import os
+import random
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import utils
+
+SYNC_TARGET = "google_sheets"
+SYNC_BATCH_SIZE = 500
+SYNC_INTERVAL_SECONDS = 10
+SYNC_RETRIES = 6
+SYNC_BACKOFF_SECONDS = 1.0
+SYNC_BACKOFF_MAX_SECONDS = 32.0
+# Cap on the pause between background syncs after consecutive failures
+# (e.g. revoked credentials), which otherwise would retry every interval
+SYNC_FAILURE_BACKOFF_MAX_SECONDS = 600.0
+WORKSHEET_NAME = "transactions"
+
+HEADER = list(utils.TRANSACTION_FIELDS)
+
+class SheetBackendError(Exception):
+    """A sheet call failed for good (bad credentials, missing sheet, ...)."""
+
+class TransientSheetError(SheetBackendError):
+    """A sheet call failed in a way worth retrying (rate limit, 5xx, network)."""
+
+# --- Backends ---
+class FakeSheetBackend:
+    """In-memory sheet with the same interface as GspreadBackend.
+
+    `calls` counts API round trips per method and `fail_next` makes the next
+    N calls raise TransientSheetError, to exercise batching and backoff.
+    """
+
+    def __init__(self):
+        self.rows: List[List] = [HEADER]
+        self.calls: Dict[str, int] = {}
+        self.fail_next = 0
+
+    def _call(self, name: str) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.fail_next:
+            self.fail_next -= 1
+            raise TransientSheetError(f"{name}: simulated rate limit")
+
+    def read_ids(self) -> List[str]:
+        self._call('read_ids')
+        return [row[0] for row in self.rows]
+
+    def ensure_header(self, header: Sequence[str]) -> None:
+        self._call('ensure_header')
+        if not self.rows:
+            self.rows.append(list(header))
+        else:
+            self.rows[0] = list(header)
+
+    def update_rows(self, updates: Dict[int, List]) -> None:
+        self._call('update_rows')
+        for row_number, values in updates.items():
+            self.rows[row_number - 1] = list(values)
+
+    def delete_rows(self, row_numbers: Sequence[int]) -> None:
+        self._call('delete_rows')
+        for row_number in sorted(row_numbers, reverse=True):
+            del self.rows[row_number - 1]
+
+    def append_rows(self, rows: List[List]) -> None:
+        self._call('append_rows')
+        self.rows.extend(list(row) for row in rows)
+
+class GspreadBackend:
+    """Google Sheets through gspread; row numbers are 1-based like the sheet."""
+
+    def __init__(self, spreadsheet_id: str, credentials: Dict, worksheet: str = WORKSHEET_NAME):
+        try:
+            import gspread
+        except ImportError as e:
+            raise SheetBackendError("Google Sheets sync needs the optional 'gspread' package (pip install gspread)") from e
+        # gspread's own dependencies: the HTTP client and the token refresh
+        import google.auth.exceptions
+        import requests
+        self._api_error = gspread.exceptions.APIError
+        self._network_errors = (
+            ConnectionError, TimeoutError, requests.exceptions.RequestException, google.auth.exceptions.TransportError
+        )
+        client = gspread.service_account_from_dict(dict(credentials))
+        self._spreadsheet = self._request(client.open_by_key, spreadsheet_id)
+        try:
+            self._worksheet = self._request(self._spreadsheet.worksheet, worksheet)
+        except gspread.exceptions.WorksheetNotFound:
+            self._worksheet = self._request(self._spreadsheet.add_worksheet, worksheet, rows=1000, cols=len(HEADER))
+
+    def _request(self, func, *args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except self._api_error as e:
+            status = getattr(e.response, 'status_code', None)
+            if status == 429 or (status is not None and status >= 500):
+                raise TransientSheetError(str(e)) from e
+            raise SheetBackendError(str(e)) from e
+        except self._network_errors as e:
+            raise TransientSheetError(str(e)) from e
+
+    def read_ids(self) -> List[str]:
+        return self._request(self._worksheet.col_values, 1)
+
+    def ensure_header(self, header: Sequence[str]) -> None:
+        self._request(self._worksheet.update, "A1", [list(header)])
+
+    def update_rows(self, updates: Dict[int, List]) -> None:
+        last_column = chr(ord('A') + len(HEADER) - 1)
+        self._request(self._worksheet.batch_update, [
+            {'range': f"A{row_number}:{last_column}{row_number}", 'values': [values]}
+            for row_number, values in updates.items()
+        ], value_input_option='RAW')
+
+    def delete_rows(self, row_numbers: Sequence[int]) -> None:
+        # One batchUpdate; bottom-up so earlier deletions don't shift later ones
+        sheet_id = self._worksheet.id
+        requests = [
+            {'deleteDimension': {'range': {'sheetId': sheet_id, 'dimension': 'ROWS', 'startIndex': start - 1, 'endIndex': end}}}
+            for start, end in reversed(_contiguous_ranges(row_numbers))
+        ]
+        self._request(self._spreadsheet.batch_update, {'requests': requests})
+
+    def append_rows(self, rows: List[List]) -> None:
+        self._request(self._worksheet.append_rows, rows, value_input_option='RAW')
+
+def _contiguous_ranges(row_numbers: Sequence[int]) -> List[Tuple[int, int]]:
+    """[3, 4, 5, 9] -> [(3, 5), (9, 9)]"""
+    ranges: List[Tuple[int, int]] = []
+    for row_number in sorted(set(row_numbers)):
+        if ranges and row_number == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], row_number)
+        else:
+            ranges.append((row_number, row_number))
+    return ranges
+
+# --- Sync engine ---
+class SheetSync:
+    """Pushes `change_log` entries past the high-water mark of `target` to `backend`.
+
+    With `backend_factory` instead of a backend, the background thread builds
+    the backend itself (opening a spreadsheet is a network call) and keeps
+    retrying with backoff until it succeeds.
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        db_file: Optional[str] = None,
+        target: str = SYNC_TARGET,
+        batch_size: int = SYNC_BATCH_SIZE,
+        backend_factory: Optional[Callable[[], object]] = None
+    ):
+        self.backend = backend
+        self._backend_factory = backend_factory
+        self.db_file = db_file or utils.DB_FILE
+        self.target = target
+        self.batch_size = batch_size
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_error: Optional[str] = None
+
+    def register(self) -> None:
+        """Starts change logging for this target and queues every existing row, once."""
+        with utils.get_connection(self.db_file) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                registered = conn.execute("SELECT 1 FROM sync_state WHERE target = ?", (self.target,)).fetchone()
+                if registered is None:
+                    conn.execute(
+                        "INSERT INTO sync_state(target, last_seq) SELECT ?, COALESCE(MAX(seq), 0) FROM change_log",
+                        (self.target,)
+                    )
+                    conn.execute("INSERT INTO change_log(op, transaction_id) SELECT 'upsert', id FROM transactions ORDER BY day, id")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def high_water_mark(self) -> int:
+        with utils.get_connection(self.db_file) as conn:
+            row = conn.execute("SELECT last_seq FROM sync_state WHERE target = ?", (self.target,)).fetchone()
+        if row is None:
+            self.register()
+            return self.high_water_mark()
+        return row[0]
+
+    def backlog(self) -> int:
+        """Change-log entries not yet pushed."""
+        after = self.high_water_mark()
+        with utils.get_connection(self.db_file) as conn:
+            return conn.execute("SELECT COUNT(*) FROM change_log WHERE seq > ?", (after,)).fetchone()[0]
+
+    def _read_changes(self, after: int) -> Tuple[int, Dict[str, Optional[List]]]:
+        """Final state of every transaction changed in the next batch: its row, or None if deleted."""
+        with utils.get_connection(self.db_file) as conn:
+            entries = conn.execute(
+                "SELECT seq, transaction_id FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?",
+                (after, self.batch_size)
+            ).fetchall()
+            if not entries:
+                return after, {}
+            ids = list(dict.fromkeys(transaction_id for _, transaction_id in entries))
+            placeholders = ",".join("?" * len(ids))
+            current = {
+                row[0]: list(row)
+                for row in conn.execute(
+                    f"{utils.TRANSACTION_SELECT} WHERE t.id IN ({placeholders})", ids
+                )
+            }
+        # The table, not the log entry, decides: a row inserted and deleted
+        # within the batch is simply absent
+        return entries[-1][0], {transaction_id: current.get(transaction_id) for transaction_id in ids}
+
+    def _with_backoff(self, name: str, func, *args):
+        for attempt in range(SYNC_RETRIES):
+            try:
+                return func(*args)
+            except TransientSheetError as e:
+                if attempt == SYNC_RETRIES - 1 or self._stop.is_set():
+                    raise
+                delay = min(SYNC_BACKOFF_MAX_SECONDS, SYNC_BACKOFF_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0)
+                utils.logger.warning("sheets_sync: %s failed (%s), retrying in %.1f s", name, e, delay)
+                self._stop.wait(delay)
+
+    def sync_once(self) -> Dict[str, int]:
+        """Pushes at most one batch; returns what was sent and the new high-water mark."""
+        with utils.span("sheets_sync.batch") as info:
+            after = self.high_water_mark()
+            last_seq, changes = self._read_changes(after)
+            result = {'updated': 0, 'deleted': 0, 'appended': 0, 'last_seq': last_seq}
+            if not changes:
+                return result
+
+            sheet_ids = self._with_backoff('read_ids', self.backend.read_ids)
+            if not sheet_ids or sheet_ids[0] != HEADER[0]:
+                self._with_backoff('ensure_header', self.backend.ensure_header, HEADER)
+                sheet_ids = [HEADER[0]] + list(sheet_ids[1:] if sheet_ids else [])
+            row_numbers = {transaction_id: number for number, transaction_id in enumerate(sheet_ids, start=1) if number > 1}
+
+            updates = {row_numbers[i]: row for i, row in changes.items() if row is not None and i in row_numbers}
+            deletes = [row_numbers[i] for i, row in changes.items() if row is None and i in row_numbers]
+            appends = [row for i, row in changes.items() if row is not None and i not in row_numbers]
+
+            # Updates first: deletions shift the row numbers below them
+            if updates:
+                self._with_backoff('update_rows', self.backend.update_rows, updates)
+            if deletes:
+                self._with_backoff('delete_rows', self.backend.delete_rows, deletes)
+            if appends:
+                self._with_backoff('append_rows', self.backend.append_rows, appends)
+
+            with utils.get_connection(self.db_file) as conn:
+                conn.execute(
+                    "INSERT INTO sync_state(target, last_seq) VALUES (?, ?) "
+                    "ON CONFLICT(target) DO UPDATE SET last_seq = excluded.last_seq",
+                    (self.target, last_seq)
+                )
+                # Entries every target has pushed are no longer needed
+                conn.execute("DELETE FROM change_log WHERE seq <= (SELECT MIN(last_seq) FROM sync_state)")
+                conn.commit()
+
+            result.update(updated=len(updates), deleted=len(deletes), appended=len(appends))
+            info['rows'] = len(changes)
+            return result
+
+    def sync_all(self) -> Dict[str, int]:
+        """Pushes batches until the change log is drained."""
+        totals = {'updated': 0, 'deleted': 0, 'appended': 0, 'last_seq': self.high_water_mark()}
+        while True:
+            result = self.sync_once()
+            if result['last_seq'] == totals['last_seq']:
+                return totals
+            for key in ('updated', 'deleted', 'appended'):
+                totals[key] += result[key]
+            totals['last_seq'] = result['last_seq']
+
+    # --- Background thread ---
+    def notify(self) -> None:
+        """Asks the background thread to sync now instead of at the next interval."""
+        self._wake.set()
+
+    def start(self, interval: float = SYNC_INTERVAL_SECONDS) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name=f"sheets-sync:{self.db_file}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self, interval: float) -> None:
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                if self.backend is None:
+                    self.backend = self._backend_factory()
+                self.sync_all()
+                self.last_error = None
+                failures = 0
+            except Exception as e:  # Keep the thread alive and retry later
+                failures += 1
+                self.last_error = str(e)
+                utils.logger.exception("sheets_sync: sync to %s failed (%d in a row)", self.target, failures)
+                # Not woken by notify(): a broken backend should not be retried on every write
+                self._stop.wait(min(SYNC_FAILURE_BACKOFF_MAX_SECONDS, interval * 2 ** (failures - 1)))
+                continue
+            self._wake.wait(interval)
+            self._wake.clear()
+
+_engines: Dict[str, SheetSync] = {}
+_engines_lock = threading.Lock()
+
+def notify_written(db_file: str) -> None:
+    """Wakes the background sync of `db_file`, if one runs, after a committed write (see utils.ledger_written)."""
+    engine = _engines.get(db_file)
+    if engine is not None:
+        engine.notify()
+
+def start_from_secrets(secrets) -> Optional[SheetSync]:
+    """Starts (once per process and database) the background sync configured in `secrets`.
+
+    Returns None when QUYDOIBONG_SHEETS_SYNC is not set or the secrets lack
+    `gcp_service_account` / `spreadsheet_id`. The spreadsheet is opened on
+    the sync thread, so a slow or failing Google login never blocks a
+    session, and the engine is kept even then, so later sessions do not
+    retry it.
+    """
+    if os.environ.get("QUYDOIBONG_SHEETS_SYNC") != "1":
+        return None
+    try:
+        configured = "gcp_service_account" in secrets and "spreadsheet_id" in secrets
+    except FileNotFoundError:  # No secrets.toml at all
+        configured = False
+    if not configured:
+        utils.logger.warning("sheets_sync: enabled but gcp_service_account/spreadsheet_id missing from secrets")
+        return None
+
+    db_file = utils.DB_FILE
+    with _engines_lock:
+        engine = _engines.get(db_file)
+        if engine is None:
+            spreadsheet_id = secrets["spreadsheet_id"]
+            credentials = dict(secrets["gcp_service_account"])
+            engine = _engines[db_file] = SheetSync(
+                db_file=db_file, backend_factory=lambda: GspreadBackend(spreadsheet_id, credentials)
+            )
+            engine.start()
+    return engine
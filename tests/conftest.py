@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils  # noqa: E402
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    """A fresh database, migrated on first use, that is also the default fund."""
+    path = str(tmp_path / "data.db")
+    monkeypatch.setattr(utils, "DB_FILE", path)
+    yield path
+    utils.close_all_connections()
+
+
+@pytest.fixture
+def add(db_file):
+    """Insert one transaction directly, bypassing the write-behind queue."""
+    def add(transaction_id, transaction_type="expense", amount=100000, description="Thuê sân",
+            category=None, day="2025-03-01"):
+        category = category or utils.CATEGORIES[transaction_type][0]
+        with utils.get_connection(db_file) as conn:
+            utils.insert_transaction(conn, (transaction_id, transaction_type, amount, description, category, day, None))
+    return add
+
+
+@pytest.fixture
+def delete(db_file):
+    def delete(transaction_id):
+        with utils.get_connection(db_file) as conn:
+            return utils.delete_transaction_from_db(conn, transaction_id)
+    return delete
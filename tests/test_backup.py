@@ -0,0 +1,25 @@
+from datetime import datetime
+
+import backup
+
+
+def test_snapshots_taken_in_the_same_second_are_all_kept(db_file, add, tmp_path, monkeypatch):
+    backup_dir = str(tmp_path / "backups")
+    second = datetime(2025, 3, 1, 20, 0, 0)
+    times = iter([second.replace(microsecond=1), second.replace(microsecond=2)])
+
+    class FrozenClock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return next(times)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(backup, "datetime", FrozenClock)
+        add("scheduled")
+        scheduled = backup.take_snapshot(db_file, backup_dir)
+        add("manual")
+        manual = backup.take_snapshot(db_file, backup_dir)
+
+    snapshots = backup.list_snapshots(db_file, backup_dir)
+    assert [s['path'] for s in snapshots] == [manual, scheduled]
+    assert [s['taken_at'] for s in snapshots] == [second.replace(microsecond=2), second.replace(microsecond=1)]
@@ -0,0 +1,32 @@
+import utils
+
+
+def test_an_evicted_pool_is_never_handed_a_connection(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "FUND_MAX_OPEN_POOLS", 1)
+    first, second = str(tmp_path / "first.db"), str(tmp_path / "second.db")
+
+    stale = utils.get_pool(first)
+    utils.get_pool(second)  # Evicts first, which has nothing checked out
+
+    assert stale.retired
+    assert stale.acquire() is None
+    assert stale.in_use == 0
+    with utils.get_connection(first) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone() == (0,)
+        assert utils.get_pool(first) is not stale
+    utils.close_all_connections()
+
+
+def test_a_pool_with_a_connection_checked_out_is_not_evicted(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "FUND_MAX_OPEN_POOLS", 1)
+    first, second = str(tmp_path / "first.db"), str(tmp_path / "second.db")
+
+    with utils.get_connection(first) as conn:
+        pool = utils.get_pool(first)
+        utils.get_pool(second)
+        assert not pool.retired
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+    utils.get_pool(str(tmp_path / "third.db"))  # Now idle, so it goes
+
+    assert pool.retired
+    utils.close_all_connections()
@@ -0,0 +1,46 @@
+import csv
+import os
+import time
+
+import pytest
+
+import exporter
+
+
+@pytest.fixture
+def export_dir(tmp_path, monkeypatch):
+    path = str(tmp_path / "exports")
+    monkeypatch.setattr(exporter, "EXPORT_STATIC_DIR", path)
+    return path
+
+
+def test_an_export_is_written_to_a_served_file(db_file, export_dir, add):
+    add("a", day="2025-03-02")
+    add("b", transaction_type="income", amount=500_000, day="2025-03-01")
+
+    count, url = exporter.export_to_static_file('csv', transaction_type='income')
+
+    name = url.rsplit("/", 1)[1]
+    assert count == 1
+    assert url == f"{exporter.EXPORT_STATIC_URL}/{name}"
+    assert os.listdir(export_dir) == [name]
+    with open(os.path.join(export_dir, name), encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.reader(f))
+    assert [row[:3] for row in rows] == [['id', 'type', 'amount'], ['b', 'income', '500000']]
+
+
+def test_an_empty_export_leaves_no_file(db_file, export_dir):
+    assert exporter.export_to_static_file('csv') == (0, None)
+    assert os.listdir(export_dir) == []
+
+
+def test_old_exports_are_removed(db_file, export_dir, add):
+    add("a")
+    _, url = exporter.export_to_static_file('csv')
+    old = os.path.join(export_dir, url.rsplit("/", 1)[1])
+    stale = time.time() - exporter.EXPORT_FILE_MAX_AGE_SECONDS - 1
+    os.utime(old, (stale, stale))
+
+    _, url = exporter.export_to_static_file('csv')
+
+    assert os.listdir(export_dir) == [url.rsplit("/", 1)[1]]
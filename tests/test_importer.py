@@ -0,0 +1,113 @@
+import io
+
+import pandas as pd
+import pytest
+
+import importer
+import utils
+
+
+@pytest.mark.parametrize("value, amount", [
+    ("1.234.567", 1_234_567),
+    ("1,234,567", 1_234_567),
+    ("1 234 567", 1_234_567),
+    ("1 234 567", 1_234_567),
+    ("100000", 100_000),
+    ("100.000,00", 100_000),
+    ("100000,0", 100_000),
+    ("1,5tr", 1_500_000),
+    ("1.5 triệu", 1_500_000),
+    ("2TR", 2_000_000),
+    ("500k", 500_000),
+    ("1,25k", 1_250),
+    ("300 nghìn", 300_000),
+    ("100.000đ", 100_000),
+    ("250.000 VND", 250_000),
+    (150000.0, 150_000),
+    (42, 42),
+])
+def test_vietnamese_amounts_parse_to_whole_dong(value, amount):
+    assert importer._parse_import_amount(value) == amount
+
+
+@pytest.mark.parametrize("value", [
+    "1.000.50",   # Group separator reused as a decimal point
+    "1.234,567",  # Mixed separators
+    "12.5",       # A decimal, not a thousands group
+    "1.000,50",   # Non-zero decimal part
+    "1,2345k",    # 1234.5 đồng
+    "1.5",
+    "một triệu",
+    "",
+    1500.5,
+    True,
+])
+def test_ambiguous_or_fractional_amounts_are_rejected(value):
+    with pytest.raises(ValueError):
+        importer._parse_import_amount(value)
+
+
+def csv_file(rows):
+    return io.BytesIO(pd.DataFrame(rows).to_csv(index=False).encode("utf-8"))
+
+
+def stored(db_file):
+    with utils.get_connection(db_file) as conn:
+        return sorted(row[1:5] for row in conn.execute(utils.TRANSACTION_SELECT))
+
+
+def test_invalid_rows_are_skipped_and_reported_by_line(db_file):
+    file = csv_file([
+        {'Loại': 'Thu', 'Số tiền': '1.500.000', 'Mô tả': 'Phí tháng 3', 'Danh mục': 'Đóng phí', 'Ngày': '01/03/2025'},
+        {'Loại': 'Chi', 'Số tiền': '1,5tr', 'Mô tả': 'Thuê sân', 'Danh mục': 'Đóng phí', 'Ngày': '2025-03-02'},
+        {'Loại': 'Chi', 'Số tiền': '12.5', 'Mô tả': 'Nước', 'Danh mục': 'Nước uống', 'Ngày': '2025-03-03'},
+        {'Loại': 'Hoàn', 'Số tiền': '100k', 'Mô tả': 'Hoàn tiền', 'Danh mục': 'Khác', 'Ngày': '2025-03-04'},
+        {'Loại': 'chi', 'Số tiền': '200k', 'Mô tả': 'Bóng mới', 'Danh mục': 'Thiết bị', 'Ngày': '31/02/2025'},
+        {'Loại': 'chi', 'Số tiền': '200k', 'Mô tả': '', 'Danh mục': 'Thiết bị', 'Ngày': '2025-03-05'},
+        {'Loại': 'expense', 'Số tiền': '450.000đ', 'Mô tả': 'Thuê sân', 'Danh mục': 'Sân bóng', 'Ngày': '05-03-2025'},
+    ])
+
+    result = importer.import_transactions(file, "so_quy.csv")
+
+    assert result['imported'] == 2
+    assert result['error_count'] == 5
+    assert [error['line'] for error in result['errors']] == [3, 4, 5, 6, 7]
+    assert "danh mục 'Đóng phí'" in result['errors'][0]['error']
+    assert stored(db_file) == [
+        ('expense', 450_000, 'Thuê sân', 'Sân bóng'),
+        ('income', 1_500_000, 'Phí tháng 3', 'Đóng phí'),
+    ]
+    assert utils.get_ledger_totals() == {'income': 1_500_000, 'expense': 450_000}
+
+
+def test_an_error_mid_file_rolls_back_every_chunk(db_file, add, monkeypatch):
+    add("existing", amount=30_000)
+    monkeypatch.setattr(importer, "IMPORT_CHUNK_SIZE", 2)
+    lines = ["type,amount,description,category,date"]
+    lines += [f"income,100000,Phí {i},Đóng phí,2025-03-0{i}" for i in range(1, 6)]
+    lines.append("income,100000,Phí lỗi,Đóng phí,2025-03-09,thừa cột")  # Fails to parse in the third chunk
+
+    with pytest.raises(Exception):
+        importer.import_transactions(io.BytesIO("\n".join(lines).encode("utf-8")), "so_quy.csv")
+
+    assert stored(db_file) == [('expense', 30_000, 'Thuê sân', 'Sân bóng')]
+    assert utils.get_ledger_totals() == {'income': 0, 'expense': 30_000}
+
+
+def test_xlsx_cells_are_read_as_numbers_and_dates(db_file, tmp_path):
+    from openpyxl import Workbook
+    from datetime import datetime
+
+    path = tmp_path / "so_quy.xlsx"
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["type", "amount", "description", "category", "date"])
+    sheet.append(["income", 250000, "Tài trợ áo", "Tài trợ", datetime(2025, 3, 1)])
+    sheet.append(["expense", 99999.5, "Lẻ đồng", "Khác", datetime(2025, 3, 2)])
+    workbook.save(path)
+
+    with open(path, "rb") as file:
+        result = importer.import_transactions(file, "so_quy.xlsx")
+
+    assert (result['imported'], [error['line'] for error in result['errors']]) == (1, [3])
+    assert stored(db_file) == [('income', 250_000, 'Tài trợ áo', 'Tài trợ')]
@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+import utils
+import write_behind
+
+
+@pytest.fixture(params=[False, True], ids=["direct", "write-behind"])
+def ledger(request, db_file, monkeypatch):
+    """add/delete through the app's entry points, waiting for write-behind commits."""
+    monkeypatch.setattr(write_behind, "WRITE_BEHIND", request.param)
+
+    class Ledger:
+        @staticmethod
+        def add(transaction_type, amount, category, day, description="Giao dịch"):
+            future = utils.add_transaction({
+                'type': transaction_type, 'amount': amount, 'description': description,
+                'category': category, 'date': day,
+            })
+            return future.result(timeout=10)
+
+        @staticmethod
+        def delete(transaction_id):
+            return utils.delete_transaction(transaction_id).result(timeout=10)
+
+    return Ledger
+
+
+def recount(db_file):
+    """Summary and rollup rebuilt from the transactions themselves."""
+    with utils.get_connection(db_file) as conn:
+        summary = dict(conn.execute("SELECT type_code, SUM(amount) FROM transactions GROUP BY 1"))
+        rollup = conn.execute(
+            "SELECT month, type_code, COALESCE(category_code, 0), SUM(amount), COUNT(*) FROM transactions"
+            " GROUP BY 1, 2, 3 ORDER BY 1, 2, 3"
+        ).fetchall()
+    return summary, rollup
+
+
+def stored_aggregates(db_file):
+    with utils.get_connection(db_file) as conn:
+        summary = dict(conn.execute("SELECT type_code, total FROM ledger_summary WHERE count > 0"))
+        rollup = conn.execute(
+            "SELECT month, type_code, category_code, total, count FROM monthly_rollup ORDER BY 1, 2, 3"
+        ).fetchall()
+    return summary, rollup
+
+
+def test_add_and_delete_update_every_total(ledger):
+    ledger.add('income', 500_000, 'Đóng phí', "2025-03-01")
+    pitch = ledger.add('expense', 200_000, 'Sân bóng', "2025-03-15")
+    ledger.add('expense', 50_000, 'Nước uống', "2025-04-02")
+
+    assert utils.get_ledger_totals() == {'income': 500_000, 'expense': 250_000}
+    assert utils.get_monthly_report("2025-03")['balance'] == 300_000
+    assert utils.get_expense_by_category() == {'Sân bóng': 200_000, 'Nước uống': 50_000}
+
+    assert ledger.delete(pitch) == ('expense', 200_000)
+
+    assert utils.get_ledger_totals() == {'income': 500_000, 'expense': 50_000}
+    assert utils.get_monthly_report("2025-03")['total_expense'] == 0
+    assert utils.get_expense_by_category("2025-03") == {}
+    assert utils.get_expense_by_category() == {'Nước uống': 50_000}
+
+
+def test_deleting_a_months_last_row_removes_it_from_the_rollup(ledger):
+    only = ledger.add('expense', 50_000, 'Nước uống', "2025-04-02")
+    ledger.add('expense', 10_000, 'Nước uống', "2025-05-02")
+
+    ledger.delete(only)
+
+    assert utils.get_all_months() == ["2025-05"]
+
+
+def test_deleting_an_unknown_id_changes_nothing(ledger):
+    ledger.add('income', 100_000, 'Tài trợ', "2025-01-10")
+
+    assert ledger.delete("no-such-id") is None
+    assert utils.get_ledger_totals() == {'income': 100_000, 'expense': 0}
+
+
+def test_aggregates_match_a_recount_after_random_writes(db_file, ledger):
+    rng = random.Random(7)
+    ids = []
+    for _ in range(200):
+        if ids and rng.random() < 0.3:
+            ledger.delete(ids.pop(rng.randrange(len(ids))))
+        else:
+            transaction_type = rng.choice(['income', 'expense'])
+            ids.append(ledger.add(
+                transaction_type, rng.randrange(1, 100) * 1_000, rng.choice(utils.CATEGORIES[transaction_type]),
+                f"2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+            ))
+
+    assert stored_aggregates(db_file) == recount(db_file)
+    summary, _ = recount(db_file)
+    assert utils.get_ledger_totals() == {name: summary.get(code, 0) for name, code in utils.TYPE_CODES.items()}
+
+
+def test_an_add_that_cannot_connect_changes_no_total(db_file, monkeypatch):
+    utils.get_ledger_totals()
+    version = utils.get_ledger_cache().version
+    with monkeypatch.context() as patch:
+        patch.setattr(utils.ConnectionPool, "acquire", lambda pool: None)
+        future = utils.add_transaction({
+            'type': 'income', 'amount': 100_000, 'description': "Tiền sân", 'category': 'Đóng phí', 'date': "2025-03-01",
+        })
+
+    assert isinstance(future.exception(), utils.sqlite3.OperationalError)
+    assert utils.get_ledger_cache().version == version
+    assert utils.get_ledger_totals() == {'income': 0, 'expense': 0}
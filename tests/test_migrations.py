@@ -0,0 +1,123 @@
+import sqlite3
+
+import pytest
+
+import utils
+
+# Rows as the pre-v2 app (or a hand-edited file) could have stored them
+LEGACY_ROWS = [
+    ("ok-type-case", "Income ", 100000.0, "Tiền sân tháng 1", " Tiền quỹ ", "2024-01-05", None),
+    ("ok-date-space", "EXPENSE", 20000.4, "Nước cho trận giao hữu", "Nước uống", " 2024-02-01 ", None),
+    ("ok-rounding", "expense", 1234.6, "Băng keo", "Thiết bị", "2024-02-03", "abc.png"),
+    ("null-date", "expense", 5000, "Không có ngày", "Nước uống", None, None),
+    ("empty-date", "expense", 5000, "Ngày trống", "Nước uống", "", None),
+    ("bad-date", "expense", 5000, "Ngày sai", "Nước uống", "31/02/2024", None),
+    ("bad-type", "refund", 5000, "Hoàn tiền", None, "2024-01-05", None),
+    ("bad-amount", "expense", "năm nghìn", "Số tiền chữ", None, "2024-01-05", None),
+    (None, "expense", 5000, "Không có mã", "Nước uống", "2024-01-05", None),  # TEXT PRIMARY KEY allows NULL
+]
+
+
+@pytest.fixture
+def legacy_db(tmp_path, monkeypatch):
+    """A database at schema version 1 (the original layout) holding LEGACY_ROWS."""
+    path = str(tmp_path / "legacy.db")
+    with monkeypatch.context() as patch:
+        patch.setattr(utils, "MIGRATIONS", utils.MIGRATIONS[:1])
+        patch.setattr(utils, "SCHEMA_VERSION", 1)
+        utils.migrate_database(path)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO transactions VALUES (?,?,?,?,?,?,?)", LEGACY_ROWS)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_migration_keeps_every_legacy_row(legacy_db):
+    assert utils.migrate_database(legacy_db) == utils.SCHEMA_VERSION
+
+    with utils.get_connection(legacy_db) as conn:
+        stored = {row[0]: row[1:] for row in conn.execute(utils.TRANSACTION_SELECT)}
+        quarantined = dict(conn.execute("SELECT id, reason FROM transactions_quarantine"))
+    utils.close_all_connections()
+
+    assert stored == {
+        "ok-type-case": ('income', 100000, "Tiền sân tháng 1", "Tiền quỹ", "2024-01-05", None),
+        "ok-date-space": ('expense', 20000, "Nước cho trận giao hữu", "Nước uống", "2024-02-01", None),
+        "ok-rounding": ('expense', 1235, "Băng keo", "Thiết bị", "2024-02-03", "abc.png"),
+    }
+    assert quarantined == {
+        "null-date": 'date', "empty-date": 'date', "bad-date": 'date', "bad-type": 'type', "bad-amount": 'amount',
+        None: 'id',
+    }
+    assert len(stored) + len(quarantined) == len(LEGACY_ROWS)
+
+
+def test_duplicate_ids_keep_the_first_row(tmp_path):
+    # A hand-made file without the primary key can hold the same id twice
+    path = str(tmp_path / "duplicates.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE transactions (id TEXT, type TEXT NOT NULL, amount REAL NOT NULL,"
+        " description TEXT, category TEXT, date TEXT, image_url TEXT)"
+    )
+    conn.executemany("INSERT INTO transactions VALUES (?,?,?,?,?,?,?)", [
+        ("dup", "income", 100000, "Tiền sân", "Tiền quỹ", "2024-01-05", None),
+        ("dup", "expense", 20000, "Nước uống", "Nước uống", "2024-01-06", None),
+        ("dup", "refund", 5000, "Hoàn tiền", None, "2024-01-07", None),
+        ("other", "expense", 30000, "Băng keo", "Thiết bị", "2024-01-08", None),
+    ])
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+    assert utils.migrate_database(path) == utils.SCHEMA_VERSION
+
+    with utils.get_connection(path) as conn:
+        stored = conn.execute("SELECT id, amount FROM transactions ORDER BY id").fetchall()
+        quarantined = conn.execute("SELECT id, amount, reason FROM transactions_quarantine ORDER BY rowid").fetchall()
+        summary = dict(conn.execute("SELECT type_code, total FROM ledger_summary WHERE count > 0"))
+    utils.close_all_connections()
+
+    assert stored == [("dup", 100000), ("other", 30000)]
+    assert quarantined == [("dup", 20000, 'duplicate id'), ("dup", 5000, 'duplicate id')]
+    assert summary == {utils.TYPE_CODES['income']: 100000, utils.TYPE_CODES['expense']: 30000}
+
+
+def test_migrated_aggregates_and_search_match_the_kept_rows(legacy_db):
+    utils.migrate_database(legacy_db)
+
+    with utils.get_connection(legacy_db) as conn:
+        summary = dict(conn.execute("SELECT type_code, total FROM ledger_summary WHERE count > 0"))
+        rollup = conn.execute("SELECT month, type_code, SUM(total) FROM monthly_rollup GROUP BY 1, 2 ORDER BY 1, 2").fetchall()
+        legacy_code = conn.execute("SELECT code FROM categories WHERE name = 'Tiền quỹ'").fetchone()[0]
+        found = conn.execute(
+            "SELECT t.id FROM transactions_fts JOIN transactions t ON t.seq = transactions_fts.rowid"
+            " WHERE transactions_fts MATCH ?", (utils.build_search_query("tien quy"),)
+        ).fetchall()
+    utils.close_all_connections()
+
+    assert summary == {utils.TYPE_CODES['income']: 100000, utils.TYPE_CODES['expense']: 21235}
+    assert rollup == [(202401, 1, 100000), (202402, 2, 21235)]
+    assert legacy_code >= 1000  # Categories outside CATEGORY_CODES get codes from 1000 up
+    assert found == [("ok-type-case",)]
+
+
+def test_migrating_a_current_database_is_a_no_op(legacy_db):
+    utils.migrate_database(legacy_db)
+    conn = sqlite3.connect(legacy_db)
+    data_version = conn.execute("PRAGMA data_version").fetchone()[0]  # Changes when another connection commits
+
+    assert utils.migrate_database(legacy_db) == utils.SCHEMA_VERSION
+    assert conn.execute("PRAGMA data_version").fetchone()[0] == data_version
+    conn.close()
+
+
+def test_a_newer_schema_is_refused(tmp_path):
+    path = str(tmp_path / "future.db")
+    conn = sqlite3.connect(path)
+    conn.execute(f"PRAGMA user_version = {utils.SCHEMA_VERSION + 1}")
+    conn.close()
+
+    with pytest.raises(utils.SchemaError):
+        utils.get_pool(path)
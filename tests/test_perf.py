@@ -0,0 +1,33 @@
+import logging
+
+import pytest
+
+import perf
+
+
+@pytest.fixture
+def log_records():
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    level = perf.logger.level
+    perf.logger.addHandler(handler)
+    yield records
+    perf.logger.removeHandler(handler)
+    perf.logger.setLevel(level)
+
+
+@pytest.mark.parametrize("name, level", [("debug", logging.DEBUG), ("WARNING", logging.WARNING)])
+def test_a_level_name_sets_the_level(log_records, name, level):
+    perf.set_log_level(name)
+
+    assert perf.logger.level == level
+    assert log_records == []
+
+
+def test_an_unknown_level_falls_back_to_info_with_a_warning(log_records):
+    perf.set_log_level("verbose")
+
+    assert perf.logger.level == logging.INFO
+    assert [record.levelno for record in log_records] == [logging.WARNING]
+    assert "verbose" in log_records[0].getMessage()
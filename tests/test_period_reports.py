@@ -0,0 +1,77 @@
+import pytest
+
+import utils
+
+
+@pytest.mark.parametrize("kind, value, bounds", [
+    ('month', "2024-12", ("2024-12-01", "2025-01-01")),
+    ('month', "2024-02", ("2024-02-01", "2024-03-01")),
+    ('quarter', "2024-Q4", ("2024-10-01", "2025-01-01")),
+    ('quarter', "2025-Q1", ("2025-01-01", "2025-04-01")),
+    ('season', "2024", ("2024-08-01", "2025-08-01")),
+    ('year', "2024", ("2024-01-01", "2025-01-01")),
+])
+def test_period_bounds(kind, value, bounds):
+    assert utils.period_bounds(kind, value) == bounds
+
+
+def test_period_bounds_rejects_unknown_kind():
+    with pytest.raises(ValueError):
+        utils.period_bounds('week', "2025-01")
+
+
+@pytest.mark.parametrize("kind, month, period", [
+    ('quarter', "2024-12", "2024-Q4"),
+    ('quarter', "2025-01", "2025-Q1"),
+    ('season', "2024-07", "2023"),  # July closes the season that began the previous August
+    ('season', "2024-08", "2024"),
+    ('season', "2025-01", "2024"),
+    ('year', "2024-12", "2024"),
+])
+def test_period_of(kind, month, period):
+    assert utils.period_of(kind, month) == period
+
+
+@pytest.mark.parametrize("kind, value, previous", [
+    ('month', "2025-01", "2024-12"),
+    ('quarter', "2025-Q1", "2024-Q4"),
+    ('season', "2024", "2023"),
+    ('year', "2025", "2024"),
+])
+def test_previous_period_crosses_year_boundaries(kind, value, previous):
+    assert utils.previous_period(kind, value) == previous
+
+
+def test_season_label_wraps_the_century():
+    assert utils.period_label('season', "2099") == "Mùa 2099/00"
+
+
+def test_range_label_shows_the_last_included_day():
+    assert utils.period_label('range', ("2024-12-15", "2025-01-01")) == "15/12/2024 – 31/12/2024"
+
+
+def test_range_totals_combine_rollup_and_partial_months(db_file, add):
+    add("before", amount=1_000, day="2024-11-30")
+    add("start", amount=20_000, day="2024-12-15")
+    add("whole", amount=300_000, day="2025-01-20")
+    add("end", amount=4_000_000, day="2025-02-09")
+    add("after", amount=50_000_000, day="2025-02-10")
+
+    report = utils.get_range_report("2024-12-15", "2025-02-10")
+
+    assert report['total_expense'] == 4_320_000
+    assert report['total_income'] == 0
+
+
+def test_season_report_runs_august_to_july(db_file, add):
+    add("previous-season", amount=1_000, day="2024-07-31")
+    add("opening-day", amount=20_000, day="2024-08-01")
+    add("closing-day", amount=300_000, day="2025-07-31")
+    add("next-season", amount=4_000_000, day="2025-08-01")
+
+    report = utils.get_period_report('season', "2024")
+
+    assert report['label'] == "Mùa 2024/25"
+    assert report['total_expense'] == 320_000
+    assert report['previous']['label'] == "Mùa 2023/24"
+    assert report['previous']['total_expense'] == 1_000
@@ -0,0 +1,123 @@
+import time
+
+import pytest
+
+import sheets_sync
+import utils
+
+
+@pytest.fixture
+def backend():
+    return sheets_sync.FakeSheetBackend()
+
+
+@pytest.fixture
+def sync(db_file, backend, monkeypatch):
+    monkeypatch.setattr(sheets_sync, "SYNC_BACKOFF_SECONDS", 0)
+    return sheets_sync.SheetSync(backend, db_file)
+
+
+def sheet_rows(backend):
+    return {row[0]: row for row in backend.rows[1:]}
+
+
+def test_register_pushes_existing_rows_in_one_append(sync, backend, add):
+    add("a", day="2025-03-02")
+    add("b", day="2025-03-01")
+
+    result = sync.sync_all()
+
+    assert result['appended'] == 2
+    assert backend.rows[0] == sheets_sync.HEADER
+    assert [row[0] for row in backend.rows[1:]] == ["b", "a"]
+    assert backend.calls['append_rows'] == 1
+    assert sync.backlog() == 0
+
+
+def test_changes_collapse_to_updates_deletes_and_appends(db_file, sync, backend, add, delete):
+    add("a")
+    add("b")
+    sync.sync_all()
+
+    with utils.get_connection(db_file) as conn:
+        conn.execute("UPDATE transactions SET amount = 250000 WHERE id = 'a'")
+        conn.commit()
+    delete("b")
+    add("c")
+    add("d")
+    delete("d")  # Inserted and deleted between syncs: never reaches the sheet
+
+    result = sync.sync_once()
+
+    assert (result['updated'], result['deleted'], result['appended']) == (1, 1, 1)
+    rows = sheet_rows(backend)
+    assert set(rows) == {"a", "c"}
+    assert rows["a"][2] == 250000
+
+
+def test_transient_errors_are_retried(sync, backend, add):
+    add("a")
+    backend.fail_next = 2
+
+    sync.sync_all()
+
+    assert set(sheet_rows(backend)) == {"a"}
+    assert backend.calls['read_ids'] == 3
+
+
+def test_rows_edited_in_the_sheet_are_overwritten_by_the_ledger(db_file, sync, backend, add):
+    add("a", amount=100000)
+    sync.sync_all()
+    backend.rows[1][2] = 1  # Someone edits the mirror by hand
+
+    with utils.get_connection(db_file) as conn:
+        conn.execute("UPDATE transactions SET description = 'Thuê sân tối' WHERE id = 'a'")
+        conn.commit()
+    sync.sync_all()
+
+    assert sheet_rows(backend)["a"][2:4] == [100000, "Thuê sân tối"]
+
+
+def test_a_failed_batch_is_resent_without_duplicates(sync, backend, add, monkeypatch):
+    add("a")
+    add("b")
+    append_rows = backend.append_rows
+
+    def append_then_fail(rows):
+        # The sheet accepts the rows but the reply is lost
+        append_rows(rows)
+        raise sheets_sync.SheetBackendError("connection reset")
+
+    monkeypatch.setattr(backend, "append_rows", append_then_fail)
+    with pytest.raises(sheets_sync.SheetBackendError):
+        sync.sync_all()
+    assert sync.backlog() == 2  # The high-water mark did not move
+
+    monkeypatch.setattr(backend, "append_rows", append_rows)
+    result = sync.sync_all()
+
+    assert (result['updated'], result['appended']) == (2, 0)
+    assert [row[0] for row in backend.rows[1:]] == ["a", "b"]
+    assert sync.backlog() == 0
+
+
+def wait_for_row(backend, transaction_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while transaction_id not in sheet_rows(backend) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return transaction_id in sheet_rows(backend)
+
+
+def test_a_committed_add_wakes_the_background_sync(db_file, sync, backend, add, monkeypatch):
+    monkeypatch.setitem(sheets_sync._engines, db_file, sync)
+    add("existing")
+    sync.start(interval=3600)  # After its first sync, only a wake-up syncs again within the test
+    try:
+        assert wait_for_row(backend, "existing")
+        transaction_id = utils.add_transaction({
+            'type': 'income', 'amount': 100_000, 'description': "Tiền sân", 'category': 'Đóng phí', 'date': "2025-03-01",
+        }).result(timeout=10)
+
+        assert wait_for_row(backend, transaction_id)
+    finally:
+        sync.stop(timeout=5)
@@ -0,0 +1,70 @@
+import pytest
+
+import utils
+
+
+def walk(limit, **filters):
+    """Follow next_cursor from the first page to the last, returning the ids of each page."""
+    pages, cursor = [], None
+    while True:
+        page = utils.query_transactions(after=cursor, limit=limit, **filters)
+        pages.append([transaction['id'] for transaction in page['transactions']])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return pages
+
+
+@pytest.fixture
+def ledger(add):
+    """Seven expenses where most share a date or an amount with another row."""
+    rows = {
+        "a": (100000, "2025-03-01"), "b": (200000, "2025-03-01"), "c": (100000, "2025-03-01"),
+        "d": (100000, "2025-03-02"), "e": (200000, "2025-03-02"), "f": (50000, "2025-03-03"),
+        "g": (100000, "2025-03-01"),
+    }
+    for transaction_id, (amount, day) in rows.items():
+        add(transaction_id, amount=amount, day=day)
+    return rows
+
+
+@pytest.mark.parametrize("sort", list(utils.SORT_COLUMNS))
+def test_paging_across_ties_visits_every_row_once_in_order(ledger, sort):
+    descending = utils.SORT_COLUMNS[sort][1]
+    key = (lambda i: (ledger[i][1], i)) if sort.startswith('date') else (lambda i: (ledger[i][0], i))
+    expected = sorted(ledger, key=key, reverse=descending)
+
+    pages = walk(limit=2, sort=sort)
+
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+    assert [i for page in pages for i in page] == expected
+
+
+def test_a_full_last_page_has_no_cursor(ledger, add):
+    add("h", amount=10000, day="2025-02-28")
+
+    pages = walk(limit=4, sort='date_desc')
+
+    assert pages == [["f", "e", "d", "g"], ["c", "b", "a", "h"]]
+    assert utils.query_transactions(limit=8)['next_cursor'] is None
+
+
+def test_filters_apply_on_every_page(ledger, add):
+    add("income", transaction_type="income", amount=100000, day="2025-03-01")
+
+    pages = walk(limit=2, transaction_type='expense', start="2025-03-01", end="2025-03-02", sort='amount_asc')
+
+    assert pages == [["a", "c"], ["g", "b"]]
+
+
+def test_paging_through_a_search_uses_offsets_and_ends(add):
+    for i in range(5):
+        add(f"san-{i}", description=f"Thuê sân tuần {i + 1}", day=f"2025-03-0{i + 1}")
+    add("nuoc", description="Nước uống", category="Nước uống")
+
+    first = utils.query_transactions(search="thue san", limit=2)
+    pages = walk(limit=2, search="thue san")
+
+    assert first['next_cursor'] == 2
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert sorted(i for page in pages for i in page) == [f"san-{i}" for i in range(5)]
+    assert walk(limit=2, search="nước") == [["nuoc"]]
@@ -0,0 +1,72 @@
+import pytest
+
+import utils
+import write_behind
+
+
+@pytest.fixture
+def stalled_queue(db_file, monkeypatch):
+    """A queue whose writer thread never runs, like a process killed before its next commit."""
+    monkeypatch.setattr(write_behind.WriteBehindQueue, "_run", lambda queue: None)
+    return write_behind.WriteBehindQueue(db_file)
+
+
+def journal(db_file):
+    with utils.get_connection(db_file) as conn:
+        return conn.execute("SELECT operation FROM write_journal ORDER BY id").fetchall()
+
+
+def reopen(db_file):
+    """Drop the file's pool, so the next connection goes through get_pool's first-use path again."""
+    utils.close_all_connections()
+    with utils._pools_lock:
+        assert utils._pools.pop(db_file).retire()
+
+
+def test_a_write_is_journaled_before_submit_returns(db_file, stalled_queue, add):
+    add("kept", amount=30_000)
+
+    future = stalled_queue.submit('insert', ("new", 'income', 100_000, "Tiền sân", 'Đóng phí', "2025-03-01", None))
+    stalled_queue.submit('delete', "kept")
+
+    assert not future.done()
+    assert journal(db_file) == [('insert',), ('delete',)]
+
+
+def test_uncommitted_writes_are_replayed_when_the_file_is_next_opened(db_file, stalled_queue, add):
+    add("kept", amount=30_000)
+    stalled_queue.submit('insert', ("new", 'income', 100_000, "Tiền sân", 'Đóng phí', "2025-03-01", None))
+    stalled_queue.submit('delete', "kept")
+
+    reopen(db_file)
+
+    with utils.get_connection(db_file) as conn:
+        ids = [row[0] for row in conn.execute("SELECT id FROM transactions")]
+    assert ids == ["new"]
+    assert journal(db_file) == []
+    assert utils.get_ledger_totals() == {'income': 100_000, 'expense': 0}
+
+
+def test_a_committed_batch_clears_its_journal_entries(db_file, monkeypatch):
+    monkeypatch.setattr(write_behind, "WRITE_BEHIND", True)
+
+    future = utils.add_transaction({
+        'type': 'expense', 'amount': 50_000, 'description': "Nước", 'category': 'Nước uống', 'date': "2025-03-01",
+    })
+    transaction_id = future.result(timeout=10)
+    write_behind.flush_writes()
+
+    assert journal(db_file) == []
+    reopen(db_file)  # Nothing to replay, so nothing is applied twice
+    assert utils.get_ledger_totals() == {'income': 0, 'expense': 50_000}
+    assert utils.delete_transaction(transaction_id).result(timeout=10) == ('expense', 50_000)
+
+
+def test_a_write_that_fails_alone_is_not_replayed(db_file, stalled_queue, add):
+    add("taken")
+    stalled_queue.submit('insert', ("taken", 'income', 1_000, "Trùng mã", 'Đóng phí', "2025-03-01", None))
+
+    reopen(db_file)
+
+    assert journal(db_file) == []
+    assert utils.get_ledger_totals() == {'income': 0, 'expense': 100_000}
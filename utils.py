@@ -1,17 +1,63 @@
-import pandas as pd
+from __future__ import annotations
+
+import time
+_module_started = time.perf_counter()
+
 import streamlit as st
-from datetime import datetime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from datetime import date, timedelta
 import uuid
-import plotly.express as px
-import plotly.graph_objects as go
-from typing import Dict, List, Literal, Optional, TypedDict, Union
+from typing import Callable, Dict, Iterator, List, Literal, Optional, Set, Tuple, TypedDict, Union
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+import functools
+import html
+import importlib
+import itertools
+import os
+import re
+import threading
+import unicodedata
 import sqlite3 # Import SQLite
+import receipts
+import write_behind
+# Logging and timing spans (perf.py), re-exported for existing callers
+from perf import SLOW_SPAN_MS, _percentile, logger, perf_stats, span, timed  # noqa: F401
+
+# --- Lazy imports ---
+# pandas, numpy and plotly are loaded the first time a DataFrame or chart is
+# actually built, so pages that need neither don't pay for them on a cold
+# start. IMPORT_TIMES records how long each deferred import took.
+IMPORT_TIMES: Dict[str, float] = {}
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            started = time.perf_counter()
+            self._module = importlib.import_module(self._name)
+            IMPORT_TIMES[self._name] = (time.perf_counter() - started) * 1000
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+px = LazyModule('plotly.express')
+go = LazyModule('plotly.graph_objects')
 
 # --- Data Types ---
 class Transaction(TypedDict):
     id: str
     type: Literal['income', 'expense']
-    amount: float
+    amount: int  # đồng
     description: str
     category: str
     date: str
@@ -23,198 +69,1609 @@ CATEGORIES = {
     'expense': ['Sân bóng', 'Thiết bị', 'Nước uống', 'Đồng phục', 'Khác']
 }
 
+# Integer codes stored in place of the type and category names (schema v2).
+# They are written to the database: append new codes, never renumber, and
+# add a migration that re-runs LOOKUP_SEED_STATEMENTS when appending.
+TYPE_CODES = {'income': 1, 'expense': 2}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+CATEGORY_CODES = {
+    ('income', 'Đóng phí'): 1,
+    ('income', 'Tài trợ'): 2,
+    ('income', 'Khác'): 3,
+    ('expense', 'Sân bóng'): 11,
+    ('expense', 'Thiết bị'): 12,
+    ('expense', 'Nước uống'): 13,
+    ('expense', 'Đồng phục'): 14,
+    ('expense', 'Khác'): 15,
+}
+
 # --- Utility Functions ---
 def format_currency(amount: float) -> str:
     return f"{amount:,.0f} VNĐ"
 
+def format_amount(transaction: Transaction) -> str:
+    """Signed display amount, e.g. "+ 100,000 VNĐ" for income."""
+    sign = "+" if transaction['type'] == 'income' else "-"
+    return f"{sign} {format_currency(transaction['amount'])}"
+
+def fold_text(value: Optional[str]) -> Optional[str]:
+    """Lower-case text and strip Vietnamese diacritics, so "Sân bóng" and "san bong" compare equal."""
+    if value is None:
+        return None
+    decomposed = unicodedata.normalize('NFD', value.replace('đ', 'd').replace('Đ', 'D'))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
 # --- Database Configuration (SQLite) ---
 DB_FILE = "data.db"
 
-def create_connection():
+# --- Funds ---
+# Each fund (team) has its own SQLite file, so lock contention, table sizes
+# and caches stay per team. The default fund keeps using DB_FILE; the others
+# live in FUNDS_DIR/<slug>.db and are opened on first use. The active fund
+# is read from the session; code running outside a script run (threads,
+# CLI scripts) gets the default fund unless it passes a db_file.
+DEFAULT_FUND = "default"
+FUNDS_DIR = "funds"
+FUND_MAX_OPEN_POOLS = 16  # Idle pools beyond this are closed, least recently used first
+FUND_SLUG_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+def fund_slug(name: str) -> str:
+    """"Đội Trẻ 2" -> "doi-tre-2"; raises ValueError if nothing usable is left."""
+    slug = re.sub(r"[^a-z0-9_]+", "-", fold_text(name.strip())).strip("-")[:64]
+    if not FUND_SLUG_PATTERN.match(slug) or slug == DEFAULT_FUND:
+        raise ValueError(f"Tên quỹ không hợp lệ: {name}")
+    return slug
+
+def fund_db_file(fund: str) -> str:
+    if fund == DEFAULT_FUND:
+        return DB_FILE
+    if not FUND_SLUG_PATTERN.match(fund):
+        raise ValueError(f"Tên quỹ không hợp lệ: {fund}")
+    return os.path.join(FUNDS_DIR, f"{fund}.db")
+
+def list_funds() -> List[str]:
+    """The default fund followed by every fund database in FUNDS_DIR."""
+    funds = [DEFAULT_FUND]
+    if os.path.isdir(FUNDS_DIR):
+        funds += sorted(
+            name[:-3] for name in os.listdir(FUNDS_DIR)
+            if name.endswith(".db") and FUND_SLUG_PATTERN.match(name[:-3])
+        )
+    return funds
+
+def create_fund(name: str) -> str:
+    """Creates (and migrates) the database of a new fund; returns its slug."""
+    fund = fund_slug(name)
+    os.makedirs(FUNDS_DIR, exist_ok=True)
+    get_pool(fund_db_file(fund))
+    return fund
+
+def get_active_fund() -> str:
+    if get_script_run_ctx() is None:
+        return DEFAULT_FUND
+    return st.session_state.get('fund', DEFAULT_FUND)
+
+def active_db_file() -> str:
+    """Database file of the active fund; the default for every `db_file=None`."""
+    return fund_db_file(get_active_fund())
+
+# Connection tuning. WAL lets readers keep going while a session writes,
+# busy_timeout makes writers wait for the lock instead of failing straight
+# away, and synchronous=NORMAL is safe under WAL (only the last commits can
+# be lost on power failure, never corruption).
+DB_TIMEOUT_SECONDS = 5.0
+DB_BUSY_TIMEOUT_MS = 5000
+DB_CACHED_STATEMENTS = 256
+DB_POOL_SIZE = 8
+
+def create_connection(db_file: Optional[str] = None):
+    """Open a new, tuned connection to the SQLite database."""
     conn = None
     try:
-        conn = sqlite3.connect(DB_FILE)
-    except sqlite3.Error as e:
-        print(e)
+        conn = sqlite3.connect(
+            db_file or active_db_file(),
+            timeout=DB_TIMEOUT_SECONDS,
+            cached_statements=DB_CACHED_STATEMENTS,
+            check_same_thread=False  # Pooled connections move between session threads
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        # Only migrations call it, to backfill transactions.search_text
+        conn.create_function("fold_text", 1, fold_text, deterministic=True)
+    except sqlite3.Error:
+        logger.exception("create_connection: could not open %s", db_file or active_db_file())
     return conn
 
-def create_table(conn):
-    sql_create_table = """
-    CREATE TABLE IF NOT EXISTS transactions (
-        id TEXT PRIMARY KEY,
-        type TEXT NOT NULL,
-        amount REAL NOT NULL,
-        description TEXT,
-        category TEXT,
-        date TEXT,
-        image_url TEXT
-    );
+class ConnectionPool:
+    """Process-wide pool of long-lived connections to one database file.
+
+    A connection is handed to exactly one thread at a time, so Streamlit
+    sessions (each running in its own thread) never share a cursor.
+    """
+
+    def __init__(self, db_file: str, size: int = DB_POOL_SIZE):
+        self.db_file = db_file
+        self.size = size
+        self._idle: List[sqlite3.Connection] = []
+        self.in_use = 0
+        self.retired = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Optional[sqlite3.Connection]:
+        """Check out a connection, or return None if it cannot be opened or the pool is retired."""
+        with self._lock:
+            if self.retired:
+                return None
+            self.in_use += 1
+            if self._idle:
+                return self._idle.pop()
+        conn = create_connection(self.db_file)
+        if conn is None:
+            with self._lock:
+                self.in_use -= 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self.in_use -= 1
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def retire(self) -> bool:
+        """Close the pool for good if nothing is checked out, and return whether it was.
+
+        Checked under the pool's own lock, so it cannot race an acquire().
+        """
+        with self._lock:
+            if self.in_use:
+                return False
+            self.retired = True
+        self.close_all()
+        return True
+
+_pools: OrderedDict = OrderedDict()  # db_file -> ConnectionPool, least recently used first
+_pools_lock = threading.Lock()
+_migration_locks: Dict[str, threading.Lock] = {}  # db_file -> lock held while it is migrated
+
+def get_pool(db_file: Optional[str] = None) -> ConnectionPool:
+    """Return the shared pool for a database file, migrating the schema on first use.
+
+    Write-behind mutations a previous process journaled but never committed
+    are applied at the same time. Raises SchemaError (and pools nothing) if
+    the file cannot be migrated.
+    """
+    db_file = db_file or active_db_file()
+    with _pools_lock:
+        pool = _pools.get(db_file)
+        if pool is not None:
+            _pools.move_to_end(db_file)
+            return pool
+        migration_lock = _migration_locks.setdefault(db_file, threading.Lock())
+
+    # Migrate under a per-file lock only, so a fund that is migrating or
+    # waiting on busy_timeout never stalls the sessions of other funds
+    with migration_lock:
+        with _pools_lock:
+            pool = _pools.get(db_file)
+        if pool is None:
+            migrate_database(db_file)
+            write_behind.replay_journal(db_file)
+            with _pools_lock:
+                pool = _pools[db_file] = ConnectionPool(db_file)
+                _evict_idle_pools()
+    return pool
+
+def _evict_idle_pools() -> None:
+    """Closes least recently used pools (and their caches) with nothing checked out. Holds _pools_lock.
+
+    The most recently used pool is kept, so get_pool never hands out a retired one.
+    """
+    for db_file in list(_pools)[:-1]:
+        if len(_pools) <= FUND_MAX_OPEN_POOLS:
+            return
+        if _pools[db_file].retire():
+            del _pools[db_file]
+            _ledger_caches.pop(db_file, None)
+
+@contextmanager
+def get_connection(db_file: Optional[str] = None) -> Iterator[Optional[sqlite3.Connection]]:
+    """Borrow a pooled connection for the duration of a `with` block.
+
+    Yields None if the database cannot be opened, like `create_connection`.
+    """
+    while True:
+        pool = get_pool(db_file)
+        conn = pool.acquire()
+        if not pool.retired:
+            break
+        # Evicted between get_pool and acquire: the file gets a new pool
+    try:
+        yield conn
+    finally:
+        if conn is not None:
+            pool.release(conn)
+
+def close_all_connections() -> None:
+    """Close every idle pooled connection (e.g. before replacing the DB file).
+
+    Queued write-behind mutations are committed first.
+    """
+    write_behind.flush_writes()
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
+
+# --- Shared ledger cache ---
+# Versions come from one process-wide counter, so a version is never reused:
+# not after a cache is evicted and recreated, and not by another fund's cache.
+_ledger_versions = itertools.count(1)
+
+LEDGER_CACHE_MAX_ENTRIES = 512
+
+class LedgerCache:
+    """Process-wide cache of ledger reads for one database file.
+
+    Every write bumps `version`, which drops all cached results at once.
+    Sessions compare the version they last saw with the current one to
+    know when their own state (the summary card) is stale. Cached values
+    are shared between sessions and must not be mutated.
+    """
+
+    def __init__(self, max_entries: int = LEDGER_CACHE_MAX_ENTRIES):
+        self.version = next(_ledger_versions)
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bump(self) -> int:
+        with self._lock:
+            self.version = next(_ledger_versions)
+            self._entries.clear()
+            return self.version
+
+    def get_or_load(self, key, loader: Callable):
+        with self._lock:
+            version = self.version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = loader()
+        with self._lock:
+            # Drop the result if a write landed while it was being loaded
+            if self.version == version:
+                self._entries[key] = value
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+_ledger_caches: Dict[str, LedgerCache] = {}
+
+def get_ledger_cache(db_file: Optional[str] = None) -> LedgerCache:
+    """Return the shared cache for a database file."""
+    db_file = db_file or active_db_file()
+    with _pools_lock:
+        cache = _ledger_caches.get(db_file)
+        if cache is None:
+            cache = _ledger_caches[db_file] = LedgerCache()
+        return cache
+
+def ledger_written(db_file: Optional[str] = None) -> None:
+    """Call after committing changes to transactions: drops cached reads and wakes the Sheets mirror."""
+    db_file = db_file or active_db_file()
+    get_ledger_cache(db_file).bump()
+    import sheets_sync  # Not at the top: sheets_sync reads utils at import time
+    sheets_sync.notify_written(db_file)
+
+def ledger_cached(func: Callable) -> Callable:
+    """Serve a read-only ledger query from the shared cache, keyed by its arguments."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        return get_ledger_cache().get_or_load(key, lambda: func(*args, **kwargs))
+    return wrapper
+
+# --- Storage encoding (schema v2) ---
+# Amounts are stored as integer đồng, dates as day numbers counted from
+# 1970-01-01 (with a generated integer YYYYMM `month` column), and types and
+# categories as the codes above. Everything outside this module's SQL keeps
+# working with plain transaction dicts: TRANSACTION_SELECT decodes rows back
+# to (id, type, amount, description, category, date, image_url) and
+# encode_transaction turns that tuple into the stored row. The row also
+# carries search_text, the folded description and category that the
+# full-text index reads; it is computed here rather than by a SQL function
+# so that any SQLite client can write to the table.
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def day_number(value: str) -> int:
+    """"2025-06-30" -> days since 1970-01-01, the stored form of a date."""
+    return date.fromisoformat(value[:10]).toordinal() - EPOCH_ORDINAL
+
+def month_key(month: str) -> int:
+    """"2025-06" -> 202506, the stored form of a month."""
+    return int(month[:4]) * 100 + int(month[5:7])
+
+def month_label(key: int) -> str:
+    return f"{key // 100:04d}-{key % 100:02d}"
+
+def build_search_text(description: Optional[str], category: Optional[str]) -> str:
+    """Folded words the full-text index holds for a transaction."""
+    return ' '.join(fold_text(value) for value in (description, category) if value).strip()
+
+def encode_transaction(transaction: Tuple) -> Tuple:
+    """Stored row for an (id, type, amount, description, category, date, image_url) tuple.
+
+    Raises ValueError for an unknown type or category.
+    """
+    transaction_id, transaction_type, amount, description, category, day, image_url = transaction
+    type_code = TYPE_CODES.get(transaction_type)
+    if type_code is None:
+        raise ValueError(f"Loại giao dịch không hợp lệ: {transaction_type}")
+    category_code = None
+    if category is not None:
+        category_code = CATEGORY_CODES.get((transaction_type, category))
+        if category_code is None:
+            raise ValueError(f"Danh mục không hợp lệ: {category}")
+    return (
+        transaction_id, type_code, int(round(amount)), description, category_code, day_number(day), image_url,
+        build_search_text(description, category)
+    )
+
+def _sql_text(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+TYPE_NAME_SQL = "CASE t.type_code " + " ".join(f"WHEN {code} THEN {_sql_text(name)}" for code, name in TYPE_NAMES.items()) + " END"
+TRANSACTION_COLUMNS_SQL = (
+    f"t.id, {TYPE_NAME_SQL}, t.amount, t.description, c.name, date(t.day * 86400, 'unixepoch'), t.image_url"
+)
+CATEGORY_JOIN_SQL = "LEFT JOIN categories c ON c.code = t.category_code"
+TRANSACTION_SELECT = f"SELECT {TRANSACTION_COLUMNS_SQL} FROM transactions t {CATEGORY_JOIN_SQL}"
+INSERT_TRANSACTION_SQL = (
+    "INSERT INTO transactions(id, type_code, amount, description, category_code, day, image_url, search_text)"
+    " VALUES(?,?,?,?,?,?,?,?)"
+)
+
+# Idempotent, so a later migration can re-run them to add appended codes
+LOOKUP_SEED_STATEMENTS = [
+    "INSERT OR IGNORE INTO transaction_types(code, name) VALUES "
+    + ", ".join(f"({code}, {_sql_text(name)})" for name, code in TYPE_CODES.items()),
+    "INSERT OR IGNORE INTO categories(code, type_code, name) VALUES "
+    + ", ".join(f"({code}, {TYPE_CODES[t]}, {_sql_text(name)})" for (t, name), code in CATEGORY_CODES.items()),
+]
+
+# --- Schema migrations ---
+# Each entry is (version, statements). The database records the last
+# applied version in PRAGMA user_version, and pending migrations run once per
+# process when the first connection to a file is pooled. Statements are
+# idempotent so databases created before versioning upgrade cleanly.
+MIGRATIONS: List[Tuple[int, List[str]]] = [
+    # 1: base table
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id TEXT PRIMARY KEY,
+            type TEXT NOT NULL,
+            amount REAL NOT NULL,
+            description TEXT,
+            category TEXT,
+            date TEXT,
+            image_url TEXT
+        )
+        """,
+    ]),
+    # 2: running totals per type, read by update_summary in O(1)
+    (2, [
+        """
+        CREATE TABLE IF NOT EXISTS ledger_summary (
+            type TEXT PRIMARY KEY,
+            total REAL NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_summary_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO ledger_summary(type, total, count) VALUES (new.type, new.amount, 1)
+            ON CONFLICT(type) DO UPDATE SET total = total + excluded.total, count = count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_summary_delete AFTER DELETE ON transactions BEGIN
+            UPDATE ledger_summary SET total = total - old.amount, count = count - 1 WHERE type = old.type;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_summary_update AFTER UPDATE OF type, amount ON transactions BEGIN
+            UPDATE ledger_summary SET total = total - old.amount, count = count - 1 WHERE type = old.type;
+            INSERT INTO ledger_summary(type, total, count) VALUES (new.type, new.amount, 1)
+            ON CONFLICT(type) DO UPDATE SET total = total + excluded.total, count = count + 1;
+        END
+        """,
+        """
+        INSERT OR IGNORE INTO ledger_summary(type, total, count)
+        SELECT type, SUM(amount), COUNT(*) FROM transactions GROUP BY type
+        """,
+    ]),
+    # 3: (month, type, category) rollup for the reports page
+    (3, [
+        """
+        CREATE TABLE IF NOT EXISTS monthly_rollup (
+            month TEXT NOT NULL,
+            type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, type, category)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO monthly_rollup(month, type, category, total, count)
+            VALUES (substr(new.date, 1, 7), new.type, COALESCE(new.category, ''), new.amount, 1)
+            ON CONFLICT(month, type, category) DO UPDATE SET total = total + excluded.total, count = count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_delete AFTER DELETE ON transactions BEGIN
+            UPDATE monthly_rollup SET total = total - old.amount, count = count - 1
+            WHERE month = substr(old.date, 1, 7) AND type = old.type AND category = COALESCE(old.category, '');
+            DELETE FROM monthly_rollup
+            WHERE month = substr(old.date, 1, 7) AND type = old.type AND category = COALESCE(old.category, '') AND count <= 0;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_update AFTER UPDATE OF type, amount, category, date ON transactions BEGIN
+            UPDATE monthly_rollup SET total = total - old.amount, count = count - 1
+            WHERE month = substr(old.date, 1, 7) AND type = old.type AND category = COALESCE(old.category, '');
+            DELETE FROM monthly_rollup
+            WHERE month = substr(old.date, 1, 7) AND type = old.type AND category = COALESCE(old.category, '') AND count <= 0;
+            INSERT INTO monthly_rollup(month, type, category, total, count)
+            VALUES (substr(new.date, 1, 7), new.type, COALESCE(new.category, ''), new.amount, 1)
+            ON CONFLICT(month, type, category) DO UPDATE SET total = total + excluded.total, count = count + 1;
+        END
+        """,
+        """
+        INSERT OR IGNORE INTO monthly_rollup(month, type, category, total, count)
+        SELECT substr(date, 1, 7), type, COALESCE(category, ''), SUM(amount), COUNT(*)
+        FROM transactions GROUP BY 1, 2, 3
+        """,
+    ]),
+    # 4: full-text search over description and category. Writers store the
+    # folded words (build_search_text) in search_text, so "san bong" finds
+    # "Sân bóng", and the index is an external-content table over that
+    # column. The triggers only copy search_text, so the sqlite3 CLI and
+    # other scripts can write to the table; rows written without it are
+    # stored but not searchable until rebuild_search_index() runs.
+    (4, [
+        "ALTER TABLE transactions ADD COLUMN search_text TEXT",
+        # Migrations run on app connections, which register fold_text
+        """
+        UPDATE transactions SET search_text = trim(
+            COALESCE(fold_text(description), '') || ' ' || COALESCE(fold_text(category), '')
+        )
+        """,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+            search_text, content='transactions', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        "INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_fts_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO transactions_fts(rowid, search_text) VALUES (new.rowid, new.search_text);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_fts_delete AFTER DELETE ON transactions BEGIN
+            INSERT INTO transactions_fts(transactions_fts, rowid, search_text) VALUES ('delete', old.rowid, old.search_text);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_fts_update AFTER UPDATE OF search_text ON transactions BEGIN
+            INSERT INTO transactions_fts(transactions_fts, rowid, search_text) VALUES ('delete', old.rowid, old.search_text);
+            INSERT INTO transactions_fts(rowid, search_text) VALUES (new.rowid, new.search_text);
+        END
+        """,
+    ]),
+    # 5: change log for incremental mirrors (see sheets_sync.py); each target
+    # keeps its high-water mark in sync_state. Nothing is logged until a
+    # target registers, so databases without a mirror don't grow a log.
+    # Updates that only touch search_text (rebuild_search_index) are not
+    # changes to the transaction and are not logged.
+    (5, [
+        """
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            op TEXT NOT NULL CHECK (op IN ('upsert', 'delete')),
+            transaction_id TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS sync_state (
+            target TEXT PRIMARY KEY,
+            last_seq INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_changes_insert AFTER INSERT ON transactions
+        WHEN EXISTS (SELECT 1 FROM sync_state) BEGIN
+            INSERT INTO change_log(op, transaction_id) VALUES ('upsert', new.id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_changes_delete AFTER DELETE ON transactions
+        WHEN EXISTS (SELECT 1 FROM sync_state) BEGIN
+            INSERT INTO change_log(op, transaction_id) VALUES ('delete', old.id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_changes_update
+        AFTER UPDATE OF id, type, amount, description, category, date, image_url ON transactions
+        WHEN EXISTS (SELECT 1 FROM sync_state) BEGIN
+            INSERT INTO change_log(op, transaction_id) SELECT 'delete', old.id WHERE old.id IS NOT new.id;
+            INSERT INTO change_log(op, transaction_id) VALUES ('upsert', new.id);
+        END
+        """,
+    ]),
+    # 6: compact typed storage (see "Storage encoding"). The table is rebuilt
+    # with integer amounts, day numbers and lookup codes. Rowids are copied
+    # into an explicit INTEGER PRIMARY KEY (seq), which the full-text index
+    # is keyed by, so VACUUM can no longer renumber them. Categories outside
+    # CATEGORY_CODES get codes from 1000 up. Types and categories are matched
+    # after trimming (types also case-folded, so 'Income ' maps to income).
+    # Rows that still cannot be stored (missing id or one already used by an
+    # earlier row, unknown type, missing or unparseable date, non-numeric
+    # amount) are moved to transactions_quarantine with the reason, never
+    # dropped, and migrate_database names them in the log.
+    # Dropping the old table drops its triggers, and the summary and rollup
+    # tables are rebuilt with codes, so every trigger is recreated here. This
+    # migration is not idempotent; like every migration it runs once, in one
+    # transaction.
+    (6, [
+        """
+        CREATE TABLE IF NOT EXISTS transaction_types (
+            code INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS categories (
+            code INTEGER PRIMARY KEY,
+            type_code INTEGER NOT NULL REFERENCES transaction_types(code),
+            name TEXT NOT NULL,
+            UNIQUE (type_code, name)
+        )
+        """,
+        *LOOKUP_SEED_STATEMENTS,
+        """
+        CREATE TABLE transactions_quarantine (
+            id TEXT,
+            type TEXT,
+            amount,
+            description TEXT,
+            category TEXT,
+            date TEXT,
+            image_url TEXT,
+            reason TEXT NOT NULL
+        )
+        """,
+        """
+        INSERT INTO transactions_quarantine(id, type, amount, description, category, date, image_url, reason)
+        SELECT t.id, t.type, t.amount, t.description, t.category, t.date, t.image_url,
+               CASE
+                   WHEN t.id IS NULL THEN 'id'
+                   WHEN EXISTS (SELECT 1 FROM transactions d WHERE d.id = t.id AND d.rowid < t.rowid) THEN 'duplicate id'
+                   WHEN ty.code IS NULL THEN 'type'
+                   WHEN julianday(trim(t.date)) IS NULL THEN 'date'
+                   ELSE 'amount'
+               END
+        FROM transactions t
+        LEFT JOIN transaction_types ty ON ty.name = lower(trim(t.type))
+        WHERE t.id IS NULL
+           OR EXISTS (SELECT 1 FROM transactions d WHERE d.id = t.id AND d.rowid < t.rowid)
+           OR ty.code IS NULL OR julianday(trim(t.date)) IS NULL OR typeof(t.amount) NOT IN ('integer', 'real')
+        """,
+        """
+        INSERT INTO categories(code, type_code, name)
+        SELECT 999 + ROW_NUMBER() OVER (ORDER BY ty.code, legacy.category), ty.code, legacy.category
+        FROM (
+            SELECT DISTINCT lower(trim(type)) AS type, trim(category) AS category
+            FROM transactions WHERE trim(category) != ''
+        ) AS legacy
+        JOIN transaction_types ty ON ty.name = legacy.type
+        WHERE NOT EXISTS (SELECT 1 FROM categories c WHERE c.type_code = ty.code AND c.name = legacy.category)
+        """,
+        """
+        CREATE TABLE transactions_v2 (
+            seq INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            type_code INTEGER NOT NULL REFERENCES transaction_types(code),
+            amount INTEGER NOT NULL,
+            description TEXT,
+            category_code INTEGER REFERENCES categories(code),
+            day INTEGER NOT NULL,
+            month INTEGER GENERATED ALWAYS AS (CAST(strftime('%Y%m', day * 86400, 'unixepoch') AS INTEGER)) VIRTUAL,
+            image_url TEXT,
+            search_text TEXT
+        )
+        """,
+        """
+        INSERT INTO transactions_v2(seq, id, type_code, amount, description, category_code, day, image_url, search_text)
+        SELECT t.rowid, t.id, ty.code, CAST(ROUND(t.amount) AS INTEGER), t.description, c.code,
+               CAST(julianday(trim(t.date)) - 2440587.5 AS INTEGER), t.image_url, t.search_text
+        FROM transactions t
+        JOIN transaction_types ty ON ty.name = lower(trim(t.type))
+        LEFT JOIN categories c ON c.type_code = ty.code AND c.name = trim(t.category)
+        WHERE t.id IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM transactions d WHERE d.id = t.id AND d.rowid < t.rowid)
+          AND julianday(trim(t.date)) IS NOT NULL AND typeof(t.amount) IN ('integer', 'real')
+        """,
+        "DROP TABLE transactions",
+        "ALTER TABLE transactions_v2 RENAME TO transactions",
+        # The only indexes on the table, one per list-view order: date or
+        # amount with id as tie-breaker (the keyset cursor), optionally
+        # behind a type filter. Totals come from the summary and rollup.
+        "CREATE INDEX idx_transactions_day_id ON transactions(day, id)",
+        "CREATE INDEX idx_transactions_type_day_id ON transactions(type_code, day, id)",
+        "CREATE INDEX idx_transactions_amount_id ON transactions(amount, id)",
+        "CREATE INDEX idx_transactions_type_amount_id ON transactions(type_code, amount, id)",
+        # Summary and rollup, keyed by codes and holding integer totals
+        "DROP TABLE ledger_summary",
+        """
+        CREATE TABLE ledger_summary (
+            type_code INTEGER PRIMARY KEY,
+            total INTEGER NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TRIGGER trg_summary_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO ledger_summary(type_code, total, count) VALUES (new.type_code, new.amount, 1)
+            ON CONFLICT(type_code) DO UPDATE SET total = total + excluded.total, count = count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER trg_summary_delete AFTER DELETE ON transactions BEGIN
+            UPDATE ledger_summary SET total = total - old.amount, count = count - 1 WHERE type_code = old.type_code;
+        END
+        """,
+        """
+        CREATE TRIGGER trg_summary_update AFTER UPDATE OF type_code, amount ON transactions BEGIN
+            UPDATE ledger_summary SET total = total - old.amount, count = count - 1 WHERE type_code = old.type_code;
+            INSERT INTO ledger_summary(type_code, total, count) VALUES (new.type_code, new.amount, 1)
+            ON CONFLICT(type_code) DO UPDATE SET total = total + excluded.total, count = count + 1;
+        END
+        """,
+        """
+        INSERT INTO ledger_summary(type_code, total, count)
+        SELECT type_code, SUM(amount), COUNT(*) FROM transactions GROUP BY type_code
+        """,
+        "DROP TABLE monthly_rollup",
+        """
+        CREATE TABLE monthly_rollup (
+            month INTEGER NOT NULL,
+            type_code INTEGER NOT NULL,
+            category_code INTEGER NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, type_code, category_code)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TRIGGER trg_rollup_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO monthly_rollup(month, type_code, category_code, total, count)
+            VALUES (new.month, new.type_code, COALESCE(new.category_code, 0), new.amount, 1)
+            ON CONFLICT(month, type_code, category_code) DO UPDATE SET total = total + excluded.total, count = count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER trg_rollup_delete AFTER DELETE ON transactions BEGIN
+            UPDATE monthly_rollup SET total = total - old.amount, count = count - 1
+            WHERE month = old.month AND type_code = old.type_code AND category_code = COALESCE(old.category_code, 0);
+            DELETE FROM monthly_rollup
+            WHERE month = old.month AND type_code = old.type_code AND category_code = COALESCE(old.category_code, 0) AND count <= 0;
+        END
+        """,
+        """
+        CREATE TRIGGER trg_rollup_update AFTER UPDATE OF type_code, amount, category_code, day ON transactions BEGIN
+            UPDATE monthly_rollup SET total = total - old.amount, count = count - 1
+            WHERE month = old.month AND type_code = old.type_code AND category_code = COALESCE(old.category_code, 0);
+            DELETE FROM monthly_rollup
+            WHERE month = old.month AND type_code = old.type_code AND category_code = COALESCE(old.category_code, 0) AND count <= 0;
+            INSERT INTO monthly_rollup(month, type_code, category_code, total, count)
+            VALUES (new.month, new.type_code, COALESCE(new.category_code, 0), new.amount, 1)
+            ON CONFLICT(month, type_code, category_code) DO UPDATE SET total = total + excluded.total, count = count + 1;
+        END
+        """,
+        """
+        INSERT INTO monthly_rollup(month, type_code, category_code, total, count)
+        SELECT month, type_code, COALESCE(category_code, 0), SUM(amount), COUNT(*)
+        FROM transactions GROUP BY 1, 2, 3
+        """,
+        # Full-text index, now keyed by seq; the rebuild drops quarantined rows
+        "INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')",
+        """
+        CREATE TRIGGER trg_fts_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO transactions_fts(rowid, search_text) VALUES (new.seq, new.search_text);
+        END
+        """,
+        """
+        CREATE TRIGGER trg_fts_delete AFTER DELETE ON transactions BEGIN
+            INSERT INTO transactions_fts(transactions_fts, rowid, search_text) VALUES ('delete', old.seq, old.search_text);
+        END
+        """,
+        """
+        CREATE TRIGGER trg_fts_update AFTER UPDATE OF seq, search_text ON transactions BEGIN
+            INSERT INTO transactions_fts(transactions_fts, rowid, search_text) VALUES ('delete', old.seq, old.search_text);
+            INSERT INTO transactions_fts(rowid, search_text) VALUES (new.seq, new.search_text);
+        END
+        """,
+        # Change log for mirrors, unchanged apart from the table it watches
+        """
+        CREATE TRIGGER trg_changes_insert AFTER INSERT ON transactions
+        WHEN EXISTS (SELECT 1 FROM sync_state) BEGIN
+            INSERT INTO change_log(op, transaction_id) VALUES ('upsert', new.id);
+        END
+        """,
+        """
+        CREATE TRIGGER trg_changes_delete AFTER DELETE ON transactions
+        WHEN EXISTS (SELECT 1 FROM sync_state) BEGIN
+            INSERT INTO change_log(op, transaction_id) VALUES ('delete', old.id);
+        END
+        """,
+        """
+        CREATE TRIGGER trg_changes_update
+        AFTER UPDATE OF id, type_code, amount, description, category_code, day, image_url ON transactions
+        WHEN EXISTS (SELECT 1 FROM sync_state) BEGIN
+            INSERT INTO change_log(op, transaction_id) SELECT 'delete', old.id WHERE old.id IS NOT new.id;
+            INSERT INTO change_log(op, transaction_id) VALUES ('upsert', new.id);
+        END
+        """,
+    ]),
+    # 7: journal of queued write-behind mutations (see write_behind.py). Each
+    # one is stored here before add/delete return and removed by the commit
+    # that applies it, so any left over were never applied.
+    (7, [
+        """
+        CREATE TABLE IF NOT EXISTS write_journal (
+            id INTEGER PRIMARY KEY,
+            operation TEXT NOT NULL CHECK (operation IN ('insert', 'delete')),
+            params TEXT NOT NULL
+        )
+        """,
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+MIN_SQLITE_VERSION = (3, 31, 0)
+
+class SchemaError(sqlite3.DatabaseError):
+    """A database is not at the schema version this code expects."""
+
+@timed()
+def migrate_database(db_file: Optional[str] = None) -> int:
+    """Apply pending migrations to a database file and return its schema version.
+
+    Each migration runs in its own BEGIN IMMEDIATE transaction and re-reads
+    user_version inside it, so concurrent processes never apply one twice.
+    Raises SchemaError if a migration fails or the file is newer than
+    SCHEMA_VERSION, so no query ever runs against an unexpected schema.
     """
+    db_file = db_file or active_db_file()
+    if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+        # Generated columns (the stored month) need 3.31
+        raise SchemaError(
+            f"SQLite {sqlite3.sqlite_version} is too old, {'.'.join(map(str, MIN_SQLITE_VERSION))}+ is required"
+        )
+    conn = create_connection(db_file)
+    if conn is None:
+        raise SchemaError(f"could not open {db_file}")
+    conn.isolation_level = None  # Manage transactions explicitly
+    version = 0
     try:
-        c = conn.cursor()
-        c.execute(sql_create_table)
+        # A current file (the common case, e.g. a fund re-opened after
+        # eviction) costs one read and no write transaction
+        version = start_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, statements in MIGRATIONS:
+            if version >= target:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version < target:
+                    for statement in statements:
+                        conn.execute(statement)
+                    conn.execute(f"PRAGMA user_version = {target}")
+                    version = target
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        if start_version < 6 <= version:
+            for row_id, reason in conn.execute("SELECT id, reason FROM transactions_quarantine"):
+                logger.warning("migrate_database: %s: transaction %r quarantined (bad %s)", db_file, row_id, reason)
     except sqlite3.Error as e:
-        print(e)
+        logger.exception("migrate_database: migration of %s failed at version %s", db_file, version)
+        raise SchemaError(f"migration of {db_file} failed at version {version}: {e}") from e
+    finally:
+        conn.close()
+    if version != SCHEMA_VERSION:
+        raise SchemaError(f"{db_file} is at schema version {version}, this code expects {SCHEMA_VERSION}")
+    return version
 
-def insert_transaction(conn, transaction):
-    sql = """
-    INSERT INTO transactions(id, type, amount, description, category, date, image_url)
-    VALUES(?,?,?,?,?,?,?)
+def get_quarantined_transactions(db_file: Optional[str] = None) -> List[Dict]:
+    """Legacy rows the v2 migration could not store, with the reason for each.
+
+    They are kept verbatim so they can be fixed by hand and re-entered.
     """
+    with get_connection(db_file) as conn:
+        if conn is None:
+            return []
+        cursor = conn.execute(
+            "SELECT id, type, amount, description, category, date, image_url, reason"
+            " FROM transactions_quarantine ORDER BY rowid"
+        )
+        columns = [d[0] for d in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def rebuild_search_index(db_file: Optional[str] = None) -> None:
+    """Recompute search_text for every transaction and rebuild the full-text index.
+
+    Needed after rows were written by something other than this module,
+    e.g. the sqlite3 CLI, which leaves search_text empty or stale.
+    """
+    with get_connection(db_file) as conn:
+        if conn is None:
+            return
+        with conn:
+            rows = conn.execute("SELECT t.seq, t.description, c.name FROM transactions t " + CATEGORY_JOIN_SQL).fetchall()
+            conn.executemany(
+                "UPDATE transactions SET search_text = ? WHERE seq = ? AND search_text IS NOT ?",
+                [(text, seq, text) for seq, text in ((seq, build_search_text(d, c)) for seq, d, c in rows)]
+            )
+            conn.execute("INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')")
+    get_ledger_cache(db_file).bump()
+
+@timed()
+def insert_transaction(conn, transaction, commit: bool = True):
+    """Insert an (id, type, amount, description, category, date, image_url) tuple."""
     cur = conn.cursor()
-    cur.execute(sql, transaction)
-    conn.commit()
+    cur.execute(INSERT_TRANSACTION_SQL, encode_transaction(transaction))
+    if commit:
+        conn.commit()
     return cur.lastrowid
 
+@timed()
 def select_all_transactions(conn):
     cur = conn.cursor()
-    cur.execute("SELECT * FROM transactions")
+    cur.execute(TRANSACTION_SELECT)
     rows = cur.fetchall()
     return rows
 
-def delete_transaction_from_db(conn, transaction_id):
-    sql = "DELETE FROM transactions WHERE id=?"
+@timed()
+def delete_transaction_from_db(conn, transaction_id, commit: bool = True):
+    """Delete a transaction and return its (type, amount), or None if it did not exist."""
     cur = conn.cursor()
-    cur.execute(sql, (transaction_id,))
-    conn.commit()
+    row = query_type_and_amount(conn, transaction_id)
+    cur.execute("DELETE FROM transactions WHERE id=?", (transaction_id,))
+    if commit:
+        conn.commit()
+    return row
+
+def query_type_and_amount(conn, transaction_id: str) -> Optional[Tuple[str, int]]:
+    return conn.execute(f"SELECT {TYPE_NAME_SQL}, t.amount FROM transactions t WHERE t.id=?", (transaction_id,)).fetchone()
 
+def _row_to_transaction(row) -> Transaction:
+    return {'id': row[0], 'type': row[1], 'amount': row[2], 'description': row[3], 'category': row[4], 'date': row[5], 'image_url': row[6]}
+
+@timed()
 def fetch_transactions_from_db():
-    conn = create_connection()
-    if conn is not None:
-        create_table(conn)
-        transactions = select_all_transactions(conn)
-        conn.close()
-        print(f"✅ fetch_transactions_from_db: Loaded {len(transactions)} transactions from the database")  # Debug
-        print(f"✅ fetch_transactions_from_db: Transactions data: {transactions}")  # Debug
-        return [
-            {'id': row[0], 'type': row[1], 'amount': row[2], 'description': row[3], 'category': row[4], 'date': row[5], 'image_url': row[6]}
-            for row in transactions
-        ]
+    with get_connection() as conn:
+        if conn is not None:
+            transactions = select_all_transactions(conn)
+        else:
+            transactions = None
+    if transactions is not None:
+        logger.debug("fetch_transactions_from_db: loaded %d transactions", len(transactions))
+        return [_row_to_transaction(row) for row in transactions]
     else:
-        print(f"❌ fetch_transactions_from_db: Could not load database {DB_FILE}")
+        logger.error("fetch_transactions_from_db: could not load database %s", active_db_file())
         return []
 
-def add_transaction(transaction_data: Dict, image_file=None) -> None:
-    """Add a new transaction to database and session state."""
+def _discard_unstored_receipt(future: Future, key: str) -> None:
+    if future.cancelled() or future.exception() is not None:
+        logger.info("add_transaction: removing receipt %s of a transaction that was not stored", key)
+        receipts.delete_receipt(key)
+
+def referenced_receipt_keys(db_files: Optional[List[str]] = None) -> Set[str]:
+    """Receipt keys used by any transaction in `db_files` (default: every fund).
+
+    Files are opened read-only and never migrated, so backup snapshots of
+    older schema versions can be passed too.
+    """
+    if db_files is None:
+        db_files = [fund_db_file(fund) for fund in list_funds()]
+    keys = set()
+    for db_file in db_files:
+        if not os.path.exists(db_file):
+            continue
+        conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+        try:
+            for table in ("transactions", "transactions_quarantine"):
+                try:
+                    keys.update(row[0] for row in conn.execute(f"SELECT DISTINCT image_url FROM {table} WHERE image_url IS NOT NULL"))
+                except sqlite3.OperationalError:  # No quarantine table before schema v6
+                    pass
+            try:
+                # Rows still waiting in the write-behind journal (image_url is the 7th field)
+                keys.update(row[0] for row in conn.execute(
+                    "SELECT json_extract(params, '$[6]') FROM write_journal"
+                    " WHERE operation = 'insert' AND json_extract(params, '$[6]') IS NOT NULL"
+                ))
+            except sqlite3.OperationalError:  # No journal before schema v7
+                pass
+        finally:
+            conn.close()
+    return keys
+
+@timed()
+def add_transaction(transaction_data: Dict, image_file=None) -> Future:
+    """Add a new transaction to the database.
+
+    The returned future resolves once the row is committed, immediately
+    unless write-behind mode is on. The commit goes through ledger_written,
+    so sync_summary picks up the new totals from ledger_summary. An
+    `image_file` is stored by `receipts.store_receipt` (ValueError if it is
+    not a usable image) and only its key is kept in `image_url`; a newly
+    stored image is deleted again if the insert fails.
+    """
 
     transaction_id = str(uuid.uuid4())
+    image_url, created_receipt = receipts.store_receipt(image_file) if image_file is not None else (None, False)
 
     # Create the transaction object
     transaction = {
         'id': transaction_id,
         'type': transaction_data['type'],
-        'amount': float(transaction_data['amount']),
+        'amount': int(round(transaction_data['amount'])),  # Whole đồng
         'description': transaction_data['description'],
         'category': transaction_data['category'],
         'date': transaction_data['date'],
-        'image_url': None
+        'image_url': image_url
     }
+    row = (transaction['id'], transaction['type'], transaction['amount'], transaction['description'], transaction['category'], transaction['date'], transaction['image_url'])
 
     # Add to SQLite database
-    conn = create_connection()
-    if conn is not None:
-        insert_transaction(conn, (transaction['id'], transaction['type'], transaction['amount'], transaction['description'], transaction['category'], transaction['date'], transaction['image_url']))
-        conn.close()
-    else:
-        st.error("Failed to connect to SQLite database.")
+    future = write_behind.get_write_queue().submit('insert', row) if write_behind.WRITE_BEHIND else Future()
+    if created_receipt:
+        # An image stored only for this row goes again if the row is not stored
+        future.add_done_callback(lambda done: _discard_unstored_receipt(done, image_url))
+    if not write_behind.WRITE_BEHIND:
+        try:
+            with get_connection() as conn:
+                if conn is not None:
+                    insert_transaction(conn, row)
+                    ledger_written()
+                    future.set_result(transaction_id)
+                else:
+                    st.error("Failed to connect to SQLite database.")
+                    future.set_exception(sqlite3.OperationalError(f"could not connect to {active_db_file()}"))
+        except Exception as e:
+            future.set_exception(e)
+            raise
+    return future
 
-    # Update session state (add to the beginning)
-    st.session_state.transactions.insert(0, transaction)
+@timed()
+def delete_transaction(transaction_id: str) -> Future:
+    """Delete a transaction from the database.
 
-    # Update summary
-    update_summary()
+    The returned future resolves to the deleted (type, amount), or None if
+    the row did not exist.
+    """
+    if write_behind.WRITE_BEHIND:
+        return write_behind.get_write_queue().submit('delete', transaction_id)
+    deleted = None
+    future = Future()
+    with get_connection() as conn:
+        if conn is not None:
+            deleted = delete_transaction_from_db(conn, transaction_id)
+            ledger_written()
+    future.set_result(deleted)
+    return future
 
-def delete_transaction(transaction_id: str) -> None:
-    """Delete a transaction from database and session state."""
-    conn = create_connection()
-    if conn is not None:
-        delete_transaction_from_db(conn, transaction_id)
-        conn.close()
+def _month_range(month: str) -> Tuple[str, str]:
+    """Return the [start, end) date bounds of a YYYY-MM month for index range scans."""
+    year, mon = int(month[:4]), int(month[5:7])
+    next_year, next_mon = (year + 1, 1) if mon == 12 else (year, mon + 1)
+    return f"{year:04d}-{mon:02d}-01", f"{next_year:04d}-{next_mon:02d}-01"
 
-    st.session_state.transactions = [t for t in st.session_state.transactions if t['id'] != transaction_id]
+def query_monthly_totals(conn, month: str) -> Dict[str, int]:
+    """Read one month's totals per type from the rollup table."""
+    totals = {'income': 0, 'expense': 0}
+    for type_code, total in conn.execute(
+        "SELECT type_code, SUM(total) FROM monthly_rollup WHERE month = ? GROUP BY type_code", (month_key(month),)
+    ):
+        totals[TYPE_NAMES[type_code]] = total
+    return totals
 
-    # Update summary
-    update_summary()
+def query_ledger_totals(conn) -> Dict[str, int]:
+    """Read the all-time totals per type from the trigger-maintained summary table."""
+    totals = {'income': 0, 'expense': 0}
+    for type_code, total in conn.execute("SELECT type_code, total FROM ledger_summary"):
+        totals[TYPE_NAMES[type_code]] = total
+    return totals
 
+@timed()
+@ledger_cached
+def get_ledger_totals() -> Dict[str, int]:
+    """Get the all-time totals per type."""
+    with get_connection() as conn:
+        if conn is None:
+            return {'income': 0, 'expense': 0}
+        return query_ledger_totals(conn)
+
+@timed()
 def update_summary() -> None:
     """Update summary information."""
-    if 'summary' not in st.session_state:
-        st.session_state.summary = {
-            'current_balance': 0,
-            'total_income': 0,
-            'total_expense': 0
-        }
-
-    total_income = sum(t['amount'] for t in st.session_state.transactions if t['type'] == 'income')
-    total_expense = sum(t['amount'] for t in st.session_state.transactions if t['type'] == 'expense')
-    current_balance = total_income - total_expense
+    version = get_ledger_cache().version
+    totals = get_ledger_totals()
 
     st.session_state.summary = {
-        'current_balance': current_balance,
-        'total_income': total_income,
-        'total_expense': total_expense
+        'current_balance': totals['income'] - totals['expense'],
+        'total_income': totals['income'],
+        'total_expense': totals['expense']
     }
+    st.session_state.ledger_version = version
 
+def sync_summary() -> None:
+    """Refresh the session summary if any session has written since it was loaded."""
+    write_behind.check_pending_writes()
+    if 'summary' not in st.session_state or st.session_state.get('ledger_version') != get_ledger_cache().version:
+        update_summary()
+
+@timed()
+@ledger_cached
 def get_all_months() -> List[str]:
     """Get a list of all months in the data."""
-    months = set()
+    with get_connection() as conn:
+        if conn is None:
+            return []
+        rows = conn.execute(
+            "SELECT DISTINCT month FROM monthly_rollup ORDER BY month DESC"
+        ).fetchall()
+    return [month_label(row[0]) for row in rows]
+
+@timed()
+@ledger_cached
+def get_monthly_report(month: str) -> Dict:
+    """Get the totals for a specific month and its date range for listing transactions."""
+    start, end = _month_range(month)
+    totals = {'income': 0, 'expense': 0}
+    with get_connection() as conn:
+        if conn is not None:
+            totals = query_monthly_totals(conn, month)
 
-    for t in st.session_state.transactions:
-        month = t['date'][:7]  # YYYY-MM
-        months.add(month)
+    return {
+        'month': month,
+        'total_income': totals['income'],
+        'total_expense': totals['expense'],
+        'balance': totals['income'] - totals['expense'],
+        'start': start,
+        'end': end
+    }
 
-    return sorted(list(months), reverse=True)
+@timed()
+@ledger_cached
+def get_expense_by_category(month: Optional[str] = None) -> Dict[str, int]:
+    """Get expenses by category, for one YYYY-MM month or the whole ledger."""
+    sql = (
+        "SELECT COALESCE(c.name, ''), SUM(r.total) FROM monthly_rollup r"
+        " LEFT JOIN categories c ON c.code = r.category_code WHERE r.type_code = ?"
+    )
+    params = [TYPE_CODES['expense']]
+    if month is not None:
+        sql += " AND r.month = ?"
+        params.append(month_key(month))
+    sql += " GROUP BY r.category_code ORDER BY SUM(r.total) DESC"
+    with get_connection() as conn:
+        if conn is None:
+            return {}
+        return {category: total for category, total in conn.execute(sql, params)}
 
-def get_monthly_report(month: str) -> Dict:
-    """Get the report for a specific month."""
-    monthly_transactions = [t for t in st.session_state.transactions if t['date'].startswith(month)]
+# --- Period reports ---
+# Reports over any [start, end) date range. Whole months inside the range are
+# summed from monthly_rollup, and only the partial months at either end are
+# read from transactions with a range scan on the indexed `day` column, so a
+# yearly report costs about as much as a monthly one.
+SEASON_START_MONTH = 8  # A football season runs from August to July
+REPORT_PERIODS = {
+    'month': "Tháng",
+    'quarter': "Quý",
+    'season': "Mùa giải",
+    'year': "Năm",
+    'range': "Khoảng ngày"
+}
+
+def _add_months(day: date, months: int) -> date:
+    """First day of the month `months` months after the month of `day`."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
 
-    total_income = sum(t['amount'] for t in monthly_transactions if t['type'] == 'income')
-    total_expense = sum(t['amount'] for t in monthly_transactions if t['type'] == 'expense')
-    balance = total_income - total_expense
+def period_bounds(kind: str, value: str) -> Tuple[str, str]:
+    """[start, end) bounds of a period: "2025-06", "2025-Q2", season "2024" (2024/25) or year "2025"."""
+    if kind == 'month':
+        start, months = date(int(value[:4]), int(value[5:7]), 1), 1
+    elif kind == 'quarter':
+        start, months = date(int(value[:4]), (int(value[-1]) - 1) * 3 + 1, 1), 3
+    elif kind == 'season':
+        start, months = date(int(value), SEASON_START_MONTH, 1), 12
+    elif kind == 'year':
+        start, months = date(int(value), 1, 1), 12
+    else:
+        raise ValueError(f"Unknown report period: {kind}")
+    return start.isoformat(), _add_months(start, months).isoformat()
+
+def period_of(kind: str, month: str) -> str:
+    """The period of the given kind that contains a YYYY-MM month."""
+    year, mon = int(month[:4]), int(month[5:7])
+    if kind == 'month':
+        return month
+    if kind == 'quarter':
+        return f"{year}-Q{(mon - 1) // 3 + 1}"
+    if kind == 'season':
+        return str(year if mon >= SEASON_START_MONTH else year - 1)
+    return str(year)
+
+def previous_period(kind: str, value: str) -> str:
+    start = date.fromisoformat(period_bounds(kind, value)[0])
+    step = {'month': 1, 'quarter': 3}.get(kind, 12)
+    return period_of(kind, _add_months(start, -step).strftime("%Y-%m"))
+
+def period_label(kind: str, value) -> str:
+    if kind == 'month':
+        return f"{value[5:7]}/{value[:4]}"
+    if kind == 'quarter':
+        return f"Quý {value[-1]}/{value[:4]}"
+    if kind == 'season':
+        return f"Mùa {value}/{(int(value) + 1) % 100:02d}"
+    if kind == 'year':
+        return f"Năm {value}"
+    start, end = (date.fromisoformat(d) for d in value)
+    return f"{start:%d/%m/%Y} – {end - timedelta(days=1):%d/%m/%Y}"
+
+def list_periods(kind: str) -> List[str]:
+    """Periods of the given kind that have transactions, newest first."""
+    return list(dict.fromkeys(period_of(kind, month) for month in get_all_months()))
+
+def query_range_totals(conn, start: str, end: str) -> Dict[Tuple[int, int], int]:
+    """Totals per (type_code, category_code) for the dates in [start, end)."""
+    first, last = date.fromisoformat(start), date.fromisoformat(end)
+    whole_start = first if first.day == 1 else _add_months(first, 1)
+    whole_end = last.replace(day=1)
+    totals: Dict[Tuple[int, int], int] = {}
+
+    def add(rows):
+        for type_code, category_code, total in rows:
+            totals[(type_code, category_code)] = totals.get((type_code, category_code), 0) + total
 
+    if whole_start < whole_end:
+        last_month = _add_months(whole_end, -1)
+        add(conn.execute(
+            "SELECT type_code, category_code, SUM(total) FROM monthly_rollup WHERE month BETWEEN ? AND ? GROUP BY 1, 2",
+            (whole_start.year * 100 + whole_start.month, last_month.year * 100 + last_month.month)
+        ))
+        scans = [(first, whole_start), (whole_end, last)]
+    else:
+        scans = [(first, last)]
+    for scan_start, scan_end in scans:
+        if scan_start < scan_end:
+            add(conn.execute(
+                "SELECT type_code, COALESCE(category_code, 0), SUM(amount) FROM transactions"
+                " WHERE day >= ? AND day < ? GROUP BY 1, 2",
+                (day_number(scan_start.isoformat()), day_number(scan_end.isoformat()))
+            ))
+    return totals
+
+@timed()
+@ledger_cached
+def get_range_report(start: str, end: str) -> Dict:
+    """Totals and expenses by category for the dates in [start, end)."""
+    totals, names = {}, {}
+    with get_connection() as conn:
+        if conn is not None:
+            totals = query_range_totals(conn, start, end)
+            names = dict(conn.execute("SELECT code, name FROM categories"))
+
+    by_type = {'income': 0, 'expense': 0}
+    expense_by_category = {}
+    for (type_code, category_code), total in totals.items():
+        by_type[TYPE_NAMES[type_code]] += total
+        if type_code == TYPE_CODES['expense'] and total:
+            expense_by_category[names.get(category_code, '')] = total
     return {
-        'month': month,
-        'total_income': total_income,
-        'total_expense': total_expense,
-        'balance': balance,
-        'transactions': monthly_transactions
+        'start': start,
+        'end': end,
+        'total_income': by_type['income'],
+        'total_expense': by_type['expense'],
+        'balance': by_type['income'] - by_type['expense'],
+        'expense_by_category': dict(sorted(expense_by_category.items(), key=lambda item: item[1], reverse=True))
     }
 
-def get_expense_by_category(transactions: List[Transaction]) -> Dict[str, float]:
-    """Get expenses by category."""
-    expenses_by_category = {}
+def compare_reports(current: Dict, previous: Dict) -> Dict[str, Dict]:
+    """Change of each total since `previous`; `percent` is None when the previous total was 0."""
+    change = {}
+    for field in ('total_income', 'total_expense', 'balance'):
+        delta = current[field] - previous[field]
+        change[field] = {'delta': delta, 'percent': delta * 100 / abs(previous[field]) if previous[field] else None}
+    return change
+
+def get_period_report(kind: str, value) -> Dict:
+    """Report for a REPORT_PERIODS period, compared with the period before it.
+
+    `value` is a period as accepted by `period_bounds`, or for 'range' a
+    (start, end) pair of ISO dates with `end` exclusive. The previous period
+    of a range is the same number of days right before it.
+    """
+    if kind == 'range':
+        start, end = value
+        length = date.fromisoformat(end) - date.fromisoformat(start)
+        previous = ((date.fromisoformat(start) - length).isoformat(), start)
+    else:
+        start, end = period_bounds(kind, value)
+        previous = previous_period(kind, value)
+
+    report = dict(get_range_report(start, end))
+    report['kind'] = kind
+    report['label'] = period_label(kind, value)
+    previous_bounds = previous if kind == 'range' else period_bounds(kind, previous)
+    report['previous'] = dict(get_range_report(*previous_bounds), label=period_label(kind, previous))
+    report['change'] = compare_reports(report, report['previous'])
+    return report
+
+def show_report_period_picker(key: str) -> Optional[Tuple[str, object]]:
+    """Period kind and period selectors; returns (kind, value) for `get_period_report`, or None."""
+    kind = st.radio(
+        "Kiểu báo cáo",
+        options=list(REPORT_PERIODS),
+        format_func=REPORT_PERIODS.get,
+        horizontal=True,
+        key=f"{key}_period_kind"
+    )
+    if kind == 'range':
+        cols = st.columns(2)
+        start = cols[0].date_input("Từ ngày", value=date.today().replace(day=1), key=f"{key}_range_start")
+        end = cols[1].date_input("Đến ngày", value=date.today(), key=f"{key}_range_end")
+        if start > end:
+            st.error("Ngày bắt đầu phải trước ngày kết thúc")
+            return None
+        return kind, (start.isoformat(), (end + timedelta(days=1)).isoformat())
+
+    periods = list_periods(kind)
+    if not periods:
+        return None
+    value = st.selectbox(
+        f"Chọn {REPORT_PERIODS[kind].lower()}",
+        options=periods,
+        format_func=lambda v: period_label(kind, v),
+        key=f"{key}_period_{kind}"
+    )
+    return kind, value
+
+def show_period_comparison(report: Dict) -> None:
+    """The report's totals with their change since the previous period."""
+    st.caption(f"So với {report['previous']['label']}")
+    fields = [('total_income', "Tổng thu", "normal"), ('total_expense', "Tổng chi", "inverse"), ('balance', "Số dư", "normal")]
+    for col, (field, label, delta_color) in zip(st.columns(len(fields)), fields):
+        change = report['change'][field]
+        delta = f"{change['delta']:+,} VNĐ"
+        if change['percent'] is not None:
+            delta += f" ({change['percent']:+.1f}%)"
+        col.metric(label, format_currency(report[field]), delta=delta, delta_color=delta_color)
+
+# --- Paginated queries ---
+TRANSACTION_PAGE_SIZE = 50
+
+# Server-side sort orders for list views (labels, then SQL column and direction)
+SORT_OPTIONS = {
+    'date_desc': "Mới nhất",
+    'date_asc': "Cũ nhất",
+    'amount_desc': "Số tiền lớn nhất",
+    'amount_asc': "Số tiền nhỏ nhất"
+}
+SORT_COLUMNS = {
+    'date_desc': ('day', True),
+    'date_asc': ('day', False),
+    'amount_desc': ('amount', True),
+    'amount_asc': ('amount', False)
+}
+SEARCH_SELECT = (
+    f"SELECT {TRANSACTION_COLUMNS_SQL}"
+    f" FROM transactions_fts JOIN transactions t ON t.seq = transactions_fts.rowid {CATEGORY_JOIN_SQL}"
+)
+
+def build_search_query(search: str) -> Optional[str]:
+    """Turn free text into an FTS5 MATCH expression: every folded word as a prefix, all required."""
+    tokens = re.findall(r"\w+", fold_text(search))
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+@timed()
+@ledger_cached
+def query_transactions(
+    transaction_type: Optional[str] = None,
+    search: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    sort: str = 'date_desc',
+    after: Optional[Union[Tuple, int]] = None,
+    limit: int = TRANSACTION_PAGE_SIZE
+) -> Dict:
+    """Return one page of transactions with all filters applied in SQL.
+
+    Without a search, rows are ordered by `sort` (a SORT_OPTIONS key) with
+    id as tie-breaker, and `after` is the keyset cursor returned as
+    `next_cursor` by the previous page, so fetching page N costs the same
+    as fetching page 1. With a search, rows come from the full-text index
+    ranked by relevance and the cursor is the offset of the next page.
+    """
+    sort_column, descending = SORT_COLUMNS[sort]
+    match = build_search_query(search) if search else None
+
+    clauses = []
+    params: List = []
+    if match is not None:
+        clauses.append("transactions_fts MATCH ?")
+        params.append(match)
+    if transaction_type:
+        clauses.append("t.type_code = ?")
+        params.append(TYPE_CODES[transaction_type])
+    if start is not None:
+        clauses.append("t.day >= ?")
+        params.append(day_number(start))
+    if end is not None:
+        clauses.append("t.day < ?")
+        params.append(day_number(end))
+    if match is None and after is not None:
+        clauses.append(f"(t.{sort_column}, t.id) {'<' if descending else '>'} (?, ?)")
+        params.extend(after)
+
+    if match is not None:
+        sql = SEARCH_SELECT
+    else:
+        # The stored sort key rides along as an eighth column for the cursor
+        sql = f"SELECT {TRANSACTION_COLUMNS_SQL}, t.{sort_column} FROM transactions t {CATEGORY_JOIN_SQL}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    if match is not None:
+        offset = after or 0
+        sql += " ORDER BY transactions_fts.rank LIMIT ? OFFSET ?"
+        params.extend([limit + 1, offset])  # One extra row tells us whether there is a next page
+    else:
+        direction = "DESC" if descending else "ASC"
+        sql += f" ORDER BY t.{sort_column} {direction}, t.id {direction} LIMIT ?"
+        params.append(limit + 1)
+
+    with get_connection() as conn:
+        rows = conn.execute(sql, params).fetchall() if conn is not None else []
+
+    transactions = [_row_to_transaction(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        if match is not None:
+            next_cursor = offset + limit
+        else:
+            last = rows[limit - 1]
+            next_cursor = (last[7], last[0])
+    return {'transactions': transactions, 'next_cursor': next_cursor}
+
+def get_transaction_page(key: str, **filters) -> Dict:
+    """Return the page currently shown by the paginated list `key`.
+
+    The list's cursor stack lives in session state and is reset whenever
+    the filters or the active fund change. Use `show_pagination_controls`
+    to move between pages.
+    """
+    state_key = f"pagination_{key}"
+    fund = get_active_fund()
+    state = st.session_state.get(state_key)
+    if state is None or state['filters'] != filters or state.get('fund') != fund:
+        state = {'filters': filters, 'fund': fund, 'cursors': [None]}
+        st.session_state[state_key] = state
+
+    cursor = state['cursors'][-1]
+    page = dict(query_transactions(after=cursor, **filters))
+    page['page_number'] = len(state['cursors'])
+    page['cache_key'] = (fund, tuple(sorted(filters.items())), cursor)
+    return page
+
+def _go_to_next_page(key: str, cursor: Tuple[int, str]) -> None:
+    st.session_state[f"pagination_{key}"]['cursors'].append(cursor)
 
-    for t in transactions:
-        if t['type'] == 'expense':
-            category = t['category']
-            if category in expenses_by_category:
-                expenses_by_category[category] += t['amount']
-            else:
-                expenses_by_category[category] = t['amount']
+def _go_to_previous_page(key: str) -> None:
+    st.session_state[f"pagination_{key}"]['cursors'].pop()
 
-    return expenses_by_category
+def show_pagination_controls(key: str, page: Dict) -> None:
+    """Render previous/next buttons for a page returned by `get_transaction_page`."""
+    if page['page_number'] == 1 and page['next_cursor'] is None:
+        return
 
+    cols = st.columns([1, 2, 1])
+    cols[0].button(
+        "← Trước",
+        key=f"{key}_previous",
+        disabled=page['page_number'] == 1,
+        on_click=_go_to_previous_page,
+        args=(key,)
+    )
+    cols[1].markdown(f"<div style='text-align: center;'>Trang {page['page_number']}</div>", unsafe_allow_html=True)
+    cols[2].button(
+        "Sau →",
+        key=f"{key}_next",
+        disabled=page['next_cursor'] is None,
+        on_click=_go_to_next_page,
+        args=(key, page['next_cursor'])
+    )
+
+def transaction_table_html(transactions: List[Transaction]) -> str:
+    """Render transactions as a single HTML table.
+
+    One markdown element per list keeps the page payload constant, instead
+    of a set of columns, markdowns and a button for every row. Works on the
+    plain row dicts, so listing a page does not need pandas.
+    """
+    rows = [
+        "<tr style='border-bottom: 1px solid rgba(0,0,0,0.1);'>"
+        f"<td style='padding: 6px 4px;'>{'⬇️' if t['type'] == 'income' else '⬆️'}<span style='margin-left: 5px;'>{html.escape(str(t['description']))}{' 📎' if t['image_url'] else ''}</span></td>"
+        f"<td style='padding: 6px 4px;'>{html.escape(str(t['category']))}</td>"
+        f"<td style='padding: 6px 4px;'>{t['date']}</td>"
+        f"<td style='padding: 6px 4px; text-align: right; color: {'green' if t['type'] == 'income' else 'red'};'>{format_amount(t)}</td>"
+        "</tr>"
+        for t in transactions
+    ]
+    return "<table style='width: 100%; border-collapse: collapse; border: none;'>" + "".join(rows) + "</table>"
+
+def _delete_from_list(key: str, transaction_id: str) -> None:
+    write_behind.track_write(delete_transaction(transaction_id), "xóa giao dịch")
+    st.session_state.pop(f"{key}_pending_delete", None)
+    st.toast("Đã xóa giao dịch!")
+
+def _request_delete(key: str) -> None:
+    st.session_state[f"{key}_pending_delete"] = st.session_state[f"{key}_delete_choice"]
+
+def _cancel_delete(key: str) -> None:
+    st.session_state.pop(f"{key}_pending_delete", None)
+
+def show_transaction_list(key: str, page: Dict, deletable: bool = True, confirm_delete: bool = False, height: int = 400) -> None:
+    """Render one page of a paginated transaction list with delete and page controls.
+
+    Only the rows of the current page are sent to the browser, as one
+    scrollable table, so render time does not grow with the ledger.
+    """
+    write_behind.check_pending_writes()
+    transactions = page['transactions']
+    if not transactions:
+        return
+
+    table = get_ledger_cache().get_or_load(
+        ('transaction_table_html', page.get('cache_key')), lambda: transaction_table_html(transactions)
+    ) if page.get('cache_key') is not None else transaction_table_html(transactions)
+    st.markdown(
+        f"<div style='max-height: {height}px; overflow-y: auto;'>{table}</div>",
+        unsafe_allow_html=True
+    )
+
+    # Receipts: thumbnails of this page only, and only once switched on
+    if any(t['image_url'] for t in transactions) and st.toggle("🧾 Xem hóa đơn", key=f"{key}_show_receipts"):
+        receipts.show_receipt_gallery(key, transactions)
+
+    if deletable:
+        labels = {t['id']: f"{t['date']} · {t['description']} · {format_amount(t)}" for t in transactions}
+        cols = st.columns([4, 1])
+        transaction_id = cols[0].selectbox(
+            "Chọn giao dịch",
+            options=list(labels),
+            format_func=labels.get,
+            key=f"{key}_delete_choice",
+            label_visibility="collapsed"
+        )
+        if confirm_delete:
+            cols[1].button("🗑️ Xóa", key=f"{key}_delete", on_click=_request_delete, args=(key,), use_container_width=True)
+        else:
+            cols[1].button("🗑️ Xóa", key=f"{key}_delete", on_click=_delete_from_list, args=(key, transaction_id), use_container_width=True)
+
+        pending = st.session_state.get(f"{key}_pending_delete")
+        if pending in labels:
+            st.warning(f"Bạn có chắc chắn muốn xóa giao dịch '{labels[pending]}'?")
+            confirm_cols = st.columns(2)
+            confirm_cols[0].button("Xác nhận", key=f"{key}_confirm", on_click=_delete_from_list, args=(key, pending))
+            confirm_cols[1].button("Hủy", key=f"{key}_cancel", on_click=_cancel_delete, args=(key,))
+
+    show_pagination_controls(key, page)
+
+TRANSACTION_FIELDS = ['id', 'type', 'amount', 'description', 'category', 'date', 'image_url']
+
+@timed()
 def get_transaction_df(transactions: List[Transaction]) -> pd.DataFrame:
     """Convert transaction list to DataFrame."""
     if not transactions:
         return pd.DataFrame()
 
-    df = pd.DataFrame(transactions)
+    df = pd.DataFrame.from_records(transactions, columns=TRANSACTION_FIELDS)
+    is_income = (df['type'] == 'income').to_numpy()
+    df['type'] = df['type'].astype(pd.CategoricalDtype(['income', 'expense']))
+    df['category'] = df['category'].astype('category')
 
-    # Add display columns
-    df['amount_display'] = df.apply(
-        lambda row: (f"+ {format_currency(row['amount'])}" if row['type'] == 'income'
-                    else f"- {format_currency(row['amount'])}"),
-        axis=1
-    )
+    # Format each distinct amount once; ledgers repeat the same fees a lot
+    unique_amounts, inverse = np.unique(df['amount'].to_numpy(), return_inverse=True)
+    formatted = np.array([format_currency(amount) for amount in unique_amounts], dtype=object)[inverse]
 
-    df['color'] = df['type'].apply(lambda x: 'green' if x == 'income' else 'red')
+    # Add display columns
+    df['amount_display'] = np.where(is_income, '+ ', '- ').astype(object) + formatted
+    df['color'] = pd.Categorical.from_codes(np.where(is_income, 0, 1), categories=['green', 'red'])
 
     return df
 
+# --- Charts ---
+FIGURE_CACHE_SIZE = 64
+
+class FigureCache:
+    """Bounded LRU cache of Plotly figures keyed by the aggregated values they plot.
+
+    Building a figure (especially px.pie with its template resolution) costs
+    far more than rendering a cached one, and report charts rarely change
+    between reruns. Cached figures are shared and must not be modified.
+    """
+
+    def __init__(self, max_entries: int = FIGURE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, builder: Callable) -> go.Figure:
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+        fig = builder()
+        with self._lock:
+            self._entries[key] = fig
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fig
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'max_entries': self.max_entries}
+
+_figure_cache = FigureCache()
+
+def get_figure_cache_stats() -> Dict[str, int]:
+    """Get hit/miss counters and size of the shared figure cache."""
+    return _figure_cache.stats()
+
+@timed()
 def plot_income_expense_bar(income: float, expense: float) -> go.Figure:
-    """Create income/expense bar chart."""
+    """Create income/expense bar chart (served from the figure cache when unchanged)."""
+    return _figure_cache.get_or_build(('bar', income, expense), lambda: _build_income_expense_bar(income, expense))
+
+def _build_income_expense_bar(income: float, expense: float) -> go.Figure:
     fig = go.Figure(data=[
         go.Bar(
             x=['Thu', 'Chi'],
@@ -240,11 +1697,16 @@ def plot_income_expense_bar(income: float, expense: float) -> go.Figure:
 
     return fig
 
+@timed()
 def plot_category_pie(expense_by_category: Dict[str, float]) -> Optional[go.Figure]:
-    """Create category pie chart."""
+    """Create category pie chart (served from the figure cache when unchanged)."""
     if not expense_by_category:
         return None
 
+    key = ('pie', tuple(expense_by_category.items()))
+    return _figure_cache.get_or_build(key, lambda: _build_category_pie(expense_by_category))
+
+def _build_category_pie(expense_by_category: Dict[str, float]) -> go.Figure:
     labels = list(expense_by_category.keys())
     values = list(expense_by_category.values())
 
@@ -269,6 +1731,57 @@ def plot_category_pie(expense_by_category: Dict[str, float]) -> Optional[go.Figu
 
     return fig
 
+# --- Partial reruns ---
+# Widgets inside a fragment rerun only that fragment instead of the whole
+# app. Named st.experimental_fragment before Streamlit 1.37.
+fragment = getattr(st, 'fragment', None) or st.experimental_fragment
+
+def submit_transaction_form(form_key: str) -> None:
+    """on_click callback of the add-transaction forms.
+
+    Runs before the (fragment) rerun that the submit triggers, so the lists
+    and summary rendered in that rerun already include the new row and no
+    extra st.rerun() is needed. Widgets are read from keys `<form_key>_*`.
+    """
+    state = st.session_state
+    description = state[f"{form_key}_description"]
+    amount = state[f"{form_key}_amount"]
+
+    # Validate
+    if not description or amount <= 0:
+        state[f"{form_key}_feedback"] = ('error', "Vui lòng điền đầy đủ thông tin và số tiền hợp lệ")
+        return
+
+    try:
+        future = add_transaction({
+            'type': state[f"{form_key}_type"],
+            'amount': amount,
+            'description': description,
+            'category': state[f"{form_key}_category"],
+            'date': state[f"{form_key}_date"].strftime("%Y-%m-%d")
+        }, image_file=state.get(f"{form_key}_receipt"))
+    except ValueError as e:  # Unusable receipt image
+        state[f"{form_key}_feedback"] = ('error', str(e))
+        return
+    write_behind.track_write(future, f"thêm '{description}'")
+    if future.done():
+        if future.exception() is None:
+            state[f"{form_key}_feedback"] = ('success', "Đã thêm giao dịch thành công!")
+    else:
+        # Write-behind: the row is committed shortly by the writer thread
+        state[f"{form_key}_feedback"] = ('success', "Đã ghi nhận giao dịch thành công, đang lưu...")
+
+def show_form_feedback(form_key: str) -> None:
+    """Show the result of the last `submit_transaction_form` call for this form."""
+    feedback = st.session_state.pop(f"{form_key}_feedback", None)
+    if feedback is None:
+        return
+    kind, message = feedback
+    if kind == 'success':
+        st.success(message)
+    else:
+        st.error(message)
+
 def display_account_information(account_number, account_name, bank_name):
     st.write(f"""
         <div style="padding: 10px; border: 1px solid #ccc; border-radius: 5px;">
@@ -286,23 +1799,36 @@ def display_account_information(account_number, account_name, bank_name):
 
 # --- Initialization ---
 def initialize_data():
-    """Initializes session state and database."""
-    conn = create_connection()
-    if conn is not None:
-        create_table(conn)
-        conn.close()
+    """Initializes session state and database.
+
+    Transactions are no longer copied into session state; list views load
+    one page at a time with `query_transactions`.
+    """
+    # Update summary
+    update_summary()
 
-    if 'transactions' not in st.session_state:
-        transactions_from_db = fetch_transactions_from_db() # Check for value
+# --- Cold start ---
+# Time budget for the first render of a session, from the start of app.py to
+# the end of main(). Overruns are logged together with the deferred import
+# timings so the slow dependency is easy to spot.
+STARTUP_BUDGET_MS = 1000
 
-        st.session_state.transactions = transactions_from_db # Run okay for now
+def get_import_report() -> Dict[str, float]:
+    """Milliseconds spent importing utils itself and each deferred module."""
+    return {'utils': UTILS_IMPORT_MS, **IMPORT_TIMES}
 
-        print (f"✅ Init with value: {transactions_from_db}")
-    else:
-        print(f"✅ Already Inited: {st.session_state.transactions}")
+def record_render_time(started: float) -> float:
+    """Records how long this rerun took; checks the first one against the budget.
 
-    # Update summary
-    update_summary()
+    `started` is a `time.perf_counter()` value taken at the top of the script.
+    """
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    perf_stats.record('rerun', elapsed_ms)
+    if 'first_render_ms' not in st.session_state:
+        st.session_state.first_render_ms = elapsed_ms
+        if elapsed_ms > STARTUP_BUDGET_MS:
+            imports = ", ".join(f"{name}: {ms:.0f} ms" for name, ms in get_import_report().items())
+            logger.warning("First render took %.0f ms (budget %d ms). Imports: %s", elapsed_ms, STARTUP_BUDGET_MS, imports)
+    return elapsed_ms
 
-    # Update summary
-    update_summary()
+UTILS_IMPORT_MS = (time.perf_counter() - _module_started) * 1000
@@ -0,0 +1,234 @@
+"""Write-behind queue for transaction inserts and deletes.
+
+With QUYDOIBONG_WRITE_BEHIND=1, adds and deletes return as soon as they are
+queued. A writer thread per database drains the queue and commits whatever
+has accumulated as one transaction, so a burst of submissions costs a few
+large commits instead of one per row. Each mutation is first written to the
+`write_journal` table in the same file (a small insert), and the batch that
+applies it also removes it from the journal. If the process is killed
+before the batch commits, the next process to open the file replays what
+is left (replay_journal, called by utils.get_pool). That assumes one app
+process per database file, as the ledger cache already does.
+"""
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional, Tuple
+
+import streamlit as st
+
+import utils
+from perf import logger, span
+
+WRITE_BEHIND = os.environ.get("QUYDOIBONG_WRITE_BEHIND") == "1"
+WRITE_BATCH_MAX_SIZE = 500
+WRITE_RETRIES = 5
+WRITE_RETRY_BACKOFF_SECONDS = 0.05
+WRITE_FLUSH_TIMEOUT_SECONDS = 30
+
+def _write_insert(conn, row) -> str:
+    utils.insert_transaction(conn, row, commit=False)
+    return row[0]
+
+def _write_delete(conn, transaction_id: str):
+    return utils.delete_transaction_from_db(conn, transaction_id, commit=False)
+
+WRITE_OPERATIONS = {'insert': _write_insert, 'delete': _write_delete}
+
+def _encode_params(params) -> str:
+    return json.dumps(params, ensure_ascii=False)
+
+def _decode_params(operation: str, text: str):
+    params = json.loads(text)
+    return tuple(params) if operation == 'insert' else params
+
+def replay_journal(db_file: str) -> int:
+    """Applies journaled mutations that were never committed and returns how many there were.
+
+    Skipped while this process has a queue for the file, since its journal
+    entries are then still on their way.
+    """
+    with _write_queues_lock:
+        if db_file in _write_queues:
+            return 0
+    conn = utils.create_connection(db_file)
+    if conn is None:
+        return 0
+    try:
+        entries = conn.execute("SELECT id, operation, params FROM write_journal ORDER BY id").fetchall()
+        if not entries:
+            return 0
+        for journal_id, operation, params in entries:
+            try:
+                WRITE_OPERATIONS[operation](conn, _decode_params(operation, params))
+            except (sqlite3.IntegrityError, ValueError) as e:
+                logger.warning("write-behind: journaled %s #%d on %s skipped: %s", operation, journal_id, db_file, e)
+        conn.execute("DELETE FROM write_journal WHERE id <= ?", (entries[-1][0],))
+        conn.commit()
+        logger.warning("write-behind: replayed %d journaled writes on %s", len(entries), db_file)
+        return len(entries)
+    finally:
+        conn.close()
+
+class WriteBehindQueue:
+    """Background writer that group-commits queued inserts and deletes for one database."""
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"write-behind:{db_file}", daemon=True)
+        self._thread.start()
+
+    def submit(self, operation: str, params) -> Future:
+        """Journals and queues a mutation; the future resolves once it is committed.
+
+        The journal entry is committed before this returns, so an accepted
+        write is not lost if the process is killed. If it cannot be
+        journaled, the returned future has already failed.
+        """
+        if operation not in WRITE_OPERATIONS:
+            raise ValueError(f"Unknown write operation: {operation}")
+        future = Future()
+        try:
+            journal_id = self._journal(operation, params)
+        except sqlite3.Error as e:
+            logger.exception("write-behind: could not journal %s on %s", operation, self.db_file)
+            future.set_exception(e)
+            return future
+        self._queue.put((operation, params, future, journal_id))
+        return future
+
+    def _journal(self, operation: str, params) -> int:
+        with utils.get_connection(self.db_file) as conn:
+            if conn is None:
+                raise sqlite3.OperationalError(f"could not connect to {self.db_file}")
+            with conn:
+                return conn.execute(
+                    "INSERT INTO write_journal(operation, params) VALUES (?, ?)", (operation, _encode_params(params))
+                ).lastrowid
+
+    def _forget(self, journal_ids: List[int]) -> None:
+        """Drops the journal entries of writes reported as failed, so they are not replayed later."""
+        try:
+            with utils.get_connection(self.db_file) as conn:
+                if conn is not None:
+                    with conn:
+                        conn.executemany("DELETE FROM write_journal WHERE id = ?", [(i,) for i in journal_ids])
+                    return
+        except sqlite3.Error:
+            pass
+        logger.error("write-behind: %d failed writes stay in the journal of %s", len(journal_ids), self.db_file)
+
+    def flush(self, timeout: Optional[float] = WRITE_FLUSH_TIMEOUT_SECONDS) -> bool:
+        """Waits until everything queued so far is committed; False on timeout."""
+        marker = Future()
+        self._queue.put(('flush', None, marker, None))
+        try:
+            marker.result(timeout)
+            return True
+        except FutureTimeoutError:  # Not the builtin before Python 3.11
+            return False
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _next_batch(self) -> List[Tuple]:
+        batch = [self._queue.get()]
+        while len(batch) < WRITE_BATCH_MAX_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            writes = [item for item in batch if item[0] != 'flush']
+            if writes:
+                try:
+                    results = self._commit(writes)
+                except Exception as e:
+                    logger.exception("write-behind: batch of %d writes to %s failed", len(writes), self.db_file)
+                    results = [e] * len(writes)
+                    self._forget([journal_id for _, _, _, journal_id in writes])
+                for (_, _, future, _), result in zip(writes, results):
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+            for operation, _, future, _ in batch:
+                if operation == 'flush':
+                    future.set_result(None)
+
+    def _commit(self, writes: List[Tuple]) -> List:
+        """Applies `writes` and clears their journal entries in one transaction.
+
+        A row that violates a constraint or cannot be encoded fails alone.
+        """
+        for attempt in range(WRITE_RETRIES):
+            try:
+                with span("write_behind.commit") as info, utils.get_connection(self.db_file) as conn:
+                    if conn is None:
+                        raise sqlite3.OperationalError(f"could not connect to {self.db_file}")
+                    results = []
+                    for operation, params, _, _ in writes:
+                        try:
+                            results.append(WRITE_OPERATIONS[operation](conn, params))
+                        except (sqlite3.IntegrityError, ValueError) as e:
+                            results.append(e)
+                    conn.executemany(
+                        "DELETE FROM write_journal WHERE id = ?", [(journal_id,) for _, _, _, journal_id in writes]
+                    )
+                    conn.commit()
+                    info['rows'] = len(writes)
+                utils.ledger_written(self.db_file)
+                return results
+            except sqlite3.OperationalError:
+                if attempt == WRITE_RETRIES - 1:
+                    raise
+                logger.warning("write-behind: %s busy, retrying batch of %d", self.db_file, len(writes))
+                time.sleep(WRITE_RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+_write_queues: Dict[str, WriteBehindQueue] = {}
+_write_queues_lock = threading.Lock()
+
+def get_write_queue(db_file: Optional[str] = None) -> WriteBehindQueue:
+    db_file = db_file or utils.active_db_file()
+    with _write_queues_lock:
+        write_queue = _write_queues.get(db_file)
+        if write_queue is None:
+            write_queue = _write_queues[db_file] = WriteBehindQueue(db_file)
+        return write_queue
+
+@atexit.register
+def flush_writes() -> None:
+    """Commits every queued write-behind mutation (also runs at interpreter exit)."""
+    with _write_queues_lock:
+        write_queues = list(_write_queues.values())
+    for write_queue in write_queues:
+        if not write_queue.flush():
+            logger.error("write-behind: %d writes to %s not committed", write_queue.pending(), write_queue.db_file)
+
+def track_write(future: Future, label: str) -> None:
+    """Remembers a queued write so this session is told when it lands or fails."""
+    if not future.done() or future.exception() is not None:
+        st.session_state.setdefault('pending_writes', []).append((future, label))
+
+def check_pending_writes() -> None:
+    """Reports finished write-behind mutations of this session."""
+    pending = st.session_state.get('pending_writes')
+    if not pending:
+        return
+    still_pending = []
+    for future, label in pending:
+        if not future.done():
+            still_pending.append((future, label))
+        elif future.exception() is not None:
+            st.error(f"Không lưu được: {label} ({future.exception()})")
+    st.session_state.pending_writes = still_pending